@@ -1,5 +1,3 @@
-import random
-
 from hyperspectral_database import HyperspectralDatabase
 
 def acquire_data_examples():
@@ -25,14 +23,12 @@ def acquire_data_examples():
 def random_sampling_all_data():
     ratio = 0.2
     db = HyperspectralDatabase()
-    all_inidces = db.get_all_indices()
-    sample_num = len(all_inidces)
+    sample_num = db.count_documents({})
     if sample_num > 0:
-        sampling_to_this_index = round(sample_num * ratio)
-
-        random.shuffle(all_inidces)
-        used_for_sampling_indices = all_inidces[: sampling_to_this_index]
-        data = db.get_data_by_indices(used_for_sampling_indices)
+        # the sampling is done by the server, only the chosen spectra are transferred.
+        data = db.sample_data(ratio = ratio)
+        data = db.sample_data(ratio = ratio, seed = 0)
+        data = db.sample_data(n = 10, stratify_by = 'datatype', seed = 0)
 
     return None
 
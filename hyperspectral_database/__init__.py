@@ -5,8 +5,11 @@ if sys.version_info < (3, 6, ):
 
 __version__ = '1.1.4'
 
+from .batch import SpectralBatch
 from .database import HyperspectralDatabase
+from .aio import AsyncHyperspectralDatabase
+from .export import load_memmap_dataset
 
-__all__ = ['HyperspectralDatabase']
+__all__ = ['HyperspectralDatabase', 'AsyncHyperspectralDatabase', 'SpectralBatch', 'load_memmap_dataset']
 
 
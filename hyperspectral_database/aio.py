@@ -0,0 +1,631 @@
+import os
+import json
+import asyncio
+import warnings
+
+import numpy as np
+
+from bson import ObjectId
+from pymongo import InsertOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from gridfs.errors import NoFile
+
+try:
+    from pymongo import AsyncMongoClient
+    from gridfs import AsyncGridFS
+except ImportError:
+    AsyncMongoClient = None
+    AsyncGridFS = None
+
+from . import __version__
+from .utils import deserialize
+from .ingest import parse_data_record, array_data_entries
+from .batch import SpectralBatchBuilder
+from .pipeline import decode_spectral_value, lookup_spectral_pipeline
+from .query import DEFAULT_MAX_QUERY_BYTES, compile_queries, index_range_query, data_projection
+
+
+__all__ = ['AsyncHyperspectralDatabase']
+
+
+class AsyncHyperspectralDatabase:
+    def __init__(self,
+            db_name = 'hyperspectral',
+            user_id = '',
+            passwd = '',
+            host = 'localhost',
+            port = 27017,
+            storage_format = 'list',
+            allow_pickle = False,
+            spectral_dtype = 'float64',
+            spectral_compression = None,
+            max_query_bytes = DEFAULT_MAX_QUERY_BYTES,
+            max_pool_size = 100):
+
+        if AsyncMongoClient is None:
+            raise ImportError('AsyncHyperspectralDatabase needs the asyncio API of pymongo>=4.9.')
+
+        if not isinstance(db_name, str):
+            raise TypeError('Argument: db_name must be a string.')
+
+        if not isinstance(user_id, str):
+            raise TypeError('Argument: user_id must be a string.')
+
+        if not isinstance(passwd, str):
+            raise TypeError('Argument: passwd must be a string.')
+
+        if not isinstance(host, str):
+            raise TypeError('Argument: host must be a string.')
+
+        if not isinstance(port, int):
+            raise TypeError('Argument: port must be a int.')
+
+        if storage_format not in ('gridfs', 'list', 'binary'):
+            raise ValueError('Argument: storage_format must be one of (gridfs, list, binary).')
+
+        if not isinstance(allow_pickle, bool):
+            raise TypeError('Argument: allow_pickle must be a Python boolean object.')
+
+        if not isinstance(spectral_dtype, str):
+            raise TypeError('Argument: spectral_dtype must be a Python string object.')
+
+        spectral_dtype = spectral_dtype.lower()
+        if spectral_dtype not in ('float64', 'float32', 'float16', 'int16'):
+            raise ValueError('Argument: spectral_dtype must be one of (float64, float32, float16, int16).')
+
+        if spectral_compression is not None:
+            if not isinstance(spectral_compression, str):
+                raise TypeError('Argument: spectral_compression must be a Python string object.')
+
+            spectral_compression = spectral_compression.lower()
+
+        if spectral_compression not in (None, 'zlib', 'delta-zlib'):
+            raise ValueError('Argument: spectral_compression must be one of (None, zlib, delta-zlib).')
+
+        if not isinstance(max_query_bytes, int):
+            raise TypeError('Argument: max_query_bytes must be a Python int object.')
+
+        # the BSON document limit of MongoDB is 16MB, keep a margin for the command itself.
+        if max_query_bytes <= 0 or max_query_bytes > 15 * 1024 * 1024:
+            raise ValueError('Argument: max_query_bytes must in [1, 15MB].')
+
+        if not isinstance(max_pool_size, int) or max_pool_size <= 0:
+            raise ValueError('Argument: max_pool_size must be a positive Python int object.')
+
+        self._db_name = db_name
+        self._user_id = user_id
+        self._passwd = passwd
+        self._host = host
+        self._port = port
+
+        self.storage_format = storage_format
+        self.allow_pickle = allow_pickle
+        self.spectral_dtype = spectral_dtype
+        self.spectral_compression = spectral_compression
+        self.max_query_bytes = max_query_bytes
+
+        # one connection pool is shared by all the in-flight coroutines.
+        self.mongo_client = AsyncMongoClient(host = host, port = port, maxPoolSize = max_pool_size)
+        self.database = self.mongo_client[db_name]
+        self.fs = AsyncGridFS(self.database)
+        self._collection_list = ['data', 'spectral']
+        self._counter_collection = 'counters'
+        self.collections = {name: self.database[name] for name in self._collection_list}
+        self._indexes_ready = False
+
+    def __repr__(self):
+        lines = 'AsyncHyperspectralDatabase version: {0}\n'.format(__version__)
+        lines += '  User: {0}\n  Host: {1}\n  Port: {2}\n'.format(self._user_id, self._host, self._port)
+        lines += '  Storage format: {0} (dtype={1}, compression={2})\n'.format(
+                self.storage_format, self.spectral_dtype, self.spectral_compression)
+        lines += '  Database: {0}\n'.format(self._db_name)
+        return lines
+
+    @property
+    def gridfs(self):
+        return self.storage_format == 'gridfs'
+
+    @property
+    def spectral_encoding(self):
+        return {'dtype': self.spectral_dtype,
+                'compression': self.spectral_compression}
+
+    @property
+    def spectral_format(self):
+        spectral_format = 'list'
+        if self.storage_format == 'binary':
+            spectral_format = 'binary'
+
+        return spectral_format
+
+    async def close(self):
+        await self.mongo_client.close()
+        self.mongo_client = None
+        self.database = None
+        return None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+        return False
+
+    def _collection(self, collection):
+        if not isinstance(collection, str):
+            raise TypeError('Argument: collection must be a Python string object.')
+
+        if collection.lower() not in self._collection_list:
+            raise ValueError(collection, ' is not a valid collection selection.')
+
+        return self.collections[collection.lower()]
+
+    def find(self, query, collection = 'data', projection = None):
+        if not isinstance(query, dict):
+            raise TypeError('The argument: query only accept Python dictionary object.')
+
+        return self._collection(collection).find(query, projection)
+
+    async def find_one(self, query, collection = 'data', projection = None):
+        if not isinstance(query, dict):
+            raise TypeError('The argument: query only accept Python dictionary object.')
+
+        return await self._collection(collection).find_one(query, projection)
+
+    async def count_documents(self, query, collection = 'data'):
+        if not isinstance(query, dict):
+            raise TypeError('The argument: query only accept Python dictionary object.')
+
+        return await self._collection(collection).count_documents(query)
+
+    # ------------------------------------------------------------------ read API
+
+    async def _read_gridfs_group(self, file_ids):
+        lengths = {}
+        async for doc in self.database['fs.files'].find({'_id': {'$in': file_ids}}, {'length': 1}):
+            lengths[doc['_id']] = doc['length']
+
+        parts = {}
+        async for chunk in self.database['fs.chunks'].find({'files_id': {'$in': file_ids}},
+                {'_id': 0, 'files_id': 1, 'n': 1, 'data': 1}):
+
+            parts.setdefault(chunk['files_id'], []).append((chunk['n'], chunk['data']))
+
+        objects = {}
+        for file_id in file_ids:
+            if file_id not in lengths:
+                raise NoFile('No file in GridFS with _id: {0}.'.format(file_id))
+
+            file_parts = sorted(parts.get(file_id, []), key = lambda part: part[0])
+            binary_obj = b''.join(bytes(data) for _, data in file_parts)
+            if len(binary_obj) != lengths[file_id]:
+                binary_obj = await (await self.fs.get(file_id)).read()
+
+            objects[file_id] = binary_obj
+
+        return objects
+
+    async def _fill_gridfs(self, data, ids_per_request = 1000):
+        pointers = list(dict.fromkeys(single_data['spectral'] for single_data in data
+                if isinstance(single_data.get('spectral', None), ObjectId)))
+
+        # the groups are read concurrently on the shared connection pool.
+        groups = [pointers[i: i + ids_per_request] for i in range(0, len(pointers), ids_per_request)]
+        objects = {}
+        for group_objects in await asyncio.gather(*[self._read_gridfs_group(g) for g in groups]):
+            objects.update(group_objects)
+
+        for single_data in data:
+            pointer = single_data.get('spectral', None)
+            if isinstance(pointer, ObjectId):
+                single_data['spectral'] = deserialize(objects[pointer], allow_pickle = self.allow_pickle)
+            elif pointer is not None and pointer != 'unknown':
+                binary_obj = await (await self.fs.get(pointer)).read()
+                single_data['spectral'] = deserialize(binary_obj, allow_pickle = self.allow_pickle)
+            else:
+                single_data['spectral'] = 'unknown'
+
+        return data
+
+    async def _lookup_cursor(self, query, data_args, data_collection, spectral_collection,
+            sort = None, batch_size = None):
+
+        pipeline = lookup_spectral_pipeline(query, data_args,
+                spectral_collection = spectral_collection,
+                sort = sort)
+
+        kwargs = {'allowDiskUse': True}
+        if batch_size is not None:
+            kwargs['batchSize'] = batch_size
+
+        return await self._collection(data_collection).aggregate(pipeline, **kwargs)
+
+    async def _iter_documents(self, queries, data_collection, spectral_collection, data_args,
+            sort = None, batch_size = None):
+
+        await self._ensure_indexes()
+        # async generator of single data, list/binary spectra are joined by $lookup.
+        seen_ids = set()
+        for query in queries:
+            if self.gridfs or 'spectral' not in data_args:
+                cursor = self._collection(data_collection).find(query, data_projection(data_args),
+                        sort = sort, batch_size = batch_size or 0)
+            else:
+                cursor = await self._lookup_cursor(query, data_args, data_collection,
+                        spectral_collection, sort = sort, batch_size = batch_size)
+
+            async for doc in cursor:
+                if len(queries) > 1:
+                    if doc['_id'] in seen_ids:
+                        continue
+
+                    seen_ids.add(doc['_id'])
+
+                single_data = {}
+                for args in data_args:
+                    args_value = doc.get(args, 'unknown')
+                    if args == 'spectral' and not self.gridfs and args_value != 'unknown':
+                        args_value = decode_spectral_value(args_value)
+
+                    single_data[args] = args_value
+
+                yield single_data
+
+        return
+
+    async def _collect(self, documents, data_args, as_batch, batch_size = None):
+        chunk = []
+        async for single_data in documents:
+            chunk.append(single_data)
+            if batch_size is not None and len(chunk) == batch_size:
+                yield await self._finish_chunk(chunk, data_args, as_batch)
+                chunk = []
+
+        if len(chunk) > 0 or batch_size is None:
+            yield await self._finish_chunk(chunk, data_args, as_batch)
+
+        return
+
+    async def _finish_chunk(self, chunk, data_args, as_batch):
+        if self.gridfs and 'spectral' in data_args:
+            chunk = await self._fill_gridfs(chunk)
+
+        if not as_batch:
+            return chunk
+
+        builder = SpectralBatchBuilder(capacity = len(chunk))
+        builder.extend(chunk)
+        return builder.build()
+
+    def _data_args(self, data_args, as_batch):
+        if not isinstance(data_args, (list, tuple)):
+            raise TypeError('Argument: data_args must be a Python list/tuple object.')
+
+        for e in data_args:
+            if not isinstance(e, str):
+                raise TypeError('Element in argument::data_args must be a Python string object.')
+
+        if not isinstance(as_batch, bool):
+            raise TypeError('Argument: as_batch must be a Python boolean object.')
+
+        data_args = tuple(data_args)
+        if as_batch and 'insert_index' not in data_args:
+            data_args += ('insert_index', )
+
+        return data_args
+
+    async def _get_data(self, queries, data_collection, spectral_collection, data_args,
+            as_batch, sort = None):
+
+        data_args = self._data_args(data_args, as_batch)
+        documents = self._iter_documents(queries, data_collection, spectral_collection,
+                data_args, sort = sort)
+
+        async for data in self._collect(documents, data_args, as_batch):
+            return data
+
+    async def get_data(self, queries, data_collection = 'data', spectral_collection = 'spectral',
+            data_args = ('datatype', 'species', 'spectral'), as_batch = False):
+
+        queries = compile_queries(queries, max_query_bytes = self.max_query_bytes)
+        return await self._get_data(queries, data_collection, spectral_collection, data_args,
+                as_batch)
+
+    async def get_all_data(self, data_collection = 'data', spectral_collection = 'spectral',
+            data_args = ('datatype', 'species', 'spectral'), as_batch = False):
+
+        return await self.get_data({}, data_collection = data_collection,
+                spectral_collection = spectral_collection,
+                data_args = data_args,
+                as_batch = as_batch)
+
+    async def get_data_by_indices(self, indices, data_collection = 'data',
+            spectral_collection = 'spectral', data_args = ('datatype', 'species', 'spectral'),
+            as_batch = False):
+
+        if not isinstance(indices, (int, list, tuple)):
+            raise TypeError('Argument: indices must be a Python list/tuple object')
+
+        if isinstance(indices, int):
+            indices = [indices]
+
+        return await self.get_data({'insert_index': {'$in': [int(i) for i in indices]}},
+                data_collection = data_collection,
+                spectral_collection = spectral_collection,
+                data_args = data_args,
+                as_batch = as_batch)
+
+    async def get_data_by_index_range(self, start, stop = None, step = None,
+            data_collection = 'data', spectral_collection = 'spectral',
+            data_args = ('datatype', 'species', 'spectral'), as_batch = False):
+
+        if stop is None:
+            start, stop = 0, start
+
+        if step is None:
+            step = 1
+
+        for value in (start, stop, step):
+            if not isinstance(value, int):
+                raise TypeError('Input argument must be a Python int object.')
+
+        query, direction = index_range_query(start, stop, step)
+        if query is None:
+            return await self.get_data({'insert_index': {'$in': []}},
+                    data_collection = data_collection,
+                    spectral_collection = spectral_collection,
+                    data_args = data_args,
+                    as_batch = as_batch)
+
+        return await self._get_data([query], data_collection, spectral_collection, data_args,
+                as_batch, sort = [('insert_index', direction)])
+
+    async def get_data_by_datatypes(self, datatypes, data_collection = 'data',
+            spectral_collection = 'spectral', data_args = ('datatype', 'species', 'spectral'),
+            as_batch = False):
+
+        if isinstance(datatypes, str):
+            datatypes = [datatypes]
+
+        return await self.get_data({'datatype': {'$in': list(datatypes)}},
+                data_collection = data_collection,
+                spectral_collection = spectral_collection,
+                data_args = data_args,
+                as_batch = as_batch)
+
+    async def get_data_by_species(self, species, data_collection = 'data',
+            spectral_collection = 'spectral', data_args = ('datatype', 'species', 'spectral'),
+            as_batch = False):
+
+        if isinstance(species, str):
+            species = [species]
+
+        return await self.get_data({'species': {'$in': list(species)}},
+                data_collection = data_collection,
+                spectral_collection = spectral_collection,
+                data_args = data_args,
+                as_batch = as_batch)
+
+    async def iter_data(self, queries, data_collection = 'data', spectral_collection = 'spectral',
+            data_args = ('datatype', 'species', 'spectral'), batch_size = 10000, as_batch = False):
+
+        # async streaming iterator, one batch at a time is kept in memory.
+        if not isinstance(batch_size, int):
+            raise TypeError('Argument: batch_size must be a Python int object.')
+
+        if batch_size <= 0:
+            raise ValueError('Argument: batch_size must larger than zero.')
+
+        data_args = self._data_args(data_args, as_batch)
+        queries = compile_queries(queries, max_query_bytes = self.max_query_bytes)
+        documents = self._iter_documents(queries, data_collection, spectral_collection,
+                data_args, batch_size = batch_size)
+
+        async for data in self._collect(documents, data_args, as_batch, batch_size = batch_size):
+            yield data
+
+        return
+
+    def iter_all_data(self, data_collection = 'data', spectral_collection = 'spectral',
+            data_args = ('datatype', 'species', 'spectral'), batch_size = 10000, as_batch = False):
+
+        return self.iter_data({}, data_collection = data_collection,
+                spectral_collection = spectral_collection,
+                data_args = data_args,
+                batch_size = batch_size,
+                as_batch = as_batch)
+
+    async def get_indices(self, queries, collection = 'data'):
+        indices, seen_indices = [], set()
+        queries = compile_queries(queries, max_query_bytes = self.max_query_bytes)
+        for query in queries:
+            async for doc in self.find(query, collection = collection,
+                    projection = {'_id': 0, 'insert_index': 1}):
+
+                index = doc.get('insert_index', None)
+                if index is not None and index not in seen_indices:
+                    seen_indices.add(index)
+                    indices.append(int(index))
+
+        return indices
+
+    async def get_all_indices(self, collection = 'data'):
+        return await self.get_indices({}, collection = collection)
+
+    # ----------------------------------------------------------------- write API
+
+    async def _get_insert_index(self, reserve = 1):
+        counters = self.database[self._counter_collection]
+        if await counters.find_one({'_id': 'insert_index'}) is None:
+            await self._seed_insert_index(counters)
+
+        counter = await counters.find_one_and_update({'_id': 'insert_index'},
+                {'$inc': {'next': reserve}},
+                upsert = True,
+                return_document = ReturnDocument.AFTER)
+
+        return int(counter['next']) - reserve
+
+    async def _ensure_indexes(self):
+        # the same indexes as HyperspectralDatabase._ensure_indexes, created before the first request.
+        if self._indexes_ready:
+            return None
+
+        try:
+            for name in self._collection_list:
+                await self.collections[name].create_index('insert_index')
+        except OperationFailure as error:
+            warnings.warn('Cannot create the insert_index index ({0}), the lookups and range scans' \
+                    ' may be slow.'.format(error))
+
+        self._indexes_ready = True
+        return None
+
+    async def _seed_insert_index(self, counters):
+        await self._ensure_indexes()
+        last_doc = await self.collections['data'].find_one(
+                {'insert_index': {'$type': 'number'}},
+                {'insert_index': 1},
+                sort = [('insert_index', -1)])
+
+        insert_index = 0
+        if last_doc is not None:
+            insert_index = int(last_doc['insert_index']) + 1
+
+        try:
+            await counters.update_one({'_id': 'insert_index'},
+                    {'$max': {'next': insert_index}},
+                    upsert = True)
+        except DuplicateKeyError:
+            await counters.update_one({'_id': 'insert_index'},
+                    {'$max': {'next': insert_index}})
+
+        return None
+
+    async def _commit_documents(self, documents, data_collection, spectral_collection):
+        # the same layout as HyperspectralDatabase._commit_documents.
+        if len(documents) == 0:
+            return 0
+
+        insert_index = await self._get_insert_index(reserve = len(documents))
+        data_requests, spectral_requests = [], []
+        for data_document, spectral_document, gridfs_value in documents:
+            data_document['insert_index'] = insert_index
+            if spectral_document is not None:
+                spectral_document['insert_index'] = insert_index
+
+            if gridfs_value is not None:
+                data_document['spectral'] = await self.fs.put(gridfs_value,
+                        insert_index = insert_index)
+
+            data_requests.append(InsertOne(data_document))
+            if spectral_document is not None:
+                spectral_requests.append(InsertOne(spectral_document))
+
+            insert_index += 1
+
+        if len(spectral_requests) > 0:
+            await self._collection(spectral_collection).bulk_write(spectral_requests)
+
+        await self._collection(data_collection).bulk_write(data_requests)
+        return len(data_requests)
+
+    async def insert_data(self, file, data_collection = 'data', spectral_collection = 'spectral',
+            data_args = ('datatype', 'species', 'spectral'), certain = False):
+
+        if not isinstance(file, str):
+            raise TypeError('Argument: file must be a Python string object.')
+
+        if not isinstance(certain, bool):
+            raise TypeError('Argument: certain must be a Python boolean object.')
+
+        if not certain:
+            print('Not certain mode, no insertion in the database.')
+            return 0
+
+        # the file is read and parsed off the event loop.
+        def parse():
+            with open(file, 'r') as f:
+                contents = json.loads(f.read())
+                f.close()
+
+            return parse_data_record(contents, os.path.split(file)[-1], data_args = data_args,
+                    data_collection = data_collection,
+                    spectral_collection = spectral_collection,
+                    spectral_format = self.spectral_format,
+                    spectral_encoding = self.spectral_encoding)
+
+        document = await asyncio.get_running_loop().run_in_executor(None, parse)
+        return await self._commit_documents([document], data_collection, spectral_collection)
+
+    async def insert_arrays(self, spectral, datatypes, species, source_filenames = None,
+            data_collection = 'data', spectral_collection = 'spectral', batch_size = 10000,
+            certain = False):
+
+        if not isinstance(spectral, np.ndarray) or spectral.ndim != 2:
+            raise TypeError('Argument: spectral must be a (N, bands) numpy.ndarray object.')
+
+        sample_number = spectral.shape[0]
+        if isinstance(datatypes, str):
+            datatypes = [datatypes] * sample_number
+
+        if isinstance(species, str):
+            species = [species] * sample_number
+
+        if len(datatypes) != sample_number or len(species) != sample_number:
+            raise ValueError('The length of datatypes and species must equal to the sample number.')
+
+        if not certain:
+            print('Not certain mode, no insertion in the database.')
+            return 0
+
+        counting, documents = 0, []
+        for _, document in array_data_entries(spectral, datatypes, species,
+                source_filenames = source_filenames,
+                data_collection = data_collection,
+                spectral_collection = spectral_collection,
+                spectral_format = self.spectral_format,
+                spectral_encoding = self.spectral_encoding):
+
+            documents.append(document)
+            if len(documents) == batch_size:
+                counting += await self._commit_documents(documents, data_collection,
+                        spectral_collection)
+                documents = []
+
+        counting += await self._commit_documents(documents, data_collection, spectral_collection)
+        return counting
+
+    async def delete_data(self, indices, data_collection = 'data', spectral_collection = 'spectral',
+            certain = False):
+
+        if not isinstance(indices, (int, list, tuple)):
+            raise TypeError('Argument: indices must be a Python list/tuple object')
+
+        if isinstance(indices, int):
+            indices = [indices]
+
+        if not certain:
+            print('Not certain mode, no deletion in the database.')
+            return 0
+
+        query = {'insert_index': {'$in': [int(i) for i in indices]}}
+        async for doc in self.find(query, collection = data_collection, projection = {'spectral': 1}):
+            if isinstance(doc.get('spectral', None), ObjectId):
+                await self.fs.delete(doc['spectral'])
+
+        await self._collection(spectral_collection).delete_many(query)
+        result = await self._collection(data_collection).delete_many(query)
+        return result.deleted_count
+
+    async def delete_all(self, data_collection = 'data', spectral_collection = 'spectral',
+            certain = False):
+
+        if not certain:
+            print('Not certain mode, no deletion in the database.')
+            return 0
+
+        indices = await self.get_all_indices(collection = data_collection)
+        return await self.delete_data(indices, data_collection = data_collection,
+                spectral_collection = spectral_collection,
+                certain = certain)
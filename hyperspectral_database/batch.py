@@ -0,0 +1,216 @@
+import numpy as np
+
+from .codec import decode_array, is_encoded_array
+
+
+__all__ = ['SpectralBatch', 'SpectralBatchBuilder']
+
+
+class SpectralBatch:
+    def __init__(self, spectral, insert_index, datatype, datatype_categories,
+            species, species_categories):
+
+        if not isinstance(spectral, np.ndarray) or spectral.ndim != 2:
+            raise TypeError('Argument: spectral must be a 2D numpy.ndarray object.')
+
+        sample_number = spectral.shape[0]
+        for name, column in (('insert_index', insert_index), ('datatype', datatype),
+                ('species', species)):
+
+            if not isinstance(column, np.ndarray) or column.shape != (sample_number, ):
+                raise ValueError('Argument: {0} must be a 1D numpy.ndarray with {1} elements.'\
+                        .format(name, sample_number))
+
+        self.spectral = spectral
+        self.insert_index = insert_index
+        self.datatype = datatype
+        self.datatype_categories = tuple(datatype_categories)
+        self.species = species
+        self.species_categories = tuple(species_categories)
+
+    def __repr__(self):
+        return self.__class__.__name__ + '(samples={0}, bands={1}, dtype={2}, datatypes={3}, species={4})'\
+                .format(len(self), self.bands, self.spectral.dtype,
+                        len(self.datatype_categories), len(self.species_categories))
+
+    def __len__(self):
+        return self.spectral.shape[0]
+
+    def __getitem__(self, index):
+        # int, slice, index array or boolean mask, the categories are shared with the subset.
+        if isinstance(index, (int, np.integer)):
+            index = slice(index, index + 1 if index != -1 else None)
+
+        return SpectralBatch(self.spectral[index],
+                self.insert_index[index],
+                self.datatype[index],
+                self.datatype_categories,
+                self.species[index],
+                self.species_categories)
+
+    @property
+    def bands(self):
+        return self.spectral.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.spectral.nbytes + self.insert_index.nbytes + \
+                self.datatype.nbytes + self.species.nbytes
+
+    def datatype_labels(self):
+        return np.array(self.datatype_categories, dtype = object)[self.datatype]
+
+    def species_labels(self):
+        return np.array(self.species_categories, dtype = object)[self.species]
+
+    def to_list(self):
+        data = []
+        datatype_labels, species_labels = self.datatype_labels(), self.species_labels()
+        for i in range(len(self)):
+            data.append({'insert_index': int(self.insert_index[i]),
+                         'datatype': datatype_labels[i],
+                         'species': species_labels[i],
+                         'spectral': self.spectral[i]})
+
+        return data
+
+    @classmethod
+    def from_list(cls, data, dtype = None):
+        builder = SpectralBatchBuilder(capacity = len(data), dtype = dtype)
+        builder.extend(data)
+        return builder.build()
+
+
+class SpectralBatchBuilder:
+    def __init__(self, capacity = 0, dtype = None):
+        if not isinstance(capacity, int):
+            raise TypeError('Argument: capacity must be a Python int object.')
+
+        if capacity < 0:
+            raise ValueError('Argument: capacity cannot be negative.')
+
+        self.capacity = capacity
+        self.dtype = None if dtype is None else np.dtype(dtype)
+        self._size = 0
+        self._spectral = None
+        self._insert_index = np.empty((capacity, ), dtype = np.int64)
+        self._datatype = np.empty((capacity, ), dtype = np.int32)
+        self._species = np.empty((capacity, ), dtype = np.int32)
+        self._datatype_codes = {}
+        self._species_codes = {}
+
+    def __repr__(self):
+        return self.__class__.__name__ + '(size={0}, capacity={1})'.format(self._size, self.capacity)
+
+    def __len__(self):
+        return self._size
+
+    def _code(self, codes, value):
+        if not isinstance(value, str):
+            value = 'unknown'
+
+        code = codes.get(value, None)
+        if code is None:
+            code = len(codes)
+            codes[value] = code
+
+        return code
+
+    def _grow(self, buffer, capacity):
+        # a new owned buffer, build() shrinks it in place with ndarray.resize.
+        grown = np.empty((capacity, ) + buffer.shape[1:], dtype = buffer.dtype)
+        grown[: self._size] = buffer[: self._size]
+        return grown
+
+    def _reserve(self, size):
+        if size <= self.capacity:
+            return None
+
+        capacity = max(size, self.capacity * 2, 16)
+        self._insert_index = self._grow(self._insert_index, capacity)
+        self._datatype = self._grow(self._datatype, capacity)
+        self._species = self._grow(self._species, capacity)
+        if self._spectral is not None:
+            self._spectral = self._grow(self._spectral, capacity)
+
+        self.capacity = capacity
+        return None
+
+    def _allocate(self, bands, dtype):
+        if self.dtype is None:
+            self.dtype = dtype
+
+        self._spectral = np.empty((self.capacity, bands), dtype = self.dtype)
+        # the rows appended before the first spectrum have no spectral data.
+        self._spectral[: self._size] = np.nan
+        return None
+
+    def append(self, insert_index = None, datatype = None, species = None, spectral = None):
+        self._reserve(self._size + 1)
+        row = self._size
+
+        if isinstance(spectral, str):
+            spectral = None
+
+        if spectral is not None:
+            if is_encoded_array(spectral):
+                # decode_array is a view of the buffer, it is copied only once into the row.
+                spectral = decode_array(spectral)
+                dtype = spectral.dtype
+            elif isinstance(spectral, np.ndarray):
+                dtype = spectral.dtype
+            else:
+                dtype = np.dtype(np.float64)
+
+            bands = len(spectral)
+            if self._spectral is None:
+                self._allocate(bands, dtype)
+
+            if bands != self._spectral.shape[1]:
+                raise ValueError('Spectral length: {0} is not consistent with the batch: {1}.'\
+                        .format(bands, self._spectral.shape[1]))
+
+            self._spectral[row] = spectral
+        elif self._spectral is not None:
+            self._spectral[row] = np.nan
+
+        if insert_index is None or isinstance(insert_index, str):
+            insert_index = -1
+
+        self._insert_index[row] = insert_index
+        self._datatype[row] = self._code(self._datatype_codes, datatype)
+        self._species[row] = self._code(self._species_codes, species)
+        self._size += 1
+        return None
+
+    def extend(self, data):
+        for single_data in data:
+            self.append(insert_index = single_data.get('insert_index', None),
+                        datatype = single_data.get('datatype', None),
+                        species = single_data.get('species', None),
+                        spectral = single_data.get('spectral', None))
+
+        return None
+
+    def build(self):
+        # the buffers are shrunk in place to the filled rows and handed over without a copy,
+        # the next append of the builder grows new buffers.
+        size = self._size
+        if self._spectral is None:
+            self._spectral = np.empty((size, 0), dtype = self.dtype or np.float64)
+        elif size < self.capacity:
+            self._spectral.resize((size, self._spectral.shape[1]), refcheck = False)
+
+        if size < self.capacity:
+            for buffer in (self._insert_index, self._datatype, self._species):
+                buffer.resize((size, ), refcheck = False)
+
+            self.capacity = size
+
+        categories = lambda codes: sorted(codes, key = codes.get)
+        return SpectralBatch(self._spectral,
+                self._insert_index,
+                self._datatype,
+                categories(self._datatype_codes),
+                self._species,
+                categories(self._species_codes))
@@ -0,0 +1,137 @@
+import sys
+import threading
+
+from collections import OrderedDict
+
+import numpy as np
+
+
+__all__ = ['SpectralCache']
+
+
+class SpectralCache:
+    def __init__(self, max_bytes):
+        if not isinstance(max_bytes, int):
+            raise TypeError('Argument: max_bytes must be a Python int object.')
+
+        if max_bytes <= 0:
+            raise ValueError('Argument: max_bytes must larger than zero.')
+
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def __repr__(self):
+        return self.__class__.__name__ + '(entries={0}, nbytes={1}, max_bytes={2}, hits={3}, misses={4})'\
+                .format(len(self), self.nbytes, self.max_bytes, self.hits, self.misses)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _entry_size(self, value):
+        size = 0
+        for field, field_value in value.items():
+            if isinstance(field_value, np.ndarray):
+                size += field_value.nbytes
+            else:
+                size += sys.getsizeof(field_value)
+
+        return size
+
+    def get(self, key, fields = ()):
+        # key is (storage_format, data_collection, spectral_collection, insert_index),
+        # an entry without all the fields is a miss.
+        with self._lock:
+            entry = self._entries.get(key, None)
+            if entry is None or not all(field in entry[0] for field in fields):
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[0]
+
+        return {field: self._copy(value[field]) for field in fields}
+
+    def _copy(self, field_value):
+        # the cached arrays are never shared with the callers, the mutability is unchanged.
+        if isinstance(field_value, np.ndarray):
+            return np.array(field_value)
+
+        return field_value
+
+    def put(self, key, value):
+        value = {field: self._copy(field_value) for field, field_value in value.items()}
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.nbytes -= entry[1]
+                entry[0].update(value)
+                value = entry[0]
+
+            size = self._entry_size(value)
+            if size > self.max_bytes:
+                return False
+
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            self._evict()
+
+        return True
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last = False)
+            self.nbytes -= evicted_size
+            self.evictions += 1
+
+        return None
+
+    def resize(self, max_bytes):
+        if not isinstance(max_bytes, int):
+            raise TypeError('Argument: max_bytes must be a Python int object.')
+
+        if max_bytes <= 0:
+            raise ValueError('Argument: max_bytes must larger than zero.')
+
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+        return None
+
+    def invalidate(self, insert_indices):
+        counting = 0
+        with self._lock:
+            prefixes = set(key[: -1] for key in self._entries.keys())
+            for insert_index in insert_indices:
+                for prefix in prefixes:
+                    entry = self._entries.pop(prefix + (insert_index, ), None)
+                    if entry is not None:
+                        self.nbytes -= entry[1]
+                        counting += 1
+
+        return counting
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+        return None
+
+    def stats(self):
+        return {'entries': len(self),
+                'nbytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions}
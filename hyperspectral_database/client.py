@@ -13,7 +13,9 @@ class LightWeightedDatabaseClient(Database):
             passwd = '',
             host = '192.168.50.146',
             port = 27087,
-            gridfs = True):
+            gridfs = True,
+            storage_format = None,
+            allow_pickle = False):
 
         super(LightWeightedDatabaseClient, self).__init__(
                  db_name = db_name,
@@ -27,6 +29,11 @@ class LightWeightedDatabaseClient(Database):
                                                                   self._collection_list)
 
         self.gridfs = gridfs
+        if storage_format is None:
+            storage_format = 'gridfs' if gridfs else 'list'
+
+        self.storage_format = storage_format
+        self.allow_pickle = allow_pickle
 
     def _init_gridfs_collections(self, database, name_list):
         fs = gridfs.GridFS(database)
@@ -48,21 +55,46 @@ class LightWeightedDatabaseClient(Database):
         self._gridfs = gridfs
         return None
 
+    @property
+    def storage_format(self):
+        return self._storage_format
+
+    @storage_format.setter
+    def storage_format(self, storage_format):
+        if not isinstance(storage_format, str):
+            raise TypeError('Argument: storage_format must be a Python string object.')
+
+        self._storage_format = storage_format.lower()
+        return None
+
+    @property
+    def allow_pickle(self):
+        return self._allow_pickle
+
+    @allow_pickle.setter
+    def allow_pickle(self, allow_pickle):
+        if not isinstance(allow_pickle, bool):
+            raise TypeError('Argument: allow_pickle must be a Python boolean object.')
+
+        self._allow_pickle = allow_pickle
+        return None
+
     def connect(self, host, port, db_name):
         self.mongo_client = MongoClient(host = host, port = port)
         self.database = self.mongo_client[db_name]
         return None
 
     def __repr__(self):
-        lines = self.__class__.__name__ + '(gridfs={0})'.format(self.gridfs) 
+        lines = self.__class__.__name__ + '(gridfs={0}, storage_format={1})'\
+                .format(self.gridfs, self.storage_format)
         lines += ' # Client object for sychronized function.'
         return lines
 
-    def find(self, query, collection = 'data'):
-        return self.collections[collection.lower()].find(query)
+    def find(self, query, collection = 'data', projection = None):
+        return self.collections[collection.lower()].find(query, projection)
 
-    def find_one(self, query, collection = 'data'):
-        return self.collections[collection.lower()].find_one(query)
+    def find_one(self, query, collection = 'data', projection = None):
+        return self.collections[collection.lower()].find_one(query, projection)
 
     def count_documents(self, query, collection = 'data'):
         return self.collections[collection.lower()].count_documents(query)
@@ -0,0 +1,168 @@
+import zlib
+import struct
+
+import numpy as np
+
+
+__all__ = ['encode_array', 'decode_array', 'inspect_array', 'is_encoded_array']
+
+
+# layout: magic | version | dtype code | flags | ndim | shape (uint32 * ndim)
+#         | [scale | offset (float64), version 2 scaled int16 only] | raw buffer
+_MAGIC = b'HSDA'
+_VERSION = 2
+_HEADER = struct.Struct('<4sBBBB')
+_DIMENSION = 'I'
+_QUANTIZATION = struct.Struct('<dd')
+
+_DTYPES = {1: np.dtype('<f8'),
+           2: np.dtype('<f4'),
+           3: np.dtype('<f2'),
+           4: np.dtype('<i2')}
+
+_DTYPE_CODES = {dtype: code for code, dtype in _DTYPES.items()}
+
+_FLAG_ZLIB = 0x01
+_FLAG_DELTA = 0x02
+_FLAG_SCALED = 0x04
+_COMPRESSIONS = (None, 'zlib', 'delta-zlib')
+
+
+def is_encoded_array(binary_obj):
+    if not isinstance(binary_obj, (bytes, bytearray, memoryview)):
+        return False
+
+    return bytes(binary_obj[: len(_MAGIC)]) == _MAGIC
+
+def _quantize(array):
+    # scaled int16: x ~= (q + 32768) * scale + offset, the range is mapped to 65536 levels.
+    array = np.asarray(array, dtype = np.float64)
+    offset = 0.
+    scale = 1.
+    if array.size > 0:
+        offset = float(np.min(array))
+        scale = (float(np.max(array)) - offset) / 65535.
+        if scale <= 0.:
+            scale = 1.
+
+    quantized = np.rint((array - offset) / scale) - 32768.
+    quantized = np.clip(quantized, -32768, 32767).astype('<i2')
+    return quantized, scale, offset
+
+def _delta_encode(payload, dtype):
+    # delta on the unsigned integer view of the buffer, the wraparound keeps it lossless.
+    values = np.frombuffer(payload, dtype = '<u{0}'.format(dtype.itemsize))
+    delta = np.empty_like(values)
+    if values.size > 0:
+        delta[0] = values[0]
+        np.subtract(values[1: ], values[: -1], out = delta[1: ])
+
+    return delta.tobytes()
+
+def _delta_decode(payload, dtype):
+    delta = np.frombuffer(payload, dtype = '<u{0}'.format(dtype.itemsize))
+    values = np.cumsum(delta, dtype = delta.dtype)
+    return values.tobytes()
+
+def encode_array(array, dtype = None, compression = None, level = 6):
+    array = np.asarray(array)
+    if array.dtype == np.object_:
+        raise TypeError('Only numerical array can be encoded.')
+
+    if dtype is None:
+        dtype = array.dtype
+
+    dtype = np.dtype(dtype).newbyteorder('<')
+    code = _DTYPE_CODES.get(dtype, None)
+    if code is None:
+        raise ValueError('Unsupported dtype: {0} for array encoding.'.format(dtype))
+
+    if compression not in _COMPRESSIONS:
+        raise ValueError('Argument: compression must be one of {0}.'.format(_COMPRESSIONS))
+
+    if array.ndim > 255:
+        raise ValueError('Array with more than 255 dimensions cannot be encoded.')
+
+    flags, quantization = 0, b''
+    if dtype == np.dtype('<i2'):
+        array, scale, offset = _quantize(array)
+        quantization = _QUANTIZATION.pack(scale, offset)
+        flags |= _FLAG_SCALED
+
+    payload = np.ascontiguousarray(array, dtype = dtype).tobytes()
+    if compression == 'delta-zlib':
+        payload = _delta_encode(payload, dtype)
+        flags |= _FLAG_DELTA
+
+    if compression in ('zlib', 'delta-zlib'):
+        payload = zlib.compress(payload, level)
+        flags |= _FLAG_ZLIB
+
+    # the plain formats keep version 1, so the old library can still decode them.
+    version = 1
+    if flags & (_FLAG_DELTA | _FLAG_SCALED):
+        version = 2
+
+    header = _HEADER.pack(_MAGIC, version, code, flags, array.ndim)
+    header += struct.pack('<{0}{1}'.format(array.ndim, _DIMENSION), *array.shape)
+    return header + quantization + payload
+
+def _read_header(binary_obj):
+    if not is_encoded_array(binary_obj):
+        raise ValueError('Input object is not an encoded array.')
+
+    _, version, code, flags, ndim = _HEADER.unpack_from(binary_obj, 0)
+    if version > _VERSION:
+        raise RuntimeError('Encoded array version: {0} is newer than the library, please upgrade.'\
+                .format(version))
+
+    dtype = _DTYPES.get(code, None)
+    if dtype is None:
+        raise ValueError('Unknown dtype code: {0} in the encoded array.'.format(code))
+
+    offset = _HEADER.size
+    shape = struct.unpack_from('<{0}{1}'.format(ndim, _DIMENSION), binary_obj, offset)
+    offset += struct.calcsize('<{0}{1}'.format(ndim, _DIMENSION))
+
+    scale, quantization_offset = None, None
+    if flags & _FLAG_SCALED:
+        scale, quantization_offset = _QUANTIZATION.unpack_from(binary_obj, offset)
+        offset += _QUANTIZATION.size
+
+    compression = None
+    if flags & _FLAG_ZLIB:
+        compression = 'zlib'
+        if flags & _FLAG_DELTA:
+            compression = 'delta-zlib'
+
+    header = {'version': version,
+              'dtype': dtype,
+              'shape': shape,
+              'compression': compression,
+              'scale': scale,
+              'offset': quantization_offset}
+
+    return header, offset
+
+def inspect_array(binary_obj):
+    header, _ = _read_header(binary_obj)
+    return header
+
+def decode_array(binary_obj):
+    header, offset = _read_header(binary_obj)
+    if header['compression'] is not None:
+        buffer, offset = zlib.decompress(memoryview(binary_obj)[offset: ]), 0
+        if header['compression'] == 'delta-zlib':
+            buffer = _delta_decode(buffer, header['dtype'])
+    else:
+        buffer = binary_obj
+
+    # zero-copy for uncompressed float object, the returned array is a read-only view of the buffer.
+    count = int(np.prod(header['shape'], dtype = np.int64))
+    array = np.frombuffer(buffer, dtype = header['dtype'], count = count, offset = offset)
+    array = array.reshape(header['shape'])
+    if header['scale'] is not None:
+        array = (array.astype(np.float32) + np.float32(32768.)) * np.float32(header['scale']) + \
+                np.float32(header['offset'])
+
+    return array
@@ -2,20 +2,45 @@ import os
 import json
 import copy
 import warnings
+import functools
+
+import multiprocessing as mp
+
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
 import gridfs
 from pymongo import (UpdateOne,
                      InsertOne, 
-                     DeleteMany)
+                     DeleteMany,
+                     ReturnDocument)
+from pymongo.errors import DuplicateKeyError, OperationFailure
 
 from . import __version__
 from .base import Database
 from .utils import serialize, deserialize 
+from .ingest import (scan_data_files,
+                     scan_ndjson_lines,
+                     parse_data_file,
+                     parse_data_entry,
+                     parse_data_line,
+                     array_data_entries,
+                     IngestWriter,
+                     IngestManifest)
 from .template import Template
+from .batch import SpectralBatchBuilder
+from .cache import SpectralCache
+from .mirror import MIRROR_FIELDS, LocalMirror
 from .synchronize import SynchronizedFunctionWapper 
-from .pipeline import get_spectral_gridfs, get_spectral_list 
+from .codec import is_encoded_array, inspect_array
+from .pipeline import get_spectral_gridfs, get_spectral_list, get_spectral_lookup
+from .reformation import SpectralReformation
+from .export import MemmapExport
+from .query import (DEFAULT_MAX_QUERY_BYTES,
+                    compile_queries,
+                    index_range_query,
+                    data_projection)
 
 
 __all__ = ['HyperspectralDatabase']
@@ -32,7 +57,14 @@ class HyperspectralDatabase(Database):
             synchronize_query_size = 100000,
             synchronize_worker = -1,
             synchronize_timeout = -1,
-            gridfs = False):
+            gridfs = False,
+            storage_format = None,
+            allow_pickle = False,
+            spectral_dtype = 'float64',
+            spectral_compression = None,
+            max_query_bytes = DEFAULT_MAX_QUERY_BYTES,
+            retrieval_engine = 'lookup',
+            cache_bytes = 0):
 
         super(HyperspectralDatabase, self).__init__(
                  db_name = db_name,
@@ -42,16 +74,32 @@ class HyperspectralDatabase(Database):
                  port = port)
 
         self.sync_wrapper = None
+        self.spectral_cache = None
+        self.local_mirror = None
+        self.mirror_check_freshness = True
         self._collection_list = ['data', 'spectral']
+        self._counter_collection = 'counters'
         self.fs, self.collections = self._init_gridfs_collections(self.database,
                                                                   self._collection_list)
 
+        self._indexes_ready = False
+        self._ensure_indexes()
+        self._storage_format = 'list'
         self.gridfs = gridfs
+        if storage_format is not None:
+            self.storage_format = storage_format
+
+        self.allow_pickle = allow_pickle
+        self.spectral_dtype = spectral_dtype
+        self.spectral_compression = spectral_compression
         self.sync_wrapper = SynchronizedFunctionWapper(self, 
                 query_size = synchronize_query_size,
                 timeout = synchronize_timeout)
 
         self.docs_num_per_request = docs_num_per_request
+        self.max_query_bytes = max_query_bytes
+        self.retrieval_engine = retrieval_engine
+        self.cache_bytes = cache_bytes
         self.synchronize_query_size = synchronize_query_size
         self.synchronize_worker = synchronize_worker
         self.synchronize_timeout = synchronize_timeout
@@ -66,7 +114,7 @@ class HyperspectralDatabase(Database):
 
     @property
     def gridfs(self):
-        return self._gridfs
+        return self.storage_format == 'gridfs'
 
     @gridfs.setter
     def gridfs(self, gridfs):
@@ -74,13 +122,111 @@ class HyperspectralDatabase(Database):
             raise TypeError('Argument: gridfs must be a Python boolean object.')
 
         if gridfs:
+            self.storage_format = 'gridfs'
+        elif self.storage_format == 'gridfs':
+            self.storage_format = 'list'
+
+        return None
+
+    @property
+    def storage_format(self):
+        return self._storage_format
+
+    @storage_format.setter
+    def storage_format(self, storage_format):
+        if not isinstance(storage_format, str):
+            raise TypeError('Argument: storage_format must be a Python string object.')
+
+        storage_format = storage_format.lower()
+        if storage_format not in self.available_storage_formats:
+            raise ValueError('Argument: storage_format must be one of {0}.'\
+                    .format(self.available_storage_formats))
+
+        if storage_format == 'gridfs':
             warnings.warn('Although the Gridfs mode can access the original' + \
                     ' binary file in the {0}, it is very inefficient.'\
                     .format(self.__class__.__name__))
 
-        self._gridfs = gridfs
+        self._storage_format = storage_format
+        return None
+
+    @property
+    def available_storage_formats(self):
+        return ('gridfs', 'list', 'binary')
+
+    @property
+    def allow_pickle(self):
+        return self._allow_pickle
+
+    @allow_pickle.setter
+    def allow_pickle(self, allow_pickle):
+        if not isinstance(allow_pickle, bool):
+            raise TypeError('Argument: allow_pickle must be a Python boolean object.')
+
+        # only the legacy GridFS objects were pickled, disable it for untrusted server.
+        self._allow_pickle = allow_pickle
+        return None
+
+    @property
+    def spectral_dtype(self):
+        return self._spectral_dtype
+
+    @spectral_dtype.setter
+    def spectral_dtype(self, spectral_dtype):
+        if not isinstance(spectral_dtype, str):
+            raise TypeError('Argument: spectral_dtype must be a Python string object.')
+
+        spectral_dtype = spectral_dtype.lower()
+        if spectral_dtype not in self.available_spectral_dtypes:
+            raise ValueError('Argument: spectral_dtype must be one of {0}.'\
+                    .format(self.available_spectral_dtypes))
+
+        # float16 and int16 (scaled quantization) are lossy, float32 keeps the source precision.
+        self._spectral_dtype = spectral_dtype
+        return None
+
+    @property
+    def available_spectral_dtypes(self):
+        return ('float64', 'float32', 'float16', 'int16')
+
+    @property
+    def spectral_compression(self):
+        return self._spectral_compression
+
+    @spectral_compression.setter
+    def spectral_compression(self, spectral_compression):
+        if spectral_compression is not None:
+            if not isinstance(spectral_compression, str):
+                raise TypeError('Argument: spectral_compression must be a Python string object.')
+
+            spectral_compression = spectral_compression.lower()
+
+        if spectral_compression not in self.available_spectral_compressions:
+            raise ValueError('Argument: spectral_compression must be one of {0}.'\
+                    .format(self.available_spectral_compressions))
+
+        self._spectral_compression = spectral_compression
         return None
 
+    @property
+    def available_spectral_compressions(self):
+        return (None, 'zlib', 'delta-zlib')
+
+    @property
+    def spectral_encoding(self):
+        # applied to the GridFS objects and the binary format, the list format is always float64.
+        return {'dtype': self.spectral_dtype,
+                'compression': self.spectral_compression}
+
+    @property
+    def spectral_format(self):
+        # the encoding of the spectral collection, gridfs mode still keep the list copy.
+        spectral_format = 'list'
+        if self.storage_format == 'binary':
+            spectral_format = 'binary'
+
+        return spectral_format
+
     @property
     def docs_num_per_request(self):
         return self._docs_num_per_request
@@ -96,6 +242,85 @@ class HyperspectralDatabase(Database):
         self._docs_num_per_request = docs_num_per_request
         return None
 
+    @property
+    def max_query_bytes(self):
+        return self._max_query_bytes
+
+    @max_query_bytes.setter
+    def max_query_bytes(self, max_query_bytes):
+        if not isinstance(max_query_bytes, int):
+            raise TypeError('Argument: max_query_bytes must be a Python int object.')
+
+        # the BSON document limit of MongoDB is 16MB, keep a margin for the command itself.
+        if max_query_bytes <= 0 or max_query_bytes > 15 * 1024 * 1024:
+            raise ValueError('Argument: max_query_bytes must in [1, 15MB].')
+
+        self._max_query_bytes = max_query_bytes
+        return None
+
+    @property
+    def retrieval_engine(self):
+        return self._retrieval_engine
+
+    @retrieval_engine.setter
+    def retrieval_engine(self, retrieval_engine):
+        if not isinstance(retrieval_engine, str):
+            raise TypeError('Argument: retrieval_engine must be a Python string object.')
+
+        if retrieval_engine not in self.available_retrieval_engines:
+            raise ValueError('Argument: retrieval_engine must be one of {0}.'\
+                    .format(self.available_retrieval_engines))
+
+        self._retrieval_engine = retrieval_engine
+        return None
+
+    @property
+    def cache_bytes(self):
+        if self.spectral_cache is None:
+            return 0
+
+        return self.spectral_cache.max_bytes
+
+    @cache_bytes.setter
+    def cache_bytes(self, cache_bytes):
+        if not isinstance(cache_bytes, int):
+            raise TypeError('Argument: cache_bytes must be a Python int object.')
+
+        if cache_bytes < 0:
+            raise ValueError('Argument: cache_bytes cannot be negative.')
+
+        # zero disables the cache, a new budget keeps the cached entries. The cache keeps
+        # its own copies, the arrays returned by get_data_by_indices are never shared.
+        if cache_bytes == 0:
+            self.spectral_cache = None
+        elif self.spectral_cache is None:
+            self.spectral_cache = SpectralCache(cache_bytes)
+        else:
+            self.spectral_cache.resize(cache_bytes)
+
+        return None
+
+    def _invalidate_cache(self, indices = None):
+        if self.spectral_cache is not None:
+            if indices is None:
+                self.spectral_cache.clear()
+            else:
+                self.spectral_cache.invalidate(indices)
+
+        return None
+
+    @property
+    def available_retrieval_engines(self):
+        # lookup: one aggregation joins the spectral collection, query: two round trips.
+        return ('lookup', 'query')
+
+    def _lookup_spectral(self, data_args):
+        # gridfs objects cannot be joined by the server.
+        if self.gridfs or 'spectral' not in data_args:
+            return False
+
+        return self.retrieval_engine == 'lookup'
+
     @property
     def synchronize_query_size(self):
         return self._synchronize_query_size
@@ -161,6 +386,11 @@ class HyperspectralDatabase(Database):
         lines = 'HyperspectralDatabase version: {0}\n'.format(__version__)
         lines += '  User: {0}\n  Host: {1}\n  Port: {2}\n'.format(self.user, self.host, self.port)
         lines += '  Gridfs mode: {0}\n'.format(self.gridfs)
+        lines += '  Storage format: {0} (dtype={1}, compression={2})\n'.format(
+                self.storage_format, self.spectral_dtype, self.spectral_compression)
+        lines += '  Retrieval engine: {0}\n'.format(self.retrieval_engine)
+        if self.spectral_cache is not None:
+            lines += '  Spectral cache: {0}\n'.format(self.spectral_cache)
         lines += '  Database: {0}\n    Collections:\n'.format(self.db)
         for col in self._collection_list:
             lines += '      {0}\n'.format(col)
@@ -185,14 +415,81 @@ class HyperspectralDatabase(Database):
                 'passwd': self._passwd,
                 'host': self.host,
                 'port': self.port,
-                'gridfs': self.gridfs}
+                'gridfs': self.gridfs,
+                'storage_format': self.storage_format,
+                'allow_pickle': self.allow_pickle}
 
     def close(self):
+        self.detach_mirror()
+        if self.sync_wrapper is not None:
+            self.sync_wrapper.close()
+
         self.database = None
         self.sync_wrapper = None
         return None
 
-    def find(self, query, collection = 'data'):
+    def attach_mirror(self, path, sync = True, check_freshness = True, batch_size = 10000,
+            hint = True):
+
+        if not isinstance(path, str):
+            raise TypeError('Argument: path must be a Python string object.')
+
+        if not isinstance(sync, bool):
+            raise TypeError('Argument: sync must be a Python boolean object.')
+
+        if not isinstance(check_freshness, bool):
+            raise TypeError('Argument: check_freshness must be a Python boolean object.')
+
+        self.detach_mirror()
+        self.local_mirror = LocalMirror(path)
+        # without the freshness check (offline node), the mirror is always read as it is.
+        self.mirror_check_freshness = check_freshness
+        if sync:
+            self.sync_mirror(batch_size = batch_size, hint = hint)
+
+        return self.local_mirror
+
+    def detach_mirror(self):
+        if self.local_mirror is not None:
+            self.local_mirror.close()
+            self.local_mirror = None
+
+        return None
+
+    def sync_mirror(self, batch_size = 10000, hint = True):
+        if self.local_mirror is None:
+            raise RuntimeError('No local mirror is attached, please call attach_mirror first.')
+
+        return self.local_mirror.sync(self, batch_size = batch_size, hint = hint)
+
+    def _mirror_reader(self, data_collection, spectral_collection, data_args):
+        # the mirror keeps the default collections and the MIRROR_FIELDS only.
+        if self.local_mirror is None:
+            return None
+
+        if data_collection != 'data' or spectral_collection != 'spectral':
+            return None
+
+        for args in data_args:
+            if args not in MIRROR_FIELDS:
+                return None
+
+        if self.mirror_check_freshness and not self.local_mirror.is_fresh(self):
+            return None
+
+        return self.local_mirror
+
+    def _mirror_data(self, read, data_args, hint, as_batch):
+        builder = self._batch_builder(as_batch)
+        data = read(self._batch_data_args(data_args, builder), decode = (builder is None))
+        data = self._finish_data(data, builder)
+        if hint:
+            print('Acquiring {0} data in the {1} (local mirror).'.format(len(data),
+                    self.__class__.__name__))
+
+        return data
+
+    def find(self, query, collection = 'data', projection = None):
         if not isinstance(collection, str):
             raise TypeError('Argument: collection must be a Python string object.')
 
@@ -202,9 +499,12 @@ class HyperspectralDatabase(Database):
         if not isinstance(query, dict):
             raise TypeError('The argument: query only accept Python dictionary object.')
 
-        return self.collections[collection.lower()].find(query)
+        if projection is not None and not isinstance(projection, (dict, list, tuple)):
+            raise TypeError('The argument: projection only accept Python dict or list/tuple object.')
 
-    def find_one(self, query, collection = 'data'):
+        return self.collections[collection.lower()].find(query, projection)
+
+    def find_one(self, query, collection = 'data', projection = None):
         if not isinstance(collection, str):
             raise TypeError('Argument: collection must be a Python string object.')
 
@@ -214,7 +514,10 @@ class HyperspectralDatabase(Database):
         if not isinstance(query, dict):
             raise TypeError('The argument: query only accept Python dictionary object.')
 
-        return self.collections[collection.lower()].find_one(query)
+        if projection is not None and not isinstance(projection, (dict, list, tuple)):
+            raise TypeError('The argument: projection only accept Python dict or list/tuple object.')
+
+        return self.collections[collection.lower()].find_one(query, projection)
 
     def count_documents(self, query, collection = 'data'):
         if not isinstance(collection, str):
@@ -230,7 +533,7 @@ class HyperspectralDatabase(Database):
 
     def insert_data(self, file, file_extension = '.json', 
             data_collection = 'data', spectral_collection = 'spectral',
-            data_args = ('datatype', 'species', 'spectral'), certain = False):
+            data_args = ('datatype', 'species', 'spectral'), certain = False, hint = True):
 
         if not isinstance(file, str):
             raise TypeError('Argument: file must be a Python string object.')
@@ -270,6 +573,9 @@ class HyperspectralDatabase(Database):
         if not isinstance(certain, bool):
             raise TypeError('Argument: certain must be a Python boolean object.')
 
+        if not isinstance(hint, bool):
+            raise TypeError('Argument: hint must be a Python boolean object.')
+
         data_document, spectral_document = self._single_data_document(file, data_args, 
                 data_collection, spectral_collection,
                 certain = certain)
@@ -279,8 +585,9 @@ class HyperspectralDatabase(Database):
                 self.collections[spectral_collection].bulk_write([InsertOne(spectral_document)])
 
             self.collections[data_collection].bulk_write([InsertOne(data_document)])
-            print('Successfully insert file:{0} into {1}'.format(file, 
-                    self.__class__.__name__))
+            if hint:
+                print('Successfully insert file:{0} into {1}'.format(file,
+                        self.__class__.__name__))
         else:
             print('Not certain mode, no insertion in the database.')
 
@@ -289,7 +596,8 @@ class HyperspectralDatabase(Database):
     def batch_insert_data(self, directory, file_extension = '.json', 
             data_collection = 'data', spectral_collection = 'spectral',
             data_args = ('datatype', 'species', 'spectral'), batch_size = 10000, 
-            certain = False, progress = True):
+            certain = False, progress = True, num_worker = -1, queue_size = 4,
+            recursive = False, manifest = None, display_interval = 100):
 
         if not isinstance(directory, str):
             raise TypeError('Argument: directory must be a Python string object')
@@ -335,127 +643,72 @@ class HyperspectralDatabase(Database):
         if not isinstance(progress, bool):
              raise TypeError('Argument: progress must be a Python boolean object.')
 
-        json_files = []
-        for f in os.listdir(directory):
-            if f.endswith(file_extension):
-                json_files.append(os.path.join(directory, f))
-
-        file_numbers = len(json_files)
-        if certain:
-            data_col_requests, spectral_col_requests = [], []
-            insert_index = self._get_insert_index()
-            running_index, inner_batch_index = 0, 0
-            for f in json_files:
-                data_document, spectral_document = self._single_data_document(f, data_args, 
-                        data_collection, spectral_collection,
-                        insert_index = insert_index,
-                        certain = certain)
-
-                data_col_requests.append(InsertOne(data_document))
-                if spectral_col_requests is not None:
-                    spectral_col_requests.append(InsertOne(spectral_document))
-
-                insert_index += 1
-                inner_batch_index += 1
-
-                if progress:
-                    running_index += 1
-                    print('Acquring data progress: {0} / {1}'.format(running_index,
-                                                                    file_numbers))
-
-                if inner_batch_index == batch_size:
-                    if len(spectral_col_requests) > 0:
-                        self.collections[spectral_collection].bulk_write(spectral_col_requests)
-                        spectral_col_requests = []
-
-                    if len(data_col_requests) > 0:
-                        self.collections[data_collection].bulk_write(data_col_requests)
-                        print('Sucessfully insert {0} files into {1}'\
-                                .format(len(data_col_requests), self.__class__.__name__))
-
-                        data_col_requests = []
-
-                    inner_batch_index = 0
-                    print('Successfully reset file buffer.')
- 
-            if len(spectral_col_requests) > 0:
-                self.collections[spectral_collection].bulk_write(spectral_col_requests)
-                spectral_col_requests = []
-
-            if len(data_col_requests) > 0:
-                self.collections[data_collection].bulk_write(data_col_requests)
-                print('Sucessfully insert {0} files into {1}'\
-                        .format(len(data_col_requests), self.__class__.__name__))
-
-                data_col_requests = []
-        else:
-            print('Not certain mode, no insertion in the database.')
-
-        return None
-
-    def _get_insert_index(self):
-        insert_index = 0
-        if self.count_documents({}, collection = 'data') > 0:
-            cursur = self.find({}, collection = 'data')
-            for doc in cursur:
-                tmp_index = doc.get('insert_index', -1)
-                try:
-                    tmp_index = int(tmp_index)
-                except ValueError:
-                    tmp_index = 0
-
-                insert_index = max(tmp_index, insert_index)
+        if not isinstance(display_interval, int):
+            raise TypeError('Argument: display_interval must be a Python int object.')
 
-            insert_index += 1
+        if display_interval < 1:
+            raise ValueError('Argument: display_interval cannot be smaller than one.')
 
-        return insert_index
+        if not isinstance(num_worker, int):
+            raise TypeError('Argument: num_worker must be a Python int object.')
 
-    def _single_data_document(self, json_file_path, data_args, 
-            data_collection, spectral_collection,
-            insert_index = None, certain = False):
+        if num_worker != -1:
+            if num_worker < 0:
+                raise ValueError('Argument: num_worker must at least be one.')
 
-        content = {}
-        single_data_document = Template(data_collection)
-        single_spectral_document = Template(spectral_collection) 
-        with open(json_file_path, 'r') as f:
-            contents = json.loads(f.read())
-            f.close()
+        if not isinstance(queue_size, int):
+            raise TypeError('Argument: queue_size must be a Python int object.')
 
-        source_filename = os.path.split(json_file_path)[-1]
-        single_data_document['source_filename'] = source_filename
+        if queue_size <= 0:
+            raise ValueError('Argument: queue_size must at least be one.')
 
-        for args in data_args:
-            args_value = contents.get(args, None)
-            if args_value is not None:
-                if args == 'spectral':
-                    if certain:
-                        gridfs_value = serialize(np.array(args_value,
-                                dtype = np.float64))
-                        gridfs_value = self.fs.put(gridfs_value)
-                        single_data_document['spectral'] = gridfs_value
-
-                    spectral_value = list(np.array(args_value, dtype = np.float64))
-                    single_spectral_document['spectral'] = spectral_value
-                else:
-                    single_data_document[args] = args_value
+        if not isinstance(recursive, bool):
+            raise TypeError('Argument: recursive must be a Python boolean object.')
 
-        if insert_index is None:
-            insert_index = self._get_insert_index()
+        if manifest is not None:
+            if not isinstance(manifest, str):
+                raise TypeError('Argument: manifest must be a Python string object.')
 
-        single_data_document['insert_index'] = insert_index
-        single_spectral_document['insert_index'] = insert_index
+        if certain:
+            if manifest is not None:
+                manifest = IngestManifest(manifest, directory)
+                for start, stop in manifest.pending():
+                    self._rollback_insert_range(start, stop, data_collection, spectral_collection)
+                    manifest.rollback(start)
+                    print('Rollback uncommitted batch: insert_index [{0}, {1}).'.format(start, stop))
+
+                if len(manifest) > 0:
+                    print('Skip {0} committed files recorded in the manifest.'.format(len(manifest)))
+
+            # streaming discovery, committed files are skipped before they are opened.
+            json_files = (f for f in scan_data_files(directory, file_extension, recursive)
+                    if (manifest is None) or (f not in manifest))
+
+            parser = functools.partial(parse_data_entry,
+                                       data_args = data_args,
+                                       data_collection = data_collection,
+                                       spectral_collection = spectral_collection,
+                                       spectral_format = self.spectral_format,
+                                       spectral_encoding = self.spectral_encoding)
+
+            self._ingest_sources(parser, json_files, data_collection, spectral_collection,
+                    batch_size, progress, num_worker = num_worker, queue_size = queue_size,
+                    manifest = manifest, display_interval = display_interval)
+        else:
+            print('Not certain mode, no insertion in the database.')
 
-        return single_data_document, single_spectral_document
+        return None
 
-    def spectral_data_reformation(self, source, target, batch_size = 10000,
-            data_collection = 'data', spectral_collection = 'spectral', 
-            certain = False, hint = True):
+    def insert_ndjson(self, file, data_collection = 'data', spectral_collection = 'spectral',
+            data_args = ('datatype', 'species', 'spectral'), batch_size = 10000,
+            certain = False, progress = True, num_worker = -1, queue_size = 4,
+            display_interval = 100):
 
-        if not isinstance(batch_size, int):
-            raise TypeError('Argument: batch_size must be a Python int object.')
+        if not isinstance(file, str):
+            raise TypeError('Argument: file must be a Python string object.')
 
-        if batch_size < 0:
-            raise ValueError('Argument: batch_size must larger than zero.')
+        if not os.path.isfile(file):
+            raise OSError('No file object in the path:{0}'.format(file))
 
         if not isinstance(data_collection, str):
             raise TypeError('Argument: data_collection must be a Python string object.')
@@ -473,117 +726,71 @@ class HyperspectralDatabase(Database):
 
         spectral_collection = spectral_collection.lower()
 
-        if not isinstance(source, str):
-            raise TypeError('Argument: source must be a Python string object.')
-
-        if not isinstance(target, str):
-            raise TypeError('Argument: target must be a Python string object.')
+        if not isinstance(data_args, (list, tuple)):
+            raise TypeError('Argument: data_args must be a Python list/tuple object.')
 
-        if not isinstance(certain, bool):
-            raise TypeError('Argument: certain must be a Python boolean object.')
+        for e in data_args:
+            if not isinstance(e, str):
+                raise TypeError('Element in argument::data_args must be a Python string object.')
 
-        if not isinstance(hint, bool):
-            raise TypeError('Argument: hint must be a Python boolean object.')
+        if not isinstance(batch_size, int):
+            raise TypeError('Argument: batch_size must be a Python int object.')
 
-        availabel_format = ['gridfs', 'list']
-        if source not in availabel_format:
-            raise ValueError('Invalid selection for argument: source.')
+        if batch_size < 0:
+            raise ValueError('Argument: batch_size must larger than zero.')
 
-        if target not in availabel_format:
-            raise ValueError('Invalid selection for argument: target.')
+        if not isinstance(certain, bool):
+            raise TypeError('Argument: certain must be a Python boolean object.')
 
-        if source == target:
-            raise RuntimeError('Argument: source cannot be same as argument:target.')
+        if not isinstance(progress, bool):
+             raise TypeError('Argument: progress must be a Python boolean object.')
 
-        original_gridfs_state = copy.deepcopy(self.gridfs)
-        if certain:
-            if source == 'gridfs' and target == 'list':
-                self.gridfs = True
-
-                spectral_documents = []
-                doc_nums = self.count_documents({}, collection = data_collection)
-                indices_in_docs = []
-                docs_in_data_collection = self.find({}, collection = data_collection)
-                for doc in docs_in_data_collection:
-                    index_in_doc = doc.get('insert_index', None)
-                    if index_in_doc is None:
-                        raise RuntimeError('Cannot get args:insert_index in doc, please contact developer.')
-                    else:
-                        indices_in_docs.append(index_in_doc)
-
-                splits = doc_nums // batch_size
-                if (doc_nums % batch_size) != 0:
-                    splits += 1
-
-                for split_index in range(splits):
-                    start_index = split_index * batch_size
-                    end_index = (split_index + 1) * batch_size
-                    if end_index > len(indices_in_docs):
-                        end_index = len(indices_in_docs)
-
-                    split_indices = indices_in_docs[start_index: end_index]
-                    contained_spectral_data = self.get_data_by_indices(
-                            split_indices, 
-                            data_args = ('spectral', 'insert_index'),
-                            data_collection = data_collection,
-                            spectral_collection = spectral_collection)
-
-                    requests = []
-                    for doc in contained_spectral_data:
-                        if not isinstance(doc, dict):
-                            raise TypeError('Error datatype for document.')
-
-                        insert_index = doc.get('insert_index', None)
-                        spectral_data = doc.get('spectral', None)
-                        if spectral_data is not None:
-                            spectral_data = list(spectral_data)
-                        else:
-                            warnings.warn('spectral_data in index: {0} cannot transfrom to list.'\
-                                    .format(insert_index))
-                            spectral_data = 'unknown'
-                        
-                        if insert_index is not None:
-                            spectral_document = Template(spectral_collection)
-                            spectral_document['insert_index'] = insert_index
-                            spectral_document['spectral'] = spectral_data
-                            requests.append(InsertOne(spectral_document))
-
-                    if len(requests) > 0:
-                        self.collections[spectral_collection].bulk_write(requests)
+        if not isinstance(display_interval, int):
+            raise TypeError('Argument: display_interval must be a Python int object.')
 
-                    if hint:
-                        print('Successfully write {0} files into collection:{1}, progress: {2}/{3}'\
-                                    .format(len(requests), spectral_collection, split_index + 1, splits))
+        if display_interval < 1:
+            raise ValueError('Argument: display_interval cannot be smaller than one.')
 
-            elif source == 'list' and target == 'gridfs':
-                raise NotImplementedError('Please ask developer for further help.')
-            else:
-                raise ValueError('Method:spectral_data_reformation was not available' + \
-                        ' under the setting.')
+        if not isinstance(num_worker, int):
+            raise TypeError('Argument: num_worker must be a Python int object.')
 
-            if hint:
-                print('From {0} to {1} reformation finish.'.format(source, target))
+        if num_worker != -1:
+            if num_worker < 0:
+                raise ValueError('Argument: num_worker must at least be one.')
 
-            self.gridfs = original_gridfs_state
+        if certain:
+            # one line is one data record, the source_filename is recorded as file:line.
+            parser = functools.partial(parse_data_line,
+                                       data_args = data_args,
+                                       data_collection = data_collection,
+                                       spectral_collection = spectral_collection,
+                                       spectral_format = self.spectral_format,
+                                       spectral_encoding = self.spectral_encoding)
+
+            self._ingest_sources(parser, scan_ndjson_lines(file), data_collection,
+                    spectral_collection, batch_size, progress, num_worker = num_worker,
+                    queue_size = queue_size, display_interval = display_interval)
         else:
-            print('Not certain mode, no reformation process happen.')
+            print('Not certain mode, no insertion in the database.')
 
         return None
 
-    def _delete_gridfs_object(self, object_pointer):
-        if object_pointer != 'unknown':
-            self.fs.delete(object_pointer)
-
-        return None 
+    def insert_arrays(self, spectral, datatypes, species, source_filenames = None,
+            data_collection = 'data', spectral_collection = 'spectral', batch_size = 10000,
+            certain = False, progress = True, queue_size = 4, display_interval = 100):
 
-    def delete_data(self, indices, data_collection = 'data', spectral_collection = 'spectral',
-            batch_size = 10000, display_interval = 100, gridfs_progress = True, certain = False):
+        if not isinstance(spectral, np.ndarray):
+            raise TypeError('Argument: spectral must be a numpy.ndarray object.')
 
-        if not isinstance(indices, (int, list, tuple)):
-            raise TypeError('Argument: indices must be a Python list/tuple object')
+        if spectral.ndim != 2:
+            raise ValueError('Argument: spectral must be a (N, bands) numpy.ndarray.')
 
-        if isinstance(indices, int):
-            indices = [indices]
+        sample_number = spectral.shape[0]
+        datatypes = self._broadcast_array_argument(datatypes, 'datatypes', sample_number)
+        species = self._broadcast_array_argument(species, 'species', sample_number)
+        if source_filenames is not None:
+            source_filenames = self._broadcast_array_argument(source_filenames,
+                    'source_filenames', sample_number)
 
         if not isinstance(data_collection, str):
             raise TypeError('Argument: data_collection must be a Python string object.')
@@ -604,9 +811,14 @@ class HyperspectralDatabase(Database):
         if not isinstance(batch_size, int):
             raise TypeError('Argument: batch_size must be a Python int object.')
 
-        if batch_size < 0 or batch_size > self.docs_num_per_request :
-            raise ValueError('Argument: batch_size must in [0, {0}].'\
-                    .format(self.docs_num_per_request))
+        if batch_size < 0:
+            raise ValueError('Argument: batch_size must larger than zero.')
+
+        if not isinstance(certain, bool):
+            raise TypeError('Argument: certain must be a Python boolean object.')
+
+        if not isinstance(progress, bool):
+             raise TypeError('Argument: progress must be a Python boolean object.')
 
         if not isinstance(display_interval, int):
             raise TypeError('Argument: display_interval must be a Python int object.')
@@ -614,74 +826,495 @@ class HyperspectralDatabase(Database):
         if display_interval < 1:
             raise ValueError('Argument: display_interval cannot be smaller than one.')
 
-        if not isinstance(gridfs_progress, bool):
-            raise TypeError('Argument: gridfs_progress must be a Python boolean object.')
-
-        if not isinstance(certain, bool):
-            raise TypeError('Argument: certain must be a Python boolean object.')
-
         if certain:
-            splits = len(indices) // batch_size
-            if len(indices) % batch_size != 0:
-                splits += 1
+            entries = array_data_entries(spectral, datatypes, species,
+                    source_filenames = source_filenames,
+                    data_collection = data_collection,
+                    spectral_collection = spectral_collection,
+                    spectral_format = self.spectral_format,
+                    spectral_encoding = self.spectral_encoding)
+
+            # the arrays were already in memory, only overlap the encoding with the writing.
+            commit = functools.partial(self._commit_documents,
+                                       data_collection = data_collection,
+                                       spectral_collection = spectral_collection)
+
+            writer = IngestWriter(commit, queue_size = queue_size)
+            writer.start()
+            try:
+                self._dispatch_documents(entries, writer.put, batch_size, progress,
+                        display_interval = display_interval)
+            finally:
+                writer.close()
+        else:
+            print('Not certain mode, no insertion in the database.')
 
-            for split_index in range(splits):
-                start_index = split_index * batch_size
-                end_index = (split_index + 1) * batch_size
-                if end_index > len(indices):
-                    end_index = len(indices)
+        return None
 
-                split_indices = indices[start_index: end_index]
-                data_requests, spectral_requests, need_to_delete_pointers = [], [], []
-                if len(split_indices) > 1:
-                    query = {'insert_index': {'$in': [i for i in split_indices]}}
-                elif len(split_indices) == 1:
-                    query = {'insert_index': split_indices[0]}
-                else:
-                    query = None
+    def _broadcast_array_argument(self, values, name, sample_number):
+        if isinstance(values, str):
+            values = [values] * sample_number
+
+        if not isinstance(values, (list, tuple, np.ndarray)):
+            raise TypeError('Argument: {0} must be a Python string or list/tuple/numpy.ndarray object.'\
+                    .format(name))
+
+        if len(values) != sample_number:
+            raise ValueError('Length of argument: {0} must be same as the sample number ({1}).'\
+                    .format(name, sample_number))
+
+        return [str(v) for v in values]
+
+    def _ingest_sources(self, parser, sources, data_collection, spectral_collection,
+            batch_size, progress, num_worker = -1, queue_size = 4, manifest = None,
+            display_interval = 100):
+
+        commit = functools.partial(self._commit_documents,
+                                   data_collection = data_collection,
+                                   spectral_collection = spectral_collection,
+                                   manifest = manifest)
+
+        if num_worker > 1:
+            # parse/encode in the process pool, write by the thread behind the bounded queue.
+            writer = IngestWriter(commit, queue_size = queue_size)
+            writer.start()
+            try:
+                chunksize = max(1, min(256, batch_size // (num_worker * 4)))
+                with mp.Pool(num_worker) as pool:
+                    entries = pool.imap(parser, sources, chunksize = chunksize)
+                    self._dispatch_documents(entries, writer.put, batch_size,
+                            progress, manifest = manifest, display_interval = display_interval)
+            finally:
+                writer.close()
+        else:
+            entries = (parser(source) for source in sources)
+            self._dispatch_documents(entries, commit, batch_size,
+                    progress, manifest = manifest, display_interval = display_interval)
 
-                if query is not None:
-                    data_docs = self.find(query, collection = data_collection) 
-                    for doc in data_docs:
-                        object_pointer = doc.get('spectral', 'unknown')
-                        need_to_delete_pointers.append(object_pointer)
+        return None
 
-                    data_requests.append(DeleteMany(query))
-                    spectral_requests.append(DeleteMany(query))
+    def _dispatch_documents(self, entries, commit, batch_size, progress, manifest = None,
+            display_interval = 100):
 
-                if len(need_to_delete_pointers) > 0:
-                    gridfs_count = 0
-                    for pointer in need_to_delete_pointers:
-                        self._delete_gridfs_object(pointer)
-                        gridfs_count += 1
+        buffer_sources, buffer_documents, running_index = [], [], 0
+        for source, document in entries:
+            buffer_sources.append(source)
+            buffer_documents.append(document)
+            running_index += 1
+            if progress and running_index % display_interval == 0:
+                print('Acquring data progress: {0} files'.format(running_index))
 
-                        if gridfs_progress:
-                            if gridfs_count % display_interval == 0:
-                                print('Gridfs progress: {0} / {1}'.format(gridfs_count, 
-                                    len(need_to_delete_pointers)))
+            if len(buffer_documents) == batch_size:
+                self._begin_documents(buffer_sources, buffer_documents, manifest)
+                commit(buffer_documents)
+                buffer_sources, buffer_documents = [], []
+                print('Successfully reset file buffer.')
 
-                if len(data_requests) > 0:
-                    self.collections[data_collection].bulk_write(data_requests)
+        if len(buffer_documents) > 0:
+            self._begin_documents(buffer_sources, buffer_documents, manifest)
+            commit(buffer_documents)
 
-                if len(spectral_requests) > 0:
-                    self.collections[spectral_collection].bulk_write(spectral_requests)
+        if progress and running_index % display_interval != 0:
+            print('Acquring data progress: {0} files'.format(running_index))
 
-                print('Successfully delete {0} data in {1} | Split progress: {2} / {3}'\
-                        .format(len(split_indices), self.__class__.__name__, 
-                        split_index + 1, splits))
-        else:
-            print('Not certain mode, no deletion in the database.')
+        return None
+
+    def _begin_documents(self, sources, documents, manifest = None):
+        start = self._assign_insert_index(documents)
+        if manifest is not None:
+            manifest.begin(sources, start, start + len(documents))
 
         return None
 
-    def delete_all(self, data_collection = 'data', spectral_collection = 'spectral',
-            batch_size = 10000, display_interval = 100, gridfs_progress = True, certain = False):
+    def _assign_insert_index(self, documents):
+        insert_index = start = self._get_insert_index(reserve = len(documents))
+        for data_document, spectral_document, _ in documents:
+            data_document['insert_index'] = insert_index
+            if spectral_document is not None:
+                spectral_document['insert_index'] = insert_index
 
-        if not isinstance(data_collection, str):
-            raise TypeError('Argument: data_collection must be a Python string object.')
+            insert_index += 1
 
-        if data_collection.lower() not in self._collection_list:
-            raise ValueError(data_collection, ' is not a valid collection selection.')
+        return start
+
+    def _commit_documents(self, documents, data_collection, spectral_collection,
+            manifest = None):
+
+        data_col_requests, spectral_col_requests = [], []
+        for data_document, spectral_document, gridfs_value in documents:
+            if gridfs_value is not None:
+                # insert_index in the file document let the rollback find orphan GridFS files.
+                data_document['spectral'] = self.fs.put(gridfs_value,
+                        insert_index = data_document['insert_index'])
+
+            data_col_requests.append(InsertOne(data_document))
+            if spectral_document is not None:
+                spectral_col_requests.append(InsertOne(spectral_document))
+
+        if len(spectral_col_requests) > 0:
+            self.collections[spectral_collection].bulk_write(spectral_col_requests)
+
+        if len(data_col_requests) > 0:
+            self.collections[data_collection].bulk_write(data_col_requests)
+            print('Sucessfully insert {0} files into {1}'\
+                    .format(len(data_col_requests), self.__class__.__name__))
+
+        if manifest is not None and len(documents) > 0:
+            manifest.commit(documents[0][0]['insert_index'])
+
+        return None
+
+    def _rollback_insert_range(self, start, stop, data_collection, spectral_collection):
+        query = {'insert_index': {'$gte': start, '$lt': stop}}
+        for doc in self.database['fs.files'].find(query, {'_id': 1}):
+            self.fs.delete(doc['_id'])
+
+        self.collections[spectral_collection].delete_many(query)
+        self.collections[data_collection].delete_many(query)
+        self._invalidate_cache(range(start, stop))
+        return None
+
+    def _get_insert_index(self, reserve = 1):
+        if not isinstance(reserve, int):
+            raise TypeError('Argument: reserve must be a Python int object.')
+
+        if reserve <= 0:
+            raise ValueError('Argument: reserve must at least be one.')
+
+        # the counter document is the single source of insert_index, one atomic $inc
+        # reserves [insert_index, insert_index + reserve) even under concurrent ingest.
+        counters = self.database[self._counter_collection]
+        if counters.find_one({'_id': 'insert_index'}) is None:
+            self._seed_insert_index(counters)
+
+        counter = counters.find_one_and_update({'_id': 'insert_index'},
+                {'$inc': {'next': reserve}},
+                upsert = True,
+                return_document = ReturnDocument.AFTER)
+
+        insert_index = int(counter['next']) - reserve
+        return insert_index
+
+    def _ensure_indexes(self):
+        # $lookup joins on spectral.insert_index, the sorts and range scans use data.insert_index,
+        # create_index is a no-op when the index already exists.
+        if self._indexes_ready:
+            return None
+
+        try:
+            for name in self._collection_list:
+                self.collections[name].create_index('insert_index')
+        except OperationFailure as error:
+            # e.g. read-only credentials, the requests still work without the index.
+            warnings.warn('Cannot create the insert_index index ({0}), the lookups and range scans' \
+                    ' may be slow.'.format(error))
+
+        self._indexes_ready = True
+        return None
+
+    def _seed_insert_index(self, counters):
+        last_doc = self.collections['data'].find_one(
+                {'insert_index': {'$type': 'number'}},
+                {'insert_index': 1},
+                sort = [('insert_index', -1)])
+
+        insert_index = 0
+        if last_doc is not None:
+            insert_index = int(last_doc['insert_index']) + 1
+
+        # $max never moves the counter backward when other processes seed at the same time.
+        try:
+            counters.update_one({'_id': 'insert_index'},
+                    {'$max': {'next': insert_index}},
+                    upsert = True)
+        except DuplicateKeyError:
+            counters.update_one({'_id': 'insert_index'},
+                    {'$max': {'next': insert_index}})
+
+        return None
+
+    def _single_data_document(self, json_file_path, data_args, 
+            data_collection, spectral_collection,
+            insert_index = None, certain = False):
+
+        single_data_document, single_spectral_document, gridfs_value = parse_data_file(
+                json_file_path, data_args, data_collection, spectral_collection,
+                spectral_format = self.spectral_format,
+                spectral_encoding = self.spectral_encoding)
+
+        # only reserve the index when the document is really written.
+        if insert_index is None and certain:
+            insert_index = self._get_insert_index()
+
+        if insert_index is not None:
+            single_data_document['insert_index'] = insert_index
+            single_spectral_document['insert_index'] = insert_index
+
+        if certain and gridfs_value is not None:
+            single_data_document['spectral'] = self.fs.put(gridfs_value,
+                    insert_index = insert_index)
+
+        return single_data_document, single_spectral_document
+
+    def spectral_data_reformation(self, source, target, batch_size = 10000,
+            data_collection = 'data', spectral_collection = 'spectral', 
+            certain = False, hint = True, num_worker = 4, resume = True):
+
+        if not isinstance(batch_size, int):
+            raise TypeError('Argument: batch_size must be a Python int object.')
+
+        if batch_size <= 0:
+            raise ValueError('Argument: batch_size must larger than zero.')
+
+        if not isinstance(data_collection, str):
+            raise TypeError('Argument: data_collection must be a Python string object.')
+
+        if data_collection.lower() not in self._collection_list:
+            raise ValueError(data_collection, ' is not a valid collection selection.')
+
+        data_collection = data_collection.lower()
+
+        if not isinstance(spectral_collection, str):
+            raise TypeError('Argument: spectral_collection must be a Python string object.')
+
+        if spectral_collection.lower() not in self._collection_list:
+            raise ValueError(spectral_collection, ' is not a valid collection selection.')
+
+        spectral_collection = spectral_collection.lower()
+
+        if not isinstance(source, str):
+            raise TypeError('Argument: source must be a Python string object.')
+
+        if not isinstance(target, str):
+            raise TypeError('Argument: target must be a Python string object.')
+
+        if not isinstance(certain, bool):
+            raise TypeError('Argument: certain must be a Python boolean object.')
+
+        if not isinstance(hint, bool):
+            raise TypeError('Argument: hint must be a Python boolean object.')
+
+        if not isinstance(resume, bool):
+            raise TypeError('Argument: resume must be a Python boolean object.')
+
+        if source not in self.available_storage_formats:
+            raise ValueError('Invalid selection for argument: source.')
+
+        if target not in self.available_storage_formats:
+            raise ValueError('Invalid selection for argument: target.')
+
+        if source == target:
+            raise RuntimeError('Argument: source cannot be same as argument:target.')
+
+        if certain:
+            reformation = SpectralReformation(self, source, target,
+                    data_collection = data_collection,
+                    spectral_collection = spectral_collection,
+                    batch_size = batch_size,
+                    num_worker = num_worker,
+                    hint = hint)
+
+            reformation(resume = resume)
+            self._invalidate_cache()
+            if hint:
+                print('From {0} to {1} reformation finish.'.format(source, target))
+        else:
+            print('Not certain mode, no reformation process happen.')
+
+        return None
+
+    def reencode_gridfs(self, dtype = None, compression = None, batch_size = 10000,
+            data_collection = 'data', certain = False, hint = True):
+
+        if dtype is not None:
+            dtype = np.dtype(dtype)
+
+        if compression is not None:
+            if not isinstance(compression, str):
+                raise TypeError('Argument: compression must be a Python string object.')
+
+        if not isinstance(batch_size, int):
+            raise TypeError('Argument: batch_size must be a Python int object.')
+
+        if batch_size <= 0:
+            raise ValueError('Argument: batch_size must larger than zero.')
+
+        if not isinstance(data_collection, str):
+            raise TypeError('Argument: data_collection must be a Python string object.')
+
+        if data_collection.lower() not in self._collection_list:
+            raise ValueError(data_collection, ' is not a valid collection selection.')
+
+        data_collection = data_collection.lower()
+
+        if not isinstance(certain, bool):
+            raise TypeError('Argument: certain must be a Python boolean object.')
+
+        if not isinstance(hint, bool):
+            raise TypeError('Argument: hint must be a Python boolean object.')
+
+        if certain:
+            cursor = self.find({'spectral': {'$type': 'objectId'}}, collection = data_collection,
+                    projection = {'spectral': 1, 'insert_index': 1})
+            requests, old_pointers, counting, skipped = [], [], 0, 0
+            for doc in cursor:
+                pointer, insert_index = doc['spectral'], doc.get('insert_index', None)
+                binary_obj = self.fs.get(pointer).read()
+                if is_encoded_array(binary_obj):
+                    header = inspect_array(binary_obj)
+                    if (dtype is None or header['dtype'] == dtype.newbyteorder('<')) and \
+                            header['compression'] == compression:
+                        skipped += 1
+                        continue
+
+                # the explicit migration path, the legacy pickled objects are loaded only here.
+                spectral_data = deserialize(binary_obj, allow_pickle = True)
+                new_pointer = self.fs.put(serialize(spectral_data, dtype = dtype,
+                        compression = compression), insert_index = insert_index)
+
+                requests.append(UpdateOne({'_id': doc['_id']}, {'$set': {'spectral': new_pointer}}))
+                old_pointers.append(pointer)
+                if len(requests) == batch_size:
+                    counting += self._commit_reencoded_gridfs(requests, old_pointers, data_collection)
+                    requests, old_pointers = [], []
+                    if hint:
+                        print('Successfully re-encode {0} GridFS objects.'.format(counting))
+
+            if len(requests) > 0:
+                counting += self._commit_reencoded_gridfs(requests, old_pointers, data_collection)
+
+            self._invalidate_cache()
+            if hint:
+                print('Re-encode GridFS finish, {0} objects re-encoded and {1} objects skipped.'\
+                        .format(counting, skipped))
+        else:
+            print('Not certain mode, no re-encoding process happen.')
+
+        return None
+
+    def _commit_reencoded_gridfs(self, requests, old_pointers, data_collection):
+        # the old objects are deleted only after the pointers were switched.
+        self.collections[data_collection].bulk_write(requests)
+        for pointer in old_pointers:
+            self._delete_gridfs_object(pointer)
+
+        return len(requests)
+
+    def _delete_gridfs_object(self, object_pointer):
+        if object_pointer != 'unknown':
+            self.fs.delete(object_pointer)
+
+        return None 
+
+    def delete_data(self, indices, data_collection = 'data', spectral_collection = 'spectral',
+            batch_size = 10000, display_interval = 100, gridfs_progress = True, certain = False):
+
+        if not isinstance(indices, (int, list, tuple)):
+            raise TypeError('Argument: indices must be a Python list/tuple object')
+
+        if isinstance(indices, int):
+            indices = [indices]
+
+        if not isinstance(data_collection, str):
+            raise TypeError('Argument: data_collection must be a Python string object.')
+
+        if data_collection.lower() not in self._collection_list:
+            raise ValueError(data_collection, ' is not a valid collection selection.')
+
+        data_collection = data_collection.lower()
+
+        if not isinstance(spectral_collection, str):
+            raise TypeError('Argument: spectral_collection must be a Python string object.')
+
+        if spectral_collection.lower() not in self._collection_list:
+            raise ValueError(spectral_collection, ' is not a valid collection selection.')
+
+        spectral_collection = spectral_collection.lower()
+
+        if not isinstance(batch_size, int):
+            raise TypeError('Argument: batch_size must be a Python int object.')
+
+        if batch_size < 0 or batch_size > self.docs_num_per_request :
+            raise ValueError('Argument: batch_size must in [0, {0}].'\
+                    .format(self.docs_num_per_request))
+
+        if not isinstance(display_interval, int):
+            raise TypeError('Argument: display_interval must be a Python int object.')
+
+        if display_interval < 1:
+            raise ValueError('Argument: display_interval cannot be smaller than one.')
+
+        if not isinstance(gridfs_progress, bool):
+            raise TypeError('Argument: gridfs_progress must be a Python boolean object.')
+
+        if not isinstance(certain, bool):
+            raise TypeError('Argument: certain must be a Python boolean object.')
+
+        if certain:
+            splits = len(indices) // batch_size
+            if len(indices) % batch_size != 0:
+                splits += 1
+
+            for split_index in range(splits):
+                start_index = split_index * batch_size
+                end_index = (split_index + 1) * batch_size
+                if end_index > len(indices):
+                    end_index = len(indices)
+
+                split_indices = indices[start_index: end_index]
+                data_requests, spectral_requests, need_to_delete_pointers = [], [], []
+                if len(split_indices) > 1:
+                    query = {'insert_index': {'$in': [i for i in split_indices]}}
+                elif len(split_indices) == 1:
+                    query = {'insert_index': split_indices[0]}
+                else:
+                    query = None
+
+                if query is not None:
+                    data_docs = self.find(query, collection = data_collection,
+                            projection = {'spectral': 1})
+                    for doc in data_docs:
+                        object_pointer = doc.get('spectral', 'unknown')
+                        need_to_delete_pointers.append(object_pointer)
+
+                    data_requests.append(DeleteMany(query))
+                    spectral_requests.append(DeleteMany(query))
+
+                if len(need_to_delete_pointers) > 0:
+                    gridfs_count = 0
+                    for pointer in need_to_delete_pointers:
+                        self._delete_gridfs_object(pointer)
+                        gridfs_count += 1
+
+                        if gridfs_progress:
+                            if gridfs_count % display_interval == 0:
+                                print('Gridfs progress: {0} / {1}'.format(gridfs_count, 
+                                    len(need_to_delete_pointers)))
+
+                if len(data_requests) > 0:
+                    self.collections[data_collection].bulk_write(data_requests)
+
+                if len(spectral_requests) > 0:
+                    self.collections[spectral_collection].bulk_write(spectral_requests)
+
+                self._invalidate_cache(split_indices)
+
+                print('Successfully delete {0} data in {1} | Split progress: {2} / {3}'\
+                        .format(len(split_indices), self.__class__.__name__, 
+                        split_index + 1, splits))
+        else:
+            print('Not certain mode, no deletion in the database.')
+
+        return None
+
+    def delete_all(self, data_collection = 'data', spectral_collection = 'spectral',
+            batch_size = 10000, display_interval = 100, gridfs_progress = True, certain = False):
+
+        if not isinstance(data_collection, str):
+            raise TypeError('Argument: data_collection must be a Python string object.')
+
+        if data_collection.lower() not in self._collection_list:
+            raise ValueError(data_collection, ' is not a valid collection selection.')
 
         data_collection = data_collection.lower()
 
@@ -706,6 +1339,7 @@ class HyperspectralDatabase(Database):
                              gridfs_progress = gridfs_progress,
                              certain = certain)
 
+            self._invalidate_cache()
             print('Successfully clear all data in {0}'.format(self.__class__.__name__))
         else:
             print('Not certain mode, no deletion in the database.')
@@ -713,7 +1347,7 @@ class HyperspectralDatabase(Database):
         return None
 
     def get_data(self, queries, data_collection = 'data', spectral_collection = 'spectral',
-                data_args = ('datatype', 'species', 'spectral'), hint = True):
+                data_args = ('datatype', 'species', 'spectral'), hint = True, as_batch = False):
 
         if not isinstance(data_collection, str):
             raise TypeError('Argument: data_collection must be a Python string object.')
@@ -739,8 +1373,6 @@ class HyperspectralDatabase(Database):
                 if not isinstance(query, dict):
                     raise TypeError('Argument: query must be a Python ')
 
-            queries = {'$or': queries}
-
         if not isinstance(data_args, (list, tuple)):
             raise TypeError('Argument: data_args must be a Python list/tuple object.')
 
@@ -751,233 +1383,196 @@ class HyperspectralDatabase(Database):
         if not isinstance(hint, bool):
             raise TypeError('Argument: hint must be a Python boolean object.')
 
-        data = self._functional_get_data(queries, data_collection, 
-                spectral_collection, data_args)
+        if not isinstance(as_batch, bool):
+            raise TypeError('Argument: as_batch must be a Python boolean object.')
+
+        builder = self._batch_builder(as_batch)
+        data = self._functional_get_data(self._compile_queries(queries), data_collection, 
+                spectral_collection, self._batch_data_args(data_args, builder), builder = builder)
 
+        data = self._finish_data(data, builder)
         if hint:
             print('Acquiring {0} data in the {1}.'.format(len(data), 
                     self.__class__.__name__))
 
         return data
 
-    def _functional_get_data(self, queries, data_collection, spectral_collection, data_args):
-        data = []
-        if not self.gridfs:
-            original_data_args = copy.deepcopy(data_args)
-            if ('insert_index' not in data_args) and ('spectral' in data_args):
-                data_args = tuple(list(data_args) + ['insert_index'])
+    def _batch_builder(self, as_batch, capacity = 0):
+        # the SpectralBatch rows are decoded into the preallocated matrix of the builder.
+        if as_batch:
+            return SpectralBatchBuilder(capacity = capacity)
 
-        counting, split_queries_mode = 0, False
-        if '$or' in queries.keys():
-            query_size = len(queries['$or'])
-        else:
-            query_size = 1
+        return None
 
-        if query_size > self.docs_num_per_request:
-            split_queries_mode = True
+    def _batch_data_args(self, data_args, builder):
+        if builder is not None and 'insert_index' not in data_args:
+            data_args = tuple(list(data_args) + ['insert_index'])
 
-        if split_queries_mode:
-            query_list = queries['$or']
-            splits = query_size // self.docs_num_per_request
-            if query_size % self.docs_num_per_request != 0:
-                splits += 1
+        return data_args
 
-            break_flag = False
-            for split_index in range(splits):
-                start_index = split_index * self.docs_num_per_request
-                end_index = (split_index + 1) * self.docs_num_per_request
-                if end_index >= query_size:
-                    end_index = query_size
-                    break_flag = True
-
-                tmp_cursor = self.find({'$or': query_list[start_index: end_index]}, 
-                        collection = data_collection)
-                for doc in tmp_cursor:
-                    single_data = {}
-                    for args in data_args:
-                        args_value = doc.get(args, 'unknown')
-                        single_data[args] = args_value
+    def _finish_data(self, data, builder):
+        if builder is None:
+            return data
 
-                    data.append(single_data)
-                    counting += 1
+        builder.extend(data)
+        return builder.build()
 
-                if break_flag:
-                    break
-        else:
-            tmp_cursor = self.find(queries, collection = data_collection)
-            for doc in tmp_cursor:
-                single_data = {}
-                for args in data_args:
-                    args_value = doc.get(args, 'unknown')
-                    single_data[args] = args_value
+    def _compile_queries(self, queries):
+        # $or of equality -> $in, contiguous insert_index -> range, split by the BSON size.
+        return compile_queries(queries, max_query_bytes = self.max_query_bytes)
 
-                data.append(single_data)
-                counting += 1
+    def _functional_get_data(self, queries, data_collection, spectral_collection, data_args,
+            builder = None):
+
+        # queries is the list returned by _compile_queries.
+        if self._lookup_spectral(data_args):
+            return self._lookup_get_data(queries, data_collection, spectral_collection, data_args,
+                    builder = builder)
 
+        docs = list(self._stream_documents(queries, data_collection, data_args))
         if self.sync_wrapper.num_worker <= 1:
-            if counting > self.docs_num_per_request:
+            if len(docs) > self.docs_num_per_request:
                 raise RuntimeError('Too data to grab from {0} in the same time.' + \
                         ' Please properly split your conditions.')
 
-        if 'spectral' in data_args:
-            if self.gridfs:
-                data = self.sync_wrapper(get_spectral_gridfs,
-                                         sync_args = ('docs', ),
-                                         docs = data)
-            else:
-                data = self.sync_wrapper(get_spectral_list,
-                                         sync_args = ('docs', ),
-                                         docs = data,
-                                         original_data_args = original_data_args,
-                                         spectral_collection = spectral_collection)
+        return self._documents_to_data(docs, spectral_collection, data_args, builder = builder)
 
-        return data
+    def _stream_documents(self, queries, data_collection, data_args):
+        seen_ids = set()
+        projection = data_projection(data_args)
+        for query in queries:
+            tmp_cursor = self.find(query, collection = data_collection, projection = projection)
+            for doc in tmp_cursor:
+                # the split queries can match the same document more than once.
+                if len(queries) > 1:
+                    if doc['_id'] in seen_ids:
+                        continue
 
-    def _get_docs_only_with_insert_index(self, queries, data_collection):
-        docs = []
-        if '$or' in queries.keys():
-            list_queries = queries['$or']
-            if len(list_queries) > self.docs_num_per_request:
-                splits = len(list_queries) // self.docs_num_per_request
-                if len(list_queries) % self.docs_num_per_request != 0:
-                    splits += 1
-            else:
-                splits = 1
-        else:
-            splits = 1
+                    seen_ids.add(doc['_id'])
 
-        if splits > 1:
-            break_flag = False
-            for split_index in range(splits):
-                start_index = split_index * self.docs_num_per_request
-                end_index = (split_index + 1) * self.docs_num_per_request
-                if end_index >= len(list_queries):
-                    end_index = len(list_queries)
-                    break_flag = True
-
-                tmp_queries = {'$or': list_queries[start_index: end_index]}
-                tmp_cursor = self.find(tmp_queries, collection = data_collection)
-                for doc in tmp_cursor:
-                    single_data = {}
-                    insert_index = doc.get('insert_index', None)
-                    if insert_index is None:
-                        raise RuntimeError('Cannot get insert index in document, please check source code.')
-
-                    single_data['insert_index'] = insert_index
-                    docs.append(single_data)
-
-                if break_flag:
-                    break
-        else:
-            tmp_cursor = self.find(queries, collection = data_collection)
-            for doc in tmp_cursor:
-                single_data = {}
-                insert_index = doc.get('insert_index', None)
-                if insert_index is None:
-                    raise RuntimeError('Cannot get insert index in document, please check source code.')
+                yield doc
 
-                single_data['insert_index'] = insert_index
-                docs.append(single_data)
+        return None
 
-        return docs
+    def _lookup_get_data(self, queries, data_collection, spectral_collection, data_args,
+            builder = None, limit = True):
 
-    def _efficiently_get_data_by_proper_split(self, 
-            docs_without_spectral, 
-            data_collection,
-            spectral_collection, 
-            data_args):
+        # with a builder, the raw spectral value is decoded directly into the batch.
+        data, seen_ids, counting = [], set(), 0
+        for query in queries:
+            for object_id, single_data in get_spectral_lookup(self, query, data_args,
+                    data_collection = data_collection,
+                    spectral_collection = spectral_collection,
+                    decode = (builder is None)):
 
-        queries = []
-        for doc in docs_without_spectral:
-            index = doc['insert_index']
-            queries.append({'insert_index': int(index)})
+                if len(queries) > 1:
+                    if object_id in seen_ids:
+                        continue
 
-        splits = len(docs_without_spectral) // self.docs_num_per_request
-        if (len(docs_without_spectral) % self.docs_num_per_request) != 0:
-            splits += 1
+                    seen_ids.add(object_id)
 
-        if self.sync_wrapper.num_worker <= 1:
-            data, break_flag = [], False
-            for i in range(splits):
-                start_index = int(i * self.docs_num_per_request)
-                end_index = int((i + 1) * self.docs_num_per_request)
-                if end_index >= len(queries):
-                    end_index = len(queries)
-                    break_flag = True
-
-                split_queries = queries[start_index: end_index]
-                if len(split_queries) > 1:
-                    split_queries = {'$or': split_queries}
+                if builder is None:
+                    data.append(single_data)
                 else:
-                    split_queries = split_queries[0]
+                    builder.extend([single_data])
 
-                split_data = self._functional_get_data(split_queries, data_collection,
-                    spectral_collection, data_args)
+                counting += 1
+                if limit and self.sync_wrapper.num_worker <= 1 and \
+                        counting > self.docs_num_per_request:
 
-                data += split_data
-                if break_flag:
-                    break
-        else:
-            if len(queries) > 0:
-                queries = {'$or': queries}
-                data = self._functional_get_data(queries, data_collection,
-                        spectral_collection, data_args)
-            else:
-                data = []
+                    raise RuntimeError('Too data to grab from {0} in the same time.' + \
+                            ' Please properly split your conditions.')
 
         return data
-        
-    def _properly_split_get_data(self, queries, data_collection, spectral_collection, 
-            data_args, hint):
 
-        if isinstance(queries, (list, tuple)):
-            queries_size = len(queries)
-            if len(queries) > 1:
-                queries = {'$or': queries}
-            elif len(queries) == 1:
-                queries = queries[0] 
-            else:
-                raise RuntimeError('Input queries cannot be a empty list/tuple.')
+    def _documents_to_data(self, docs, spectral_collection, data_args, builder = None,
+            synchronize = True):
+        data = []
+        if not self.gridfs:
+            original_data_args = copy.deepcopy(data_args)
+            if ('insert_index' not in data_args) and ('spectral' in data_args):
+                data_args = tuple(list(data_args) + ['insert_index'])
+
+        for doc in docs:
+            single_data = {}
+            for args in data_args:
+                args_value = doc.get(args, 'unknown')
+                single_data[args] = args_value
+
+            data.append(single_data)
 
-        elif isinstance(queries, dict):
-            if '$or' in queries.keys():
-                queries_size = len(queries['$or'])
+        partitions = [data]
+        if 'spectral' in data_args and not synchronize:
+            # called from the scan threads, the worker pool is not shared between threads.
+            if self.gridfs:
+                partitions = [get_spectral_gridfs(self, data)]
             else:
-                queries_size = 1
-        else:
+                partitions = [get_spectral_list(self, data,
+                                                original_data_args = original_data_args,
+                                                spectral_collection = spectral_collection,
+                                                max_query_bytes = self.max_query_bytes)]
+        elif 'spectral' in data_args:
+            if self.gridfs:
+                partitions = self.sync_wrapper.imap(get_spectral_gridfs,
+                                                    sync_args = ('docs', ),
+                                                    docs = data)
+            else:
+                partitions = self.sync_wrapper.imap(get_spectral_list,
+                                                    sync_args = ('docs', ),
+                                                    docs = data,
+                                                    original_data_args = original_data_args,
+                                                    spectral_collection = spectral_collection,
+                                                    max_query_bytes = self.max_query_bytes)
+
+        # the partitions are streamed in order, the batch is filled while the workers run.
+        data = []
+        for partition in partitions:
+            if builder is None:
+                data += partition
+            else:
+                builder.extend(partition)
+
+        return data
+
+    def _cursor_get_data(self, cursor, spectral_collection, data_args, builder = None,
+            synchronize = True):
+        # the cursor is consumed in docs_num_per_request chunks, no count or index list is built,
+        # a small result is fetched at once and a large one switches to chunked spectral fetching.
+        data, docs = [], []
+        for doc in cursor:
+            docs.append(doc)
+            if len(docs) == self.docs_num_per_request:
+                data += self._documents_to_data(docs, spectral_collection, data_args,
+                        builder = builder, synchronize = synchronize)
+                docs = []
+
+        if len(docs) > 0:
+            data += self._documents_to_data(docs, spectral_collection, data_args,
+                    builder = builder, synchronize = synchronize)
+
+        return data
+
+    def _properly_split_get_data(self, queries, data_collection, spectral_collection, 
+            data_args, hint, as_batch = False, capacity = 0):
+
+        if not isinstance(queries, (dict, list, tuple)):
             raise TypeError('Invalid object type for argument: queries.')
 
-        if queries_size > self.docs_num_per_request:
-            docs_num = 0
-            if '$or' in queries.keys():
-                query_list = queries['$or']
-                splits = queries_size // self.docs_num_per_request
-                if (queries_size % self.docs_num_per_request) != 0:
-                    splits += 1
-
-                break_flag = False
-                for split_index in range(splits):
-                    start_index = split_index * self.docs_num_per_request
-                    end_index = (split_index + 1) * self.docs_num_per_request
-                    if end_index >= queries_size:
-                        end_index = queries_size
-                        break_flag = True
-
-                    docs_num += self.count_documents({'$or': query_list[start_index: end_index]},
-                            collection = data_collection)
-            else:
-                raise RuntimeError('Cannot correctly split queries, please contact developer.')
-        else:
-            docs_num = self.count_documents(queries, collection = data_collection)
+        if not isinstance(as_batch, bool):
+            raise TypeError('Argument: as_batch must be a Python boolean object.')
 
-        if docs_num > self.docs_num_per_request:
-            tmp_docs = self._get_docs_only_with_insert_index(queries, data_collection)
-            data = self._efficiently_get_data_by_proper_split(tmp_docs,
-                    data_collection, spectral_collection, data_args)
+        # single pass: one cursor per compiled query, no count_documents or index pre-pass.
+        queries = self._compile_queries(queries)
+        builder = self._batch_builder(as_batch, capacity = capacity)
+        data_args = self._batch_data_args(data_args, builder)
+        if self._lookup_spectral(data_args):
+            data = self._lookup_get_data(queries, data_collection, spectral_collection, data_args,
+                    builder = builder, limit = False)
         else:
-            data = self._functional_get_data(queries, data_collection, 
-                    spectral_collection, data_args)
+            data = self._cursor_get_data(self._stream_documents(queries, data_collection, data_args),
+                    spectral_collection, data_args, builder = builder)
 
+        data = self._finish_data(data, builder)
         if hint:
             print('Acquiring {0} data in the {1}.'.format(len(data),
                     self.__class__.__name__))
@@ -985,16 +1580,94 @@ class HyperspectralDatabase(Database):
         return data
 
     def get_all_data(self, data_collection = 'data', spectral_collection = 'spectral',
-            data_args = ('datatype', 'species', 'spectral'), hint = True):
+            data_args = ('datatype', 'species', 'spectral'), hint = True, as_batch = False,
+            scan_worker = 1):
+
+        if not isinstance(scan_worker, int):
+            raise TypeError('Argument: scan_worker must be a Python int object.')
+
+        if scan_worker <= 0:
+            raise ValueError('Argument: scan_worker must at least be one.')
+
+        mirror = self._mirror_reader(data_collection, spectral_collection, data_args)
+        if mirror is not None:
+            return self._mirror_data(mirror.get_all_data, data_args, hint, as_batch)
+
+        if scan_worker > 1:
+            return self._parallel_scan_get_data(data_collection, spectral_collection, data_args,
+                    hint, as_batch, scan_worker)
 
         return self._properly_split_get_data({}, 
                 data_collection, 
                 spectral_collection, 
-                data_args, hint)
+                data_args, hint, as_batch = as_batch)
+
+    def _scan_ranges(self, data_collection, scan_worker):
+        # contiguous insert_index ranges from the two ends of the index, no pre-pass
+        # over the documents is needed.
+        bounds = []
+        for direction in (1, -1):
+            doc = self.collections[data_collection].find_one(
+                    {'insert_index': {'$type': 'number'}},
+                    {'_id': 0, 'insert_index': 1},
+                    sort = [('insert_index', direction)])
+
+            if doc is None:
+                return []
+
+            bounds.append(int(doc['insert_index']))
+
+        low, high = bounds[0], bounds[1] + 1
+        step = -(-(high - low) // scan_worker)
+        return [{'insert_index': {'$gte': start, '$lt': min(start + step, high)}}
+                for start in range(low, high, step)]
+
+    def _scan_range_data(self, query, data_collection, spectral_collection, data_args):
+        sort = [('insert_index', 1)]
+        if self._lookup_spectral(data_args):
+            return [single_data for _, single_data in get_spectral_lookup(self, query, data_args,
+                    data_collection = data_collection,
+                    spectral_collection = spectral_collection,
+                    sort = sort)]
+
+        cursor = self.collections[data_collection].find(query, data_projection(data_args),
+                sort = sort)
+
+        return self._cursor_get_data(cursor, spectral_collection, data_args, synchronize = False)
+
+    def _parallel_scan_get_data(self, data_collection, spectral_collection, data_args,
+            hint, as_batch, scan_worker):
+
+        # every thread scans one range with its own cursor on the shared connection pool,
+        # the documents without a numeric insert_index are scanned as the last range.
+        builder = self._batch_builder(as_batch)
+        data_args = self._batch_data_args(data_args, builder)
+        queries = self._scan_ranges(data_collection, scan_worker)
+        queries.append({'insert_index': {'$not': {'$type': 'number'}}})
+
+        data = []
+        with ThreadPoolExecutor(max_workers = scan_worker) as executor:
+            futures = [executor.submit(self._scan_range_data, query, data_collection,
+                    spectral_collection, data_args) for query in queries]
+
+            # the ranges are merged in the insert_index order.
+            for future in futures:
+                range_data = future.result()
+                if builder is None:
+                    data += range_data
+                else:
+                    builder.extend(range_data)
+
+        data = self._finish_data(data, builder)
+        if hint:
+            print('Acquiring {0} data in the {1}.'.format(len(data),
+                    self.__class__.__name__))
+
+        return data
 
     def get_data_by_indices(self, indices, 
             data_collection = 'data', spectral_collection = 'spectral', 
-            data_args = ('datatype', 'species', 'spectral'), hint = True):
+            data_args = ('datatype', 'species', 'spectral'), hint = True, as_batch = False):
  
        if not isinstance(indices, (int, list, tuple)):
             raise TypeError('Argument: indices must be a Python list/tuple object')
@@ -1002,6 +1675,15 @@ class HyperspectralDatabase(Database):
        if isinstance(indices, int):
             indices = [indices]
 
+       mirror = self._mirror_reader(data_collection, spectral_collection, data_args)
+       if mirror is not None:
+           return self._mirror_data(functools.partial(mirror.get_data_by_indices, indices),
+                   data_args, hint, as_batch)
+
+       if self.spectral_cache is not None:
+           return self._cached_get_data_by_indices(indices, data_collection, spectral_collection,
+                   data_args, hint, as_batch)
+
        queries = []
        for index in indices:
            queries.append({'insert_index': index})
@@ -1009,11 +1691,49 @@ class HyperspectralDatabase(Database):
        return self._properly_split_get_data(queries,
                 data_collection, 
                 spectral_collection, 
-                data_args, hint)
+                data_args, hint, as_batch = as_batch, capacity = len(indices))
+
+    def _cached_get_data_by_indices(self, indices, data_collection, spectral_collection,
+            data_args, hint, as_batch):
+
+        # the hits are served before any request, only the missing indices are queried.
+        indices = sorted(set(int(index) for index in indices))
+        builder = self._batch_builder(as_batch, capacity = len(indices))
+        fields = tuple(self._batch_data_args(data_args, builder))
+        prefix = (self.storage_format, data_collection.lower(), spectral_collection.lower())
+        data_by_index, missing_indices = {}, []
+        for index in indices:
+            single_data = self.spectral_cache.get(prefix + (index, ), fields)
+            if single_data is None:
+                missing_indices.append(index)
+            else:
+                data_by_index[index] = single_data
+
+        if len(missing_indices) > 0:
+            fetch_args = fields
+            if 'insert_index' not in fetch_args:
+                fetch_args = tuple(list(fetch_args) + ['insert_index'])
+
+            missing_data = self._properly_split_get_data({'insert_index': {'$in': missing_indices}},
+                    data_collection, spectral_collection, fetch_args, False)
+
+            for single_data in missing_data:
+                index = single_data['insert_index']
+                self.spectral_cache.put(prefix + (index, ), single_data)
+                data_by_index[index] = {field: single_data[field] for field in fields}
+
+        # the same insert_index order as the indexed $in query of the uncached path.
+        data = [data_by_index[index] for index in sorted(data_by_index.keys())]
+        data = self._finish_data(data, builder)
+        if hint:
+            print('Acquiring {0} data in the {1}.'.format(len(data),
+                    self.__class__.__name__))
+
+        return data
 
     def get_data_by_index_range(self, start, stop = None, step = None,
                 data_collection = 'data', spectral_collection = 'spectral',
-                data_args = ('datatype', 'species', 'spectral'), hint = True):
+                data_args = ('datatype', 'species', 'spectral'), hint = True, as_batch = False):
 
         if not isinstance(start, int):
             raise TypeError('Input argument must be a Python int object.')
@@ -1031,15 +1751,79 @@ class HyperspectralDatabase(Database):
             stop = copy.deepcopy(start)
             start = 0
 
-        indices = [i for i in range(start, stop, step)]
-        return self.get_data_by_indices(indices, data_collection = data_collection,
-                                 spectral_collection = spectral_collection,
-                                 data_args = data_args,
-                                 hint = hint) 
+        if not isinstance(stop, int):
+            raise TypeError('Input argument must be a Python int object.')
+
+        if not isinstance(step, int):
+            raise TypeError('Input argument must be a Python int object.')
+
+        if step == 0:
+            raise ValueError('Argument: step cannot be zero.')
+
+        if not isinstance(data_collection, str):
+            raise TypeError('Argument: data_collection must be a Python string object.')
+
+        if data_collection.lower() not in self._collection_list:
+            raise ValueError(data_collection, ' is not a valid collection selection.')
+
+        data_collection = data_collection.lower()
+
+        if not isinstance(spectral_collection, str):
+            raise TypeError('Argument: spectral_collection must be a Python string object.')
+
+        if spectral_collection.lower() not in self._collection_list:
+            raise ValueError(spectral_collection, ' is not a valid collection selection.')
+
+        spectral_collection = spectral_collection.lower()
+
+        if not isinstance(hint, bool):
+            raise TypeError('Argument: hint must be a Python boolean object.')
+
+        if not isinstance(as_batch, bool):
+            raise TypeError('Argument: as_batch must be a Python boolean object.')
+
+        mirror = self._mirror_reader(data_collection, spectral_collection, data_args)
+        if mirror is not None:
+            return self._mirror_data(functools.partial(mirror.get_data_by_index_range,
+                    start, stop, step), data_args, hint, as_batch)
+
+        data = []
+        query, direction = index_range_query(start, stop, step)
+        builder = self._batch_builder(as_batch,
+                capacity = 0 if query is None else len(range(start, stop, step)))
+
+        data_args = self._batch_data_args(data_args, builder)
+        if query is not None and self._lookup_spectral(data_args):
+            cursor = get_spectral_lookup(self, query, data_args,
+                    data_collection = data_collection,
+                    spectral_collection = spectral_collection,
+                    sort = [('insert_index', direction)],
+                    batch_size = self.docs_num_per_request,
+                    decode = (builder is None))
+
+            for _, single_data in cursor:
+                if builder is None:
+                    data.append(single_data)
+                else:
+                    builder.extend([single_data])
+        elif query is not None:
+            cursor = self.collections[data_collection].find(query,
+                    data_projection(data_args),
+                    sort = [('insert_index', direction)],
+                    batch_size = self.docs_num_per_request)
+
+            data = self._cursor_get_data(cursor, spectral_collection, data_args, builder = builder)
+
+        data = self._finish_data(data, builder)
+        if hint:
+            print('Acquiring {0} data in the {1}.'.format(len(data),
+                    self.__class__.__name__))
+
+        return data
 
     def get_data_by_datatypes(self, datatypes, 
             data_collection = 'data', spectral_collection = 'spectral',
-            data_args = ('datatype', 'species', 'spectral'), hint = True):
+            data_args = ('datatype', 'species', 'spectral'), hint = True, as_batch = False):
 
         if not isinstance(datatypes, (str, list, tuple)):
             raise TypeError('Arguemnt: datatypes must be a Python string or list/tuple object.')
@@ -1051,6 +1835,11 @@ class HyperspectralDatabase(Database):
             if not isinstance(e, str):
                 raise TypeError('Element in argument:datatypes must be a Python string object.')
 
+        mirror = self._mirror_reader(data_collection, spectral_collection, data_args)
+        if mirror is not None:
+            return self._mirror_data(functools.partial(mirror.get_data_by_field, 'datatype', datatypes),
+                    data_args, hint, as_batch)
+
         queries = []
         for datatype in datatypes:
             queries.append({'datatype': datatype})
@@ -1058,11 +1847,11 @@ class HyperspectralDatabase(Database):
         return self._properly_split_get_data(queries,
                  data_collection,
                  spectral_collection,
-                 data_args, hint)
+                 data_args, hint, as_batch = as_batch)
 
     def get_data_by_species(self, species, 
             data_collection = 'data', spectral_collection = 'spectral',
-            data_args = ('datatype', 'species', 'spectral'), hint = True):
+            data_args = ('datatype', 'species', 'spectral'), hint = True, as_batch = False):
 
         if not isinstance(species, (str, list, tuple)):
             raise TypeError('Arguemnt: species must be a Python string or list/tuple object.')
@@ -1074,6 +1863,11 @@ class HyperspectralDatabase(Database):
             if not isinstance(s, str):
                 raise TypeError('Element in argument:species must be a Python string object.')
 
+        mirror = self._mirror_reader(data_collection, spectral_collection, data_args)
+        if mirror is not None:
+            return self._mirror_data(functools.partial(mirror.get_data_by_field, 'species', species),
+                    data_args, hint, as_batch)
+
         queries = []
         for s in species:
             queries.append({'species': s})
@@ -1081,7 +1875,278 @@ class HyperspectralDatabase(Database):
         return self._properly_split_get_data(queries,
                  data_collection,
                  spectral_collection,
-                 data_args, hint)
+                 data_args, hint, as_batch = as_batch)
+
+    def sample_data(self, n = None, ratio = None, stratify_by = None, seed = None, queries = None,
+            data_collection = 'data', spectral_collection = 'spectral',
+            data_args = ('datatype', 'species', 'spectral'), hint = True, as_batch = False):
+
+        if (n is None) == (ratio is None):
+            raise ValueError('Exactly one of argument: n and ratio must be set.')
+
+        if n is not None:
+            if not isinstance(n, int):
+                raise TypeError('Argument: n must be a Python int object.')
+
+            if n < 0:
+                raise ValueError('Argument: n cannot be negative.')
+
+        if ratio is not None:
+            if not isinstance(ratio, (int, float)):
+                raise TypeError('Argument: ratio must be a Python float object.')
+
+            if ratio < 0. or ratio > 1.:
+                raise ValueError('Argument: ratio must in [0, 1].')
+
+        if stratify_by not in (None, 'datatype', 'species'):
+            raise ValueError('Argument: stratify_by must be None, datatype or species.')
+
+        if seed is not None and not isinstance(seed, int):
+            raise TypeError('Argument: seed must be a Python int object.')
+
+        if queries is None:
+            queries = {}
+
+        if not isinstance(queries, dict):
+            raise TypeError('Argument: queries must be a Python dict object.')
+
+        if not isinstance(data_collection, str):
+            raise TypeError('Argument: data_collection must be a Python string object.')
+
+        if data_collection.lower() not in self._collection_list:
+            raise ValueError(data_collection, ' is not a valid collection selection.')
+
+        data_collection = data_collection.lower()
+
+        # with stratify_by, n is the sample number of every stratum (balanced) and ratio is
+        # applied to every stratum (proportional).
+        strata = [(queries, None)]
+        if stratify_by is not None:
+            strata = self._sampling_strata(queries, stratify_by, data_collection)
+
+        indices = []
+        for stratum_query, stratum_number in strata:
+            if stratum_number is None:
+                stratum_number = self.count_documents(stratum_query, collection = data_collection)
+
+            size = n
+            if ratio is not None:
+                size = int(round(stratum_number * ratio))
+
+            size = min(size, stratum_number)
+            if size > 0:
+                indices += self._sample_indices(stratum_query, size, seed, data_collection)
+
+        if len(indices) > 0:
+            data = self._properly_split_get_data({'insert_index': {'$in': indices}},
+                    data_collection,
+                    spectral_collection,
+                    data_args, False, as_batch = as_batch, capacity = len(indices))
+        else:
+            data = self._finish_data([], self._batch_builder(as_batch))
+
+        if hint:
+            print('Sampling {0} data in the {1}.'.format(len(data), self.__class__.__name__))
+
+        return data
+
+    def _sampling_strata(self, queries, stratify_by, data_collection):
+        pipeline = [{'$match': queries},
+                    {'$group': {'_id': '$' + stratify_by, 'count': {'$sum': 1}}},
+                    {'$sort': {'_id': 1}}]
+
+        strata = []
+        for doc in self.collections[data_collection].aggregate(pipeline):
+            stratum_query = {'$and': [queries, {stratify_by: doc['_id']}]}
+            strata.append((stratum_query, doc['count']))
+
+        return strata
+
+    def _sample_indices(self, query, size, seed, data_collection):
+        # only insert_index is sent back, the spectra of the chosen documents are fetched later.
+        pipeline = [{'$match': query}]
+        if seed is None:
+            pipeline.append({'$sample': {'size': size}})
+        else:
+            # two rounds of multiplicative hashing with the seed added in between, the operands
+            # are reduced to 31 bits so the products stay in int64.
+            key = {'$mod': [{'$multiply': [{'$mod': ['$insert_index', 2 ** 31]}, 2654435761]}, 2 ** 31]}
+            key = {'$mod': [{'$add': [key, seed % (2 ** 31)]}, 2 ** 31]}
+            pipeline.append({'$project': {'insert_index': 1,
+                    '_sampling_key': {'$mod': [{'$multiply': [key, 2246822519]}, 2 ** 32]}}})
+            pipeline.append({'$sort': {'_sampling_key': 1, 'insert_index': 1}})
+            pipeline.append({'$limit': size})
+
+        pipeline.append({'$project': {'_id': 0, 'insert_index': 1}})
+        indices = []
+        for doc in self.collections[data_collection].aggregate(pipeline, allowDiskUse = True):
+            if doc.get('insert_index', None) is not None:
+                indices.append(int(doc['insert_index']))
+
+        return indices
+
+    def iter_data(self, queries, data_collection = 'data', spectral_collection = 'spectral',
+            data_args = ('datatype', 'species', 'spectral'), batch_size = 10000, as_batch = False):
+
+        if not isinstance(data_collection, str):
+            raise TypeError('Argument: data_collection must be a Python string object.')
+
+        if data_collection.lower() not in self._collection_list:
+            raise ValueError(data_collection, ' is not a valid collection selection.')
+
+        data_collection = data_collection.lower()
+
+        if not isinstance(spectral_collection, str):
+            raise TypeError('Argument: spectral_collection must be a Python string object.')
+
+        if spectral_collection.lower() not in self._collection_list:
+            raise ValueError(spectral_collection, ' is not a valid collection selection.')
+
+        spectral_collection = spectral_collection.lower()
+
+        if not isinstance(data_args, (list, tuple)):
+            raise TypeError('Argument: data_args must be a Python list/tuple object.')
+
+        for e in data_args:
+            if not isinstance(e, str):
+                raise TypeError('Element in argument::data_args must be a Python string object.')
+
+        if not isinstance(batch_size, int):
+            raise TypeError('Argument: batch_size must be a Python int object.')
+
+        if batch_size <= 0:
+            raise ValueError('Argument: batch_size must larger than zero.')
+
+        if not isinstance(as_batch, bool):
+            raise TypeError('Argument: as_batch must be a Python boolean object.')
+
+        batches = self._iter_data_batches(self._compile_queries(queries), data_collection,
+                spectral_collection, data_args, batch_size, as_batch)
+
+        return self._prefetch_batches(batches)
+
+    def iter_all_data(self, data_collection = 'data', spectral_collection = 'spectral',
+            data_args = ('datatype', 'species', 'spectral'), batch_size = 10000, as_batch = False):
+
+        return self.iter_data({}, data_collection = data_collection,
+                spectral_collection = spectral_collection,
+                data_args = data_args,
+                batch_size = batch_size,
+                as_batch = as_batch)
+
+    def export_to_memmap(self, queries, path, append = False, data_collection = 'data',
+            spectral_collection = 'spectral', batch_size = 10000, dtype = None, hint = True):
+
+        if not isinstance(queries, (dict, list, tuple)):
+            raise TypeError('Argument: queries must be a Python dict or list/tuple object.')
+
+        if not isinstance(path, str):
+            raise TypeError('Argument: path must be a Python string object.')
+
+        if not isinstance(append, bool):
+            raise TypeError('Argument: append must be a Python boolean object.')
+
+        if not isinstance(data_collection, str):
+            raise TypeError('Argument: data_collection must be a Python string object.')
+
+        if data_collection.lower() not in self._collection_list:
+            raise ValueError(data_collection, ' is not a valid collection selection.')
+
+        data_collection = data_collection.lower()
+
+        if not isinstance(spectral_collection, str):
+            raise TypeError('Argument: spectral_collection must be a Python string object.')
+
+        if spectral_collection.lower() not in self._collection_list:
+            raise ValueError(spectral_collection, ' is not a valid collection selection.')
+
+        spectral_collection = spectral_collection.lower()
+
+        # the quantized int16 is a storage format only, the exported spectra are floating point.
+        if dtype not in (None, 'float64', 'float32', 'float16'):
+            raise ValueError('Argument: dtype must be one of (None, float64, float32, float16).')
+
+        export = MemmapExport(self, path,
+                data_collection = data_collection,
+                spectral_collection = spectral_collection,
+                batch_size = batch_size,
+                dtype = dtype,
+                hint = hint)
+
+        return export(queries, append = append)
+
+    def _prefetch_batches(self, batches):
+        # the next batch (cursor reading and spectral fetching) is built while the caller
+        # is processing the current one, at most two batches are kept in memory.
+        with ThreadPoolExecutor(max_workers = 1) as executor:
+            pending = executor.submit(next, batches, None)
+            try:
+                while True:
+                    batch = pending.result()
+                    if batch is None:
+                        break
+
+                    pending = executor.submit(next, batches, None)
+                    yield batch
+            finally:
+                pending.cancel()
+                if not pending.cancelled():
+                    pending.exception()
+
+                batches.close()
+
+        return None
+
+    def _iter_data_batches(self, queries, data_collection, spectral_collection, data_args,
+            batch_size, as_batch):
+
+        lookup = self._lookup_spectral(data_args)
+        if as_batch and 'insert_index' not in data_args:
+            data_args = tuple(list(data_args) + ['insert_index'])
+
+        chunk, seen_ids = [], set()
+        for query in queries:
+            if lookup:
+                cursor = get_spectral_lookup(self, query, data_args,
+                        data_collection = data_collection,
+                        spectral_collection = spectral_collection,
+                        batch_size = batch_size,
+                        decode = not as_batch)
+            else:
+                cursor = ((doc['_id'], doc) for doc in self.collections[data_collection]\
+                        .find(query, data_projection(data_args), batch_size = batch_size))
+
+            for object_id, doc in cursor:
+                # only the split queries can match the same document more than once.
+                if len(queries) > 1:
+                    if object_id in seen_ids:
+                        continue
+
+                    seen_ids.add(object_id)
+
+                chunk.append(doc)
+                if len(chunk) == batch_size:
+                    yield self._iter_chunk_data(chunk, lookup, spectral_collection, data_args,
+                            as_batch)
+
+                    chunk = []
+
+        if len(chunk) > 0:
+            yield self._iter_chunk_data(chunk, lookup, spectral_collection, data_args, as_batch)
+
+        return None
+
+    def _iter_chunk_data(self, chunk, lookup, spectral_collection, data_args, as_batch):
+        builder = self._batch_builder(as_batch, capacity = len(chunk))
+        if lookup:
+            data = chunk
+            if builder is not None:
+                builder.extend(chunk)
+                data = []
+        else:
+            data = self._documents_to_data(chunk, spectral_collection, data_args, builder = builder)
+
+        return self._finish_data(data, builder)
 
     def get_indices(self, queries, collection = 'data'):
         if not isinstance(queries, (dict, list, tuple)):
@@ -1092,20 +2157,28 @@ class HyperspectralDatabase(Database):
                 if not isinstance(query, dict):
                     raise TypeError('Argument: query must be a Python ')
 
-            queries = {'$or': queries}
-
         if not isinstance(collection, str):
             raise TypeError('Argument: collection must be a Python string object.')
 
         if collection.lower() not in self._collection_list:
             raise ValueError(collection, ' is not a valid collection selection.')
 
-        indices = []
-        tmp_cursor = self.find(queries, collection = collection)
-        for doc in tmp_cursor:
-            index = doc.get('insert_index', None)
-            if index is not None:
-                indices.append(int(index))
+        queries = self._compile_queries(queries)
+
+        indices, seen_indices = [], set()
+        for query in queries:
+            tmp_cursor = self.find(query, collection = collection,
+                    projection = {'_id': 0, 'insert_index': 1})
+            for doc in tmp_cursor:
+                index = doc.get('insert_index', None)
+                if index is not None:
+                    if len(queries) > 1:
+                        if index in seen_indices:
+                            continue
+
+                        seen_indices.add(index)
+
+                    indices.append(int(index))
 
         return indices
 
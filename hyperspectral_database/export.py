@@ -0,0 +1,258 @@
+import os
+import json
+import struct
+
+import numpy as np
+
+from .batch import SpectralBatch
+
+
+__all__ = ['MemmapExport', 'load_memmap_dataset']
+
+
+# fixed-size .npy header (format version 1.0), the shape can be rewritten in place when appending.
+_NPY_MAGIC = b'\x93NUMPY\x01\x00'
+_NPY_HEADER_SIZE = 128
+_METADATA_FILE = 'metadata.json'
+_COLUMNS = {'insert_index': np.dtype('<i8'),
+            'datatype': np.dtype('<i4'),
+            'species': np.dtype('<i4')}
+
+
+def _column_file(path, name):
+    return os.path.join(path, '{0}.npy'.format(name))
+
+def _write_npy_header(f, dtype, shape):
+    header = "{{'descr': '{0}', 'fortran_order': False, 'shape': {1}, }}"\
+            .format(np.lib.format.dtype_to_descr(dtype), repr(tuple(shape)))
+
+    size = _NPY_HEADER_SIZE - len(_NPY_MAGIC) - 2
+    if len(header) + 1 > size:
+        raise ValueError('The .npy header of shape: {0} is too long.'.format(shape))
+
+    f.seek(0)
+    f.write(_NPY_MAGIC + struct.pack('<H', size) + (header.ljust(size - 1) + '\n').encode('latin1'))
+    return None
+
+def _resize_npy(file_path, dtype, shape, capacity):
+    # the file holds capacity rows, the header records only the first shape[0] rows.
+    row_bytes = int(np.prod(shape[1: ], dtype = np.int64)) * dtype.itemsize
+    mode = 'r+b' if os.path.isfile(file_path) else 'w+b'
+    with open(file_path, mode) as f:
+        _write_npy_header(f, dtype, shape)
+        f.truncate(_NPY_HEADER_SIZE + row_bytes * capacity)
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+
+    return None
+
+def _open_rows(file_path, dtype, tail_shape, start, stop):
+    if stop <= start:
+        return None
+
+    row_bytes = int(np.prod(tail_shape, dtype = np.int64)) * dtype.itemsize
+    return np.memmap(file_path, dtype = dtype, mode = 'r+',
+            offset = _NPY_HEADER_SIZE + row_bytes * start,
+            shape = (stop - start, ) + tuple(tail_shape))
+
+def _read_metadata(path):
+    with open(os.path.join(path, _METADATA_FILE), 'r') as f:
+        metadata = json.loads(f.read())
+        f.close()
+
+    return metadata
+
+def _write_metadata(path, metadata):
+    # written after the arrays are flushed, the replace makes the new count visible atomically.
+    file_path = os.path.join(path, _METADATA_FILE)
+    with open(file_path + '.tmp', 'w') as f:
+        f.write(json.dumps(metadata, indent = 2))
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+
+    os.replace(file_path + '.tmp', file_path)
+    return None
+
+
+class MemmapExport:
+    def __init__(self, database, path, data_collection = 'data', spectral_collection = 'spectral',
+            batch_size = 10000, dtype = None, hint = True):
+
+        if not isinstance(path, str):
+            raise TypeError('Argument: path must be a Python string object.')
+
+        if not isinstance(batch_size, int):
+            raise TypeError('Argument: batch_size must be a Python int object.')
+
+        if batch_size <= 0:
+            raise ValueError('Argument: batch_size must larger than zero.')
+
+        if not isinstance(hint, bool):
+            raise TypeError('Argument: hint must be a Python boolean object.')
+
+        self.database = database
+        self.path = path
+        self.data_collection = data_collection
+        self.spectral_collection = spectral_collection
+        self.batch_size = batch_size
+        self.dtype = None if dtype is None else np.dtype(dtype).newbyteorder('<')
+        self.hint = hint
+
+    def __repr__(self):
+        return self.__class__.__name__ + '(path={0}, batch_size={1}, dtype={2})'\
+                .format(self.path, self.batch_size, self.dtype)
+
+    def _new_metadata(self):
+        return {'count': 0,
+                'bands': None,
+                'dtype': None if self.dtype is None else self.dtype.str,
+                'last_insert_index': None,
+                'datatype_categories': [],
+                'species_categories': []}
+
+    def _restrict_queries(self, queries, last_insert_index):
+        # append mode only exports the documents inserted after the previous export.
+        queries = self.database._compile_queries(queries)
+        if last_insert_index is None:
+            return queries
+
+        restriction = {'insert_index': {'$gt': last_insert_index}}
+        return [{'$and': [query, restriction]} for query in queries]
+
+    def __call__(self, queries, append = False):
+        if not isinstance(append, bool):
+            raise TypeError('Argument: append must be a Python boolean object.')
+
+        metadata = None
+        if append and os.path.isfile(os.path.join(self.path, _METADATA_FILE)):
+            metadata = _read_metadata(self.path)
+            if self.dtype is not None and metadata['dtype'] is not None and \
+                    np.dtype(metadata['dtype']) != self.dtype:
+                raise ValueError('Argument: dtype is not consistent with the exported dataset.')
+
+        if metadata is None:
+            os.makedirs(self.path, exist_ok = True)
+            metadata = self._new_metadata()
+
+        queries = self._restrict_queries(queries, metadata['last_insert_index'])
+        estimate = 0
+        for query in queries:
+            estimate += self.database.count_documents(query, collection = self.data_collection)
+
+        count = self._export(queries, metadata, metadata['count'] + estimate)
+        if self.hint:
+            print('Export {0} data to {1} ({2} in total).'.format(count, self.path, metadata['count']))
+
+        return count
+
+    def _columns(self, metadata):
+        columns = dict(_COLUMNS)
+        if metadata['bands'] is not None:
+            columns['spectral'] = np.dtype(metadata['dtype'])
+
+        return columns
+
+    def _tail_shape(self, name, metadata):
+        if name == 'spectral':
+            return (metadata['bands'], )
+
+        return ()
+
+    def _reserve(self, metadata, capacity):
+        for name, dtype in self._columns(metadata).items():
+            shape = (metadata['count'], ) + self._tail_shape(name, metadata)
+            _resize_npy(_column_file(self.path, name), dtype, shape, capacity)
+
+        return None
+
+    def _codes(self, codes, categories, metadata_categories):
+        # the batch codes are local to one batch, they are re-mapped to the dataset categories.
+        mapping = np.empty((len(categories), ), dtype = np.int32)
+        for code, category in enumerate(categories):
+            if category not in metadata_categories:
+                metadata_categories.append(category)
+
+            mapping[code] = metadata_categories.index(category)
+
+        return mapping[codes]
+
+    def _export(self, queries, metadata, capacity):
+        self._reserve(metadata, capacity)
+
+        counting = 0
+        for batch in self.database.iter_data(queries,
+                data_collection = self.data_collection,
+                spectral_collection = self.spectral_collection,
+                data_args = ('datatype', 'species', 'spectral'),
+                batch_size = self.batch_size,
+                as_batch = True):
+
+            if metadata['bands'] is None:
+                metadata['bands'] = batch.bands
+                metadata['dtype'] = (self.dtype or batch.spectral.dtype.newbyteorder('<')).str
+                self._reserve(metadata, capacity)
+
+            if batch.bands != metadata['bands']:
+                raise ValueError('Spectral length: {0} is not consistent with the exported dataset: {1}.'\
+                        .format(batch.bands, metadata['bands']))
+
+            # the count can grow while exporting, the files are extended instead of failing.
+            start, stop = metadata['count'], metadata['count'] + len(batch)
+            if stop > capacity:
+                capacity = max(stop, capacity * 2)
+                self._reserve(metadata, capacity)
+
+            values = {'spectral': batch.spectral,
+                      'insert_index': batch.insert_index,
+                      'datatype': self._codes(batch.datatype, batch.datatype_categories,
+                              metadata['datatype_categories']),
+                      'species': self._codes(batch.species, batch.species_categories,
+                              metadata['species_categories'])}
+
+            for name, dtype in self._columns(metadata).items():
+                rows = _open_rows(_column_file(self.path, name), dtype,
+                        self._tail_shape(name, metadata), start, stop)
+
+                rows[: ] = values[name]
+                rows.flush()
+                del rows
+
+            if len(batch) > 0:
+                last_insert_index = int(batch.insert_index.max())
+                if metadata['last_insert_index'] is None or \
+                        last_insert_index > metadata['last_insert_index']:
+                    metadata['last_insert_index'] = last_insert_index
+
+            metadata['count'] = stop
+            counting += len(batch)
+
+        # the unused capacity is released and the headers record the final count.
+        self._reserve(metadata, metadata['count'])
+        _write_metadata(self.path, metadata)
+        return counting
+
+
+def load_memmap_dataset(path, mmap_mode = 'r'):
+    if not isinstance(path, str):
+        raise TypeError('Argument: path must be a Python string object.')
+
+    metadata = _read_metadata(path)
+    count = metadata['count']
+
+    # the metadata is the commit record, rows beyond it belong to an unfinished export.
+    columns = {}
+    for name in list(_COLUMNS.keys()) + ['spectral']:
+        file_path = _column_file(path, name)
+        if name == 'spectral' and metadata['bands'] is None:
+            columns[name] = np.empty((0, 0), dtype = np.float64)
+        else:
+            columns[name] = np.load(file_path, mmap_mode = mmap_mode)[: count]
+
+    return SpectralBatch(columns['spectral'],
+            columns['insert_index'],
+            columns['datatype'],
+            metadata['datatype_categories'],
+            columns['species'],
+            metadata['species_categories'])
@@ -0,0 +1,316 @@
+import os
+import json
+import queue
+import threading
+
+import numpy as np
+
+from .codec import encode_array
+from .utils import serialize
+from .template import Template
+
+
+__all__ = ['scan_data_files', 'scan_ndjson_lines', 'encode_spectral_value',
+        'parse_data_record', 'parse_data_file',
+        'parse_data_entry', 'parse_data_line', 'array_data_entries', 'IngestWriter',
+        'IngestManifest']
+
+
+def scan_data_files(directory, file_extension = '.json', recursive = False):
+    if not isinstance(directory, str):
+        raise TypeError('Argument: directory must be a Python string object.')
+
+    if not isinstance(file_extension, str):
+        raise TypeError('Argument: file_extension must be a Python string object.')
+
+    if not isinstance(recursive, bool):
+        raise TypeError('Argument: recursive must be a Python boolean object.')
+
+    # generator, the files are yielded while scanning instead of building the full list first.
+    directories = [directory]
+    while len(directories) > 0:
+        with os.scandir(directories.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks = False):
+                    if recursive:
+                        directories.append(entry.path)
+                elif entry.is_file() and entry.name.endswith(file_extension):
+                    yield entry.path
+
+    return None
+
+def scan_ndjson_lines(ndjson_file_path):
+    if not isinstance(ndjson_file_path, str):
+        raise TypeError('Argument: ndjson_file_path must be a Python string object.')
+
+    filename = os.path.split(ndjson_file_path)[-1]
+    with open(ndjson_file_path, 'r') as f:
+        for line_number, line in enumerate(f):
+            if len(line.strip()) > 0:
+                yield '{0}:{1}'.format(filename, line_number + 1), line
+
+        f.close()
+
+    return None
+
+def encode_spectral_value(spectral_value, spectral_format = 'list', spectral_encoding = None):
+    if spectral_encoding is None:
+        spectral_encoding = {}
+
+    spectral_value = np.asarray(spectral_value, dtype = np.float64)
+    if spectral_format == 'binary':
+        spectral_value = encode_array(spectral_value, **spectral_encoding)
+    else:
+        spectral_value = spectral_value.tolist()
+
+    return spectral_value
+
+def parse_data_record(contents, source_filename, data_args = ('datatype', 'species', 'spectral'),
+        data_collection = 'data', spectral_collection = 'spectral', spectral_format = 'list',
+        spectral_encoding = None):
+
+    # pure function (no database access), it can be safely run in the process pool.
+    if not isinstance(contents, dict):
+        raise TypeError('The record of {0} must be a JSON object.'.format(source_filename))
+
+    data_document = Template(data_collection)
+    spectral_document = Template(spectral_collection)
+    data_document['source_filename'] = source_filename
+
+    if spectral_encoding is None:
+        spectral_encoding = {}
+
+    gridfs_value = None
+    for args in data_args:
+        args_value = contents.get(args, None)
+        if args_value is not None:
+            if args == 'spectral':
+                spectral_value = np.array(args_value, dtype = np.float64)
+                gridfs_value = serialize(spectral_value, **spectral_encoding)
+                spectral_document['spectral'] = encode_spectral_value(spectral_value,
+                        spectral_format, spectral_encoding)
+            else:
+                data_document[args] = args_value
+
+    return data_document, spectral_document, gridfs_value
+
+def parse_data_file(json_file_path, data_args = ('datatype', 'species', 'spectral'),
+        data_collection = 'data', spectral_collection = 'spectral', spectral_format = 'list',
+        spectral_encoding = None):
+
+    with open(json_file_path, 'r') as f:
+        contents = json.loads(f.read())
+        f.close()
+
+    source_filename = os.path.split(json_file_path)[-1]
+    return parse_data_record(contents, source_filename, data_args = data_args,
+            data_collection = data_collection,
+            spectral_collection = spectral_collection,
+            spectral_format = spectral_format,
+            spectral_encoding = spectral_encoding)
+
+def parse_data_entry(json_file_path, data_args = ('datatype', 'species', 'spectral'),
+        data_collection = 'data', spectral_collection = 'spectral', spectral_format = 'list',
+        spectral_encoding = None):
+
+    document = parse_data_file(json_file_path, data_args = data_args,
+            data_collection = data_collection,
+            spectral_collection = spectral_collection,
+            spectral_format = spectral_format,
+            spectral_encoding = spectral_encoding)
+
+    return json_file_path, document
+
+def parse_data_line(source, data_args = ('datatype', 'species', 'spectral'),
+        data_collection = 'data', spectral_collection = 'spectral', spectral_format = 'list',
+        spectral_encoding = None):
+
+    source_filename, line = source
+    document = parse_data_record(json.loads(line), source_filename, data_args = data_args,
+            data_collection = data_collection,
+            spectral_collection = spectral_collection,
+            spectral_format = spectral_format,
+            spectral_encoding = spectral_encoding)
+
+    return source_filename, document
+
+def array_data_entries(spectral, datatypes, species, source_filenames = None,
+        data_collection = 'data', spectral_collection = 'spectral', spectral_format = 'list',
+        spectral_encoding = None):
+
+    for row in range(spectral.shape[0]):
+        contents = {'datatype': datatypes[row],
+                    'species': species[row],
+                    'spectral': spectral[row]}
+
+        source_filename = 'unknown'
+        if source_filenames is not None:
+            source_filename = source_filenames[row]
+
+        yield row, parse_data_record(contents, source_filename,
+                data_collection = data_collection,
+                spectral_collection = spectral_collection,
+                spectral_format = spectral_format,
+                spectral_encoding = spectral_encoding)
+
+    return None
+
+
+class IngestWriter(threading.Thread):
+    def __init__(self, commit, queue_size = 4):
+        super(IngestWriter, self).__init__(daemon = True)
+
+        if not callable(commit):
+            raise TypeError('Argument: commit must be a callable object.')
+
+        if not isinstance(queue_size, int):
+            raise TypeError('Argument: queue_size must be a Python int object.')
+
+        if queue_size <= 0:
+            raise ValueError('Argument: queue_size must at least be one.')
+
+        self.commit = commit
+        self.queue_size = queue_size
+        self.error = None
+        self._queue = queue.Queue(maxsize = queue_size)
+
+    def __repr__(self):
+        return self.__class__.__name__ + '(queue_size={0})'.format(self.queue_size)
+
+    def run(self):
+        while True:
+            documents = self._queue.get()
+            if documents is None:
+                break
+
+            # keep draining the queue after failure, or the producer will block forever.
+            if self.error is None:
+                try:
+                    self.commit(documents)
+                except Exception as e:
+                    self.error = e
+
+        return None
+
+    def put(self, documents):
+        if self.error is not None:
+            raise RuntimeError('{0} was stopped by the error in the writer stage.'\
+                    .format(self.__class__.__name__)) from self.error
+
+        self._queue.put(documents)
+        return None
+
+    def close(self):
+        self._queue.put(None)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+        return None
+
+
+class IngestManifest:
+    def __init__(self, path, root):
+        if not isinstance(path, str):
+            raise TypeError('Argument: path must be a Python string object.')
+
+        if not isinstance(root, str):
+            raise TypeError('Argument: root must be a Python string object.')
+
+        self.path = path
+        self.root = root
+        self._lock = threading.Lock()
+        self._committed = set()
+        self._pending = {}
+        self._batches = 0
+        self._load()
+
+    def __repr__(self):
+        return self.__class__.__name__ + '(path={0}, committed_files={1}, batches={2})'\
+                .format(self.path, len(self._committed), self._batches)
+
+    def __len__(self):
+        return len(self._committed)
+
+    def __contains__(self, file):
+        return self._key(file) in self._committed
+
+    def _key(self, file):
+        return os.path.relpath(file, self.root)
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return None
+
+        with open(self.path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if len(line) == 0:
+                    continue
+
+                # the last line can be truncated when the ingest process was killed.
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+
+                state, start = record.get('state', None), record.get('start', None)
+                if state == 'begin':
+                    self._pending[start] = record
+                elif state == 'commit':
+                    begin_record = self._pending.pop(start, None)
+                    if begin_record is not None:
+                        self._committed.update(begin_record['files'])
+                        self._batches += 1
+                elif state == 'rollback':
+                    self._pending.pop(start, None)
+
+            f.close()
+
+        return None
+
+    def _write(self, record):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+            f.close()
+
+        return None
+
+    def pending(self):
+        with self._lock:
+            ranges = [(record['start'], record['stop']) for record in self._pending.values()]
+
+        return ranges
+
+    def begin(self, files, start, stop):
+        record = {'state': 'begin',
+                  'start': start,
+                  'stop': stop,
+                  'files': [self._key(f) for f in files]}
+
+        with self._lock:
+            self._write(record)
+            self._pending[start] = record
+
+        return None
+
+    def commit(self, start):
+        with self._lock:
+            record = self._pending.pop(start, None)
+            if record is None:
+                raise RuntimeError('No begun batch start from insert_index: {0}.'.format(start))
+
+            self._write({'state': 'commit', 'start': start})
+            self._committed.update(record['files'])
+            self._batches += 1
+
+        return None
+
+    def rollback(self, start):
+        with self._lock:
+            if self._pending.pop(start, None) is not None:
+                self._write({'state': 'rollback', 'start': start})
+
+        return None
@@ -0,0 +1,275 @@
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from .codec import encode_array, decode_array, is_encoded_array
+
+
+__all__ = ['LocalMirror']
+
+
+# the fields kept by the mirror, the requests with other data_args are sent to the server.
+MIRROR_FIELDS = ('insert_index', 'datatype', 'species', 'source_filename', 'spectral')
+_SQL_VARIABLES = 900
+_RECONCILE_LEAF = 10000
+
+
+class LocalMirror:
+    def __init__(self, path):
+        if not isinstance(path, str):
+            raise TypeError('Argument: path must be a Python string object.')
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok = True)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread = False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS documents ('
+                'insert_index INTEGER PRIMARY KEY, datatype TEXT, species TEXT, '
+                'source_filename TEXT, spectral BLOB)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS documents_datatype '
+                'ON documents (datatype)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS documents_species '
+                'ON documents (species)')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS metadata ('
+                'key TEXT PRIMARY KEY, value INTEGER)')
+        self._connection.commit()
+
+    def __repr__(self):
+        return self.__class__.__name__ + '(path={0}, documents={1}, watermark={2})'\
+                .format(self.path, len(self), self.watermark)
+
+    def __len__(self):
+        with self._lock:
+            count = self._connection.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+        return count
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+        return None
+
+    @property
+    def watermark(self):
+        # the largest insert_index pulled from the server, -1 for an empty mirror.
+        with self._lock:
+            row = self._connection.execute('SELECT value FROM metadata WHERE key = ?',
+                    ('watermark', )).fetchone()
+
+        if row is None:
+            return -1
+
+        return row[0]
+
+    def _set_watermark(self, watermark):
+        self._connection.execute('INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)',
+                ('watermark', watermark))
+
+        return None
+
+    def _text(self, value):
+        if isinstance(value, str):
+            return value
+
+        return None
+
+    def _row(self, single_data):
+        spectral = single_data.get('spectral', None)
+        if isinstance(spectral, str) or spectral is None:
+            spectral = None
+        else:
+            spectral = encode_array(np.asarray(spectral))
+
+        return (int(single_data['insert_index']),
+                self._text(single_data.get('datatype', None)),
+                self._text(single_data.get('species', None)),
+                self._text(single_data.get('source_filename', None)),
+                spectral)
+
+    def sync(self, database, batch_size = 10000, data_collection = 'data',
+            spectral_collection = 'spectral', hint = True):
+
+        if not isinstance(batch_size, int):
+            raise TypeError('Argument: batch_size must be a Python int object.')
+
+        if batch_size <= 0:
+            raise ValueError('Argument: batch_size must larger than zero.')
+
+        # insert_index is monotonic, only the documents above the watermark are pulled.
+        watermark, counting = self.watermark, 0
+        for data in database.iter_data({'insert_index': {'$gt': watermark}},
+                data_collection = data_collection,
+                spectral_collection = spectral_collection,
+                data_args = MIRROR_FIELDS,
+                batch_size = batch_size):
+
+            rows = [self._row(single_data) for single_data in data]
+            with self._lock:
+                self._connection.executemany('INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)',
+                        rows)
+
+                watermark = max([watermark] + [row[0] for row in rows])
+                self._set_watermark(watermark)
+                self._connection.commit()
+
+            counting += len(rows)
+
+        deleted, filled = self.reconcile(database, watermark, data_collection = data_collection,
+                spectral_collection = spectral_collection,
+                batch_size = batch_size)
+
+        counting += filled
+        if hint:
+            print('Mirror sync finish: {0} pulled, {1} deleted, watermark: {2}.'\
+                    .format(counting, deleted, watermark))
+
+        return {'pulled': counting, 'deleted': deleted, 'watermark': watermark}
+
+    def _local_count(self, start, stop):
+        with self._lock:
+            count = self._connection.execute('SELECT COUNT(*) FROM documents '
+                    'WHERE insert_index >= ? AND insert_index < ?', (start, stop)).fetchone()[0]
+
+        return count
+
+    def reconcile(self, database, watermark = None, data_collection = 'data',
+            spectral_collection = 'spectral', batch_size = 10000):
+        # the counts of both sides are compared by range bisection, in the ranges with different
+        # counts the deleted documents are removed and the documents committed below the
+        # watermark after the last sync (reserved blocks, concurrent ingests) are pulled.
+        if watermark is None:
+            watermark = self.watermark
+
+        ranges, deleted, missing_indices = [(0, watermark + 1)], 0, []
+        while len(ranges) > 0:
+            start, stop = ranges.pop()
+            if stop <= start:
+                continue
+
+            query = {'insert_index': {'$gte': start, '$lt': stop}}
+            if database.count_documents(query, collection = data_collection) == \
+                    self._local_count(start, stop):
+                continue
+
+            if stop - start > _RECONCILE_LEAF:
+                middle = (start + stop) // 2
+                ranges += [(start, middle), (middle, stop)]
+                continue
+
+            server_indices = set(database.get_indices(query, collection = data_collection))
+            with self._lock:
+                local_indices = set(row[0] for row in self._connection.execute(
+                        'SELECT insert_index FROM documents WHERE insert_index >= ? AND insert_index < ?',
+                        (start, stop)))
+
+                removed = [(index, ) for index in local_indices if index not in server_indices]
+                self._connection.executemany('DELETE FROM documents WHERE insert_index = ?', removed)
+                self._connection.commit()
+
+            deleted += len(removed)
+            missing_indices += sorted(server_indices - local_indices)
+
+        filled = 0
+        for start_index in range(0, len(missing_indices), batch_size):
+            query = {'insert_index': {'$in': missing_indices[start_index: start_index + batch_size]}}
+            for data in database.iter_data(query,
+                    data_collection = data_collection,
+                    spectral_collection = spectral_collection,
+                    data_args = MIRROR_FIELDS,
+                    batch_size = batch_size):
+
+                rows = [self._row(single_data) for single_data in data]
+                with self._lock:
+                    self._connection.executemany('INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?)',
+                            rows)
+                    self._connection.commit()
+
+                filled += len(rows)
+
+        return deleted, filled
+
+    def is_fresh(self, database, data_collection = 'data'):
+        # two cheap requests: the newest insert_index and the document count.
+        last_doc = database.collections[data_collection].find_one({}, {'insert_index': 1, '_id': 0},
+                sort = [('insert_index', -1)])
+
+        last_index = -1
+        if last_doc is not None and last_doc.get('insert_index', None) is not None:
+            last_index = last_doc['insert_index']
+
+        if last_index != self.watermark:
+            return False
+
+        return database.count_documents({}, collection = data_collection) == len(self)
+
+    def _select(self, where, parameters, order):
+        statement = 'SELECT insert_index, datatype, species, source_filename, spectral FROM documents'
+        if where is not None:
+            statement += ' WHERE ' + where
+
+        statement += ' ORDER BY insert_index ' + order
+        with self._lock:
+            rows = self._connection.execute(statement, parameters).fetchall()
+
+        return rows
+
+    def _to_data(self, rows, data_args, decode = True):
+        data = []
+        for row in rows:
+            values = dict(zip(MIRROR_FIELDS, row))
+            single_data = {}
+            for args in data_args:
+                args_value = values[args]
+                if args_value is None:
+                    args_value = 'unknown'
+                elif args == 'spectral' and decode and is_encoded_array(args_value):
+                    args_value = decode_array(args_value)
+
+                single_data[args] = args_value
+
+            data.append(single_data)
+
+        return data
+
+    def _in_rows(self, field, values):
+        rows = []
+        for i in range(0, len(values), _SQL_VARIABLES):
+            chunk = list(values[i: i + _SQL_VARIABLES])
+            where = '{0} IN ({1})'.format(field, ', '.join(['?'] * len(chunk)))
+            rows += self._select(where, chunk, 'ASC')
+
+        return rows
+
+    def get_data_by_indices(self, indices, data_args, decode = True):
+        return self._to_data(self._in_rows('insert_index', [int(i) for i in indices]),
+                data_args, decode = decode)
+
+    def get_data_by_index_range(self, start, stop, step, data_args, decode = True):
+        indices = range(start, stop, step)
+        if len(indices) == 0:
+            return []
+
+        lower, upper = min(indices[0], indices[-1]), max(indices[0], indices[-1])
+        where = 'insert_index >= ? AND insert_index <= ?'
+        parameters = [lower, upper]
+        if abs(step) > 1:
+            where += ' AND insert_index % ? = ?'
+            parameters += [abs(step), indices[0] % abs(step)]
+
+        rows = self._select(where, parameters, 'ASC' if step > 0 else 'DESC')
+        return self._to_data(rows, data_args, decode = decode)
+
+    def get_data_by_field(self, field, values, data_args, decode = True):
+        if field not in ('datatype', 'species'):
+            raise ValueError('Argument: field must be datatype or species.')
+
+        return self._to_data(self._in_rows(field, list(values)), data_args, decode = decode)
+
+    def get_all_data(self, data_args, decode = True):
+        return self._to_data(self._select(None, [], 'ASC'), data_args, decode = decode)
@@ -1,18 +1,90 @@
 import copy
+import functools
+
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
+from bson import ObjectId
+from gridfs.errors import NoFile
+
+from .codec import decode_array, is_encoded_array
+from .query import DEFAULT_MAX_QUERY_BYTES, index_queries
 from .utils import deserialize
 
-__all__ = ['get_spectral_gridfs', 'get_spectral_list']
+__all__ = ['read_gridfs_objects', 'get_spectral_gridfs', 'get_spectral_list',
+        'decode_spectral_value', 'lookup_spectral_pipeline', 'get_spectral_lookup']
+
+
+GRIDFS_IDS_PER_REQUEST = 1000
+GRIDFS_READ_WORKER = 4
+
+
+def _read_gridfs_group(database, file_ids):
+    # two requests for the whole group: the file lengths and all the chunks ($in on files_id).
+    lengths = {}
+    for doc in database.database['fs.files'].find({'_id': {'$in': file_ids}}, {'length': 1}):
+        lengths[doc['_id']] = doc['length']
+
+    parts = {}
+    for chunk in database.database['fs.chunks'].find({'files_id': {'$in': file_ids}},
+            {'_id': 0, 'files_id': 1, 'n': 1, 'data': 1}):
+
+        if chunk['files_id'] not in parts:
+            parts[chunk['files_id']] = []
+
+        parts[chunk['files_id']].append((chunk['n'], chunk['data']))
+
+    objects = {}
+    for file_id in file_ids:
+        if file_id not in lengths:
+            raise NoFile('No file in GridFS with _id: {0}.'.format(file_id))
+
+        file_parts = sorted(parts.get(file_id, []), key = lambda part: part[0])
+        binary_obj = b''.join(bytes(data) for _, data in file_parts)
+        if len(binary_obj) != lengths[file_id]:
+            # the chunks were changed during reading, fallback to the GridFS reader.
+            binary_obj = database.fs.get(file_id).read()
+
+        objects[file_id] = binary_obj
+
+    return objects
+
+def read_gridfs_objects(database, file_ids, ids_per_request = GRIDFS_IDS_PER_REQUEST,
+        num_worker = GRIDFS_READ_WORKER):
+
+    file_ids = list(dict.fromkeys(file_ids))
+    groups = [file_ids[i: i + ids_per_request] for i in range(0, len(file_ids), ids_per_request)]
+
+    objects = {}
+    if len(groups) <= 1 or num_worker <= 1:
+        for group in groups:
+            objects.update(_read_gridfs_group(database, group))
+    else:
+        with ThreadPoolExecutor(max_workers = num_worker) as executor:
+            for group_objects in executor.map(functools.partial(_read_gridfs_group, database),
+                    groups):
+
+                objects.update(group_objects)
+
+    return objects
+
+def get_spectral_gridfs(database, docs, ids_per_request = GRIDFS_IDS_PER_REQUEST,
+        num_worker = GRIDFS_READ_WORKER):
+
+    allow_pickle = getattr(database, 'allow_pickle', False)
+    pointers = [doc['spectral'] for doc in docs if isinstance(doc.get('spectral', None), ObjectId)]
+    objects = read_gridfs_objects(database, pointers,
+            ids_per_request = ids_per_request,
+            num_worker = num_worker)
 
-def get_spectral_gridfs(database, docs):
     data = []
     for doc in docs:
         pointer = doc.get('spectral', None)
-        if pointer is not None:
-            spectral_data = database.fs.get(doc.get('spectral', None)).read()
-            spectral_data = deserialize(spectral_data)
+        if isinstance(pointer, ObjectId):
+            spectral_data = deserialize(objects[pointer], allow_pickle = allow_pickle)
+        elif pointer is not None and pointer != 'unknown':
+            spectral_data = deserialize(database.fs.get(pointer).read(), allow_pickle = allow_pickle)
         else:
             spectral_data = 'unknown'
 
@@ -22,13 +94,13 @@ def get_spectral_gridfs(database, docs):
     return data
 
 def get_spectral_list(database, docs, original_data_args = None, 
-        spectral_collection = 'spectral'):
+        spectral_collection = 'spectral', max_query_bytes = DEFAULT_MAX_QUERY_BYTES):
 
-    data, spectral_queries, order, counting = [], [], {}, 0
+    data, spectral_indices, order, counting = [], [], {}, 0
     for doc in docs:
          insert_index = doc.get('insert_index', None)
-         if insert_index is not None:
-             spectral_queries.append({'insert_index': insert_index})
+         if insert_index is not None and insert_index != 'unknown':
+             spectral_indices.append(insert_index)
 
          order[insert_index] = counting
          if original_data_args is not None:
@@ -45,23 +117,76 @@ def get_spectral_list(database, docs, original_data_args = None,
 
          counting += 1
 
-    if len(spectral_queries) == 1:
-        spectral_queries = spectral_queries[0]
-    else:
-        spectral_queries = {'$or': spectral_queries}
+    for spectral_queries in index_queries(spectral_indices, max_query_bytes = max_query_bytes):
+        spectral_documents = database.find(spectral_queries, collection = spectral_collection,
+                projection = {'_id': 0, 'insert_index': 1, 'spectral': 1})
+        _fill_spectral_list(data, order, spectral_documents)
+
+    return data
 
-    spectral_documents = database.find(spectral_queries, collection = spectral_collection)
+def decode_spectral_value(spectral_data):
+    if is_encoded_array(spectral_data):
+        return decode_array(spectral_data)
+
+    return np.array(spectral_data, dtype = np.float64)
+
+def _fill_spectral_list(data, order, spectral_documents):
     for doc in spectral_documents:
         spectral_data = doc.get('spectral', None)
-        if spectral_data is not None:
-            spectral_data = np.array(spectral_data, dtype = np.float64)
-        else:
+        if spectral_data is None:
             continue
 
+        spectral_data = decode_spectral_value(spectral_data)
         insert_index = doc.get('insert_index', None)
         if insert_index is not None:
             data[order[insert_index]]['spectral'] = spectral_data
              
     return data
 
+def lookup_spectral_pipeline(query, data_args, spectral_collection = 'spectral', sort = None):
+    # $match -> $lookup on insert_index -> $project, the spectral collection is joined by the server.
+    pipeline = [{'$match': query}]
+    if sort is not None:
+        pipeline.append({'$sort': dict(sort)})
+
+    projection = {'_id': 1}
+    for args in data_args:
+        if args != 'spectral':
+            projection[args] = 1
+
+    if 'spectral' in data_args:
+        pipeline.append({'$lookup': {'from': spectral_collection,
+                                     'localField': 'insert_index',
+                                     'foreignField': 'insert_index',
+                                     'as': 'spectral'}})
+
+        projection['spectral'] = {'$arrayElemAt': ['$spectral.spectral', 0]}
+
+    pipeline.append({'$project': projection})
+    return pipeline
+
+def get_spectral_lookup(database, query, data_args, data_collection = 'data',
+        spectral_collection = 'spectral', sort = None, batch_size = None, decode = True):
+
+    # generator, the joined documents are streamed from one aggregation cursor.
+    pipeline = lookup_spectral_pipeline(query, data_args,
+            spectral_collection = spectral_collection,
+            sort = sort)
+
+    kwargs = {'allowDiskUse': True}
+    if batch_size is not None:
+        kwargs['batchSize'] = batch_size
+
+    cursor = database.collections[data_collection].aggregate(pipeline, **kwargs)
+    for doc in cursor:
+        single_data = {}
+        for args in data_args:
+            args_value = doc.get(args, 'unknown')
+            if decode and args == 'spectral' and args_value != 'unknown':
+                args_value = decode_spectral_value(args_value)
+
+            single_data[args] = args_value
+
+        yield doc['_id'], single_data
 
+    return None
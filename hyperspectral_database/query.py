@@ -0,0 +1,233 @@
+import bson
+
+
+__all__ = ['compile_queries', 'index_queries', 'index_range_query', 'data_projection']
+
+
+# far below the 16MB BSON document limit of the MongoDB server.
+DEFAULT_MAX_QUERY_BYTES = 4 * 1024 * 1024
+MIN_RANGE_LENGTH = 4
+# only the integer key fields are collapsed into ranges, a range also matches non-integer values.
+RANGE_FIELDS = ('insert_index', )
+
+_INT32_MIN, _INT32_MAX = -(2 ** 31), 2 ** 31 - 1
+
+
+def _is_scalar(value):
+    if isinstance(value, (dict, list, tuple)):
+        return False
+
+    return True
+
+def _equality_values(clause):
+    # {field: value} or {field: {'$in': [...]}} -> (field, values), others -> None
+    if not isinstance(clause, dict) or len(clause) != 1:
+        return None
+
+    field, value = next(iter(clause.items()))
+    if field.startswith('$'):
+        return None
+
+    if _is_scalar(value):
+        return field, [value]
+
+    if isinstance(value, dict) and list(value.keys()) == ['$in']:
+        values = value['$in']
+        if isinstance(values, (list, tuple)) and all(_is_scalar(v) for v in values):
+            return field, list(values)
+
+    return None
+
+def _element_size(position, value):
+    # type byte + key cstring + value, exact for the common types and close for the others.
+    size = 2 + len(str(position))
+    if isinstance(value, bool):
+        size += 1
+    elif isinstance(value, int):
+        size += 4 if _INT32_MIN <= value <= _INT32_MAX else 8
+    elif isinstance(value, float):
+        size += 8
+    elif isinstance(value, str):
+        size += 5 + len(value.encode('utf-8'))
+    else:
+        size += len(bson.encode({'': value})) - 7
+
+    return size
+
+def _split_ranges(values):
+    # contiguous integer runs become [start, stop) ranges, the remaining values stay for $in.
+    if not all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        return [], values
+
+    ranges, singles = [], []
+    ordered = sorted(set(values))
+    start = previous = None
+    for value in ordered + [None]:
+        if value is not None and previous is not None and value == previous + 1:
+            previous = value
+            continue
+
+        if start is not None:
+            if (previous - start + 1) >= MIN_RANGE_LENGTH:
+                ranges.append((start, previous + 1))
+            else:
+                singles += list(range(start, previous + 1))
+
+        start = previous = value
+
+    return ranges, singles
+
+def _unique(values):
+    seen, unique_values = set(), []
+    for value in values:
+        key = (type(value), value) if _is_hashable(value) else None
+        if key is None or key not in seen:
+            if key is not None:
+                seen.add(key)
+
+            unique_values.append(value)
+
+    return unique_values
+
+def _is_hashable(value):
+    try:
+        hash(value)
+    except TypeError:
+        return False
+
+    return True
+
+def compile_queries(queries, max_query_bytes = DEFAULT_MAX_QUERY_BYTES):
+    if not isinstance(queries, (dict, list, tuple)):
+        raise TypeError('Argument: queries must be a Python dict or list/tuple object.')
+
+    if not isinstance(max_query_bytes, int):
+        raise TypeError('Argument: max_query_bytes must be a Python int object.')
+
+    if max_query_bytes <= 0:
+        raise ValueError('Argument: max_query_bytes must larger than zero.')
+
+    if isinstance(queries, dict):
+        if list(queries.keys()) == ['$or']:
+            clauses = list(queries['$or'])
+        else:
+            clauses = [queries]
+    else:
+        clauses = list(queries)
+
+    for clause in clauses:
+        if not isinstance(clause, dict):
+            raise TypeError('Element in argument: queries must be a Python dict object.')
+
+    if len(clauses) == 0:
+        raise RuntimeError('Input queries cannot be a empty list/tuple.')
+
+    # same-field equality clauses are collapsed into one $in, the others are kept as they are.
+    field_values, field_order, others = {}, [], []
+    for clause in clauses:
+        equality = _equality_values(clause)
+        if equality is None:
+            others.append((clause, len(bson.encode(clause))))
+        else:
+            field, values = equality
+            if field not in field_values:
+                field_values[field] = []
+                field_order.append(field)
+
+            field_values[field] += values
+
+    pieces = []
+    for field in field_order:
+        ranges, singles = [], _unique(field_values[field])
+        if field in RANGE_FIELDS:
+            ranges, singles = _split_ranges(singles)
+
+        for start, stop in ranges:
+            clause = {field: {'$gte': start, '$lt': stop}}
+            pieces.append((clause, len(bson.encode(clause))))
+
+        if len(singles) > 0:
+            pieces += _in_clauses(field, singles, max_query_bytes)
+
+    pieces += others
+
+    # pack the clauses into queries, a new query is started when the size limit is reached.
+    compiled, current, current_size = [], [], 0
+    for clause, size in pieces:
+        if len(current) > 0 and current_size + size > max_query_bytes:
+            compiled.append(_merge_clauses(current))
+            current, current_size = [], 0
+
+        current.append(clause)
+        current_size += size + len(str(len(current))) + 2
+
+    if len(current) > 0:
+        compiled.append(_merge_clauses(current))
+
+    return compiled
+
+def _in_clauses(field, values, max_query_bytes):
+    # the overhead of {field: {'$in': [...]}} is far smaller than the 1KB margin.
+    budget = max(max_query_bytes - len(field) - 1024, 1)
+    clauses, chunk, chunk_size = [], [], 0
+    for value in values:
+        size = _element_size(len(chunk), value)
+        if len(chunk) > 0 and chunk_size + size > budget:
+            clauses.append(_in_clause(field, chunk, chunk_size))
+            chunk, chunk_size = [], 0
+            size = _element_size(0, value)
+
+        chunk.append(value)
+        chunk_size += size
+
+    if len(chunk) > 0:
+        clauses.append(_in_clause(field, chunk, chunk_size))
+
+    return clauses
+
+def _in_clause(field, values, values_size):
+    if len(values) == 1:
+        return {field: values[0]}, values_size + len(field) + 16
+
+    return {field: {'$in': values}}, values_size + len(field) + 32
+
+def _merge_clauses(clauses):
+    if len(clauses) == 1:
+        return clauses[0]
+
+    return {'$or': clauses}
+
+def index_queries(indices, max_query_bytes = DEFAULT_MAX_QUERY_BYTES):
+    indices = [int(index) for index in indices]
+    if len(indices) == 0:
+        return []
+
+    return compile_queries({'insert_index': {'$in': indices}}, max_query_bytes = max_query_bytes)
+
+def index_range_query(start, stop, step = 1):
+    # range(start, stop, step) -> one indexed range scan, step > 1 is matched by $mod.
+    if step == 0:
+        raise ValueError('Argument: step cannot be zero.')
+
+    indices = range(start, stop, step)
+    if len(indices) == 0:
+        return None, 1
+
+    lower, upper = min(indices[0], indices[-1]), max(indices[0], indices[-1])
+    query = {'insert_index': {'$gte': lower, '$lte': upper}}
+    if abs(step) > 1:
+        query['insert_index']['$mod'] = [abs(step), indices[0] % abs(step)]
+
+    direction = 1
+    if step < 0:
+        direction = -1
+
+    return query, direction
+
+def data_projection(data_args, extra_fields = ('insert_index', )):
+    # only the requested fields are sent by the server, _id is kept for de-duplication.
+    projection = {'_id': 1}
+    for field in list(data_args) + list(extra_fields):
+        projection[field] = 1
+
+    return projection
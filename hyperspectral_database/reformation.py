@@ -0,0 +1,237 @@
+import warnings
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from .utils import serialize, deserialize
+from .codec import decode_array, is_encoded_array
+from .ingest import encode_spectral_value
+from .pipeline import read_gridfs_objects
+
+
+__all__ = ['SpectralReformation']
+
+
+class SpectralReformation:
+    def __init__(self, database, source, target, data_collection = 'data',
+            spectral_collection = 'spectral', batch_size = 10000, num_worker = 4, hint = True):
+
+        if source == target:
+            raise RuntimeError('Argument: source cannot be same as argument:target.')
+
+        if not isinstance(batch_size, int):
+            raise TypeError('Argument: batch_size must be a Python int object.')
+
+        if batch_size <= 0:
+            raise ValueError('Argument: batch_size must larger than zero.')
+
+        if not isinstance(num_worker, int):
+            raise TypeError('Argument: num_worker must be a Python int object.')
+
+        if num_worker <= 0:
+            raise ValueError('Argument: num_worker must at least be one.')
+
+        self.database = database
+        self.source = source
+        self.target = target
+        self.data_collection = data_collection
+        self.spectral_collection = spectral_collection
+        self.batch_size = batch_size
+        self.num_worker = num_worker
+        self.hint = hint
+
+    def __repr__(self):
+        return self.__class__.__name__ + '(source={0}, target={1}, batch_size={2}, num_worker={3})'\
+                .format(self.source, self.target, self.batch_size, self.num_worker)
+
+    @property
+    def checkpoint_id(self):
+        return 'reformation:{0}:{1}'.format(self.source, self.target)
+
+    def _bson_type(self, storage_format):
+        bson_type = 'array'
+        if storage_format == 'binary':
+            bson_type = 'binData'
+
+        return bson_type
+
+    def load_checkpoint(self):
+        counters = self.database.database[self.database._counter_collection]
+        checkpoint = counters.find_one({'_id': self.checkpoint_id})
+        if checkpoint is None:
+            return None
+
+        return checkpoint.get('insert_index', None)
+
+    def save_checkpoint(self, insert_index):
+        counters = self.database.database[self.database._counter_collection]
+        counters.update_one({'_id': self.checkpoint_id},
+                {'$max': {'insert_index': insert_index}},
+                upsert = True)
+
+        return None
+
+    def clear_checkpoint(self):
+        counters = self.database.database[self.database._counter_collection]
+        counters.delete_one({'_id': self.checkpoint_id})
+        return None
+
+    def __call__(self, resume = True):
+        if not isinstance(resume, bool):
+            raise TypeError('Argument: resume must be a Python boolean object.')
+
+        query, last_index = {}, None
+        if resume:
+            last_index = self.load_checkpoint()
+        else:
+            self.clear_checkpoint()
+
+        if last_index is not None:
+            query = {'insert_index': {'$gt': last_index}}
+            if self.hint:
+                print('Resume {0} from insert_index: {1}.'.format(self.checkpoint_id, last_index))
+
+        # streaming in insert_index order, so the checkpoint is the largest finished index.
+        cursor = self.database.collections[self.data_collection].find(query,
+                {'insert_index': 1, 'spectral': 1},
+                sort = [('insert_index', 1)],
+                batch_size = self.batch_size)
+
+        counting = {'converted': 0, 'skipped': 0, 'missing': 0}
+        with ThreadPoolExecutor(max_workers = self.num_worker) as executor, \
+                ThreadPoolExecutor(max_workers = 1) as writer:
+
+            pending_write, docs = None, []
+            for doc in cursor:
+                if doc.get('insert_index', None) is None:
+                    continue
+
+                docs.append(doc)
+                if len(docs) == self.batch_size:
+                    pending_write = self._process_batch(docs, executor, writer,
+                            pending_write, counting)
+                    docs = []
+
+            if len(docs) > 0:
+                pending_write = self._process_batch(docs, executor, writer,
+                        pending_write, counting)
+
+            if pending_write is not None:
+                pending_write.result()
+
+        # the checkpoint only resumes an interrupted run, a finished run starts over next time.
+        self.clear_checkpoint()
+        if counting['missing'] > 0:
+            warnings.warn('{0} documents have no {1} spectral data and were not converted.'\
+                    .format(counting['missing'], self.source))
+
+        if self.hint:
+            print('{0} finish: {1} converted, {2} skipped (already converted).'\
+                    .format(self.checkpoint_id, counting['converted'], counting['skipped']))
+
+        return counting
+
+    def _process_batch(self, docs, executor, writer, pending_write, counting):
+        converted = self._converted_indices(docs)
+        todo_docs = [doc for doc in docs if doc['insert_index'] not in converted]
+        counting['skipped'] += len(docs) - len(todo_docs)
+
+        spectral_data = self._read_source(todo_docs, executor)
+        counting['missing'] += len(todo_docs) - len(spectral_data)
+
+        # read the next batch while the previous batch is writing, one write in flight.
+        if pending_write is not None:
+            pending_write.result()
+
+        last_index = docs[-1]['insert_index']
+        pending_write = writer.submit(self._write_target, spectral_data, executor, last_index)
+        counting['converted'] += len(spectral_data)
+        if self.hint:
+            print('{0} progress: insert_index <= {1}, converted {2}.'\
+                    .format(self.checkpoint_id, last_index, counting['converted']))
+
+        return pending_write
+
+    def _converted_indices(self, docs):
+        if self.target == 'gridfs':
+            converted = set()
+            for doc in docs:
+                if isinstance(doc.get('spectral', None), ObjectId):
+                    converted.add(doc['insert_index'])
+        else:
+            indices = [doc['insert_index'] for doc in docs]
+            cursor = self.database.collections[self.spectral_collection].find(
+                    {'insert_index': {'$in': indices},
+                     'spectral': {'$type': self._bson_type(self.target)}},
+                    {'insert_index': 1, '_id': 0})
+
+            converted = set(doc['insert_index'] for doc in cursor)
+
+        return converted
+
+    def _read_source(self, docs, executor):
+        spectral_data = {}
+        if len(docs) == 0:
+            return spectral_data
+
+        if self.source == 'gridfs':
+            docs = [doc for doc in docs if isinstance(doc.get('spectral', None), ObjectId)]
+            objects = read_gridfs_objects(self.database, [doc['spectral'] for doc in docs],
+                    num_worker = self.num_worker)
+
+            for doc in docs:
+                spectral_data[doc['insert_index']] = deserialize(objects[doc['spectral']],
+                        allow_pickle = self.database.allow_pickle)
+        else:
+            indices = [doc['insert_index'] for doc in docs]
+            cursor = self.database.collections[self.spectral_collection].find(
+                    {'insert_index': {'$in': indices},
+                     'spectral': {'$type': self._bson_type(self.source)}},
+                    {'insert_index': 1, 'spectral': 1, '_id': 0})
+
+            for doc in cursor:
+                array = doc['spectral']
+                if is_encoded_array(array):
+                    array = decode_array(array)
+                else:
+                    array = np.array(array, dtype = np.float64)
+
+                spectral_data[doc['insert_index']] = array
+
+        return spectral_data
+
+    def _put_gridfs(self, item):
+        insert_index, array = item
+        encoding = self.database.spectral_encoding
+        return self.database.fs.put(serialize(array, **encoding), insert_index = insert_index)
+
+    def _write_target(self, spectral_data, executor, last_index):
+        requests = []
+        if self.target == 'gridfs':
+            items = list(spectral_data.items())
+            pointers = executor.map(self._put_gridfs, items)
+
+            for (insert_index, _), pointer in zip(items, pointers):
+                requests.append(UpdateOne({'insert_index': insert_index},
+                        {'$set': {'spectral': pointer}}))
+
+            collection = self.data_collection
+        else:
+            encoding = self.database.spectral_encoding
+            for insert_index, array in spectral_data.items():
+                value = encode_spectral_value(array, self.target, encoding)
+                requests.append(UpdateOne({'insert_index': insert_index},
+                        {'$set': {'spectral': value}},
+                        upsert = True))
+
+            collection = self.spectral_collection
+
+        if len(requests) > 0:
+            self.database.collections[collection].bulk_write(requests, ordered = False)
+
+        self.save_checkpoint(last_index)
+        return len(requests)
@@ -1,82 +1,63 @@
-import copy
+import os
 import time
+import weakref
 import platform
+import threading
+import traceback
 
 import multiprocessing as mp
-from multiprocessing import Lock, Process
+from multiprocessing.connection import wait
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
 
 from .base import Database
 from .client import LightWeightedDatabaseClient
 
 
-__all__ = ['SynchronizedFunctionWapper']
-
+__all__ = ['SynchronizedWorkerPool', 'SynchronizedFunctionWapper']
 
-def run_worker(rank, 
-        inputs_container, 
-        shared_arguments,
-        queue_outputs,
-        func, args, worker_timeout = -1.):
 
-    query_size = shared_arguments.get('query_size', None)
-    if query_size is None:
-        raise RuntimeError('Cannot acquire query_size in sync_wrapper.')
+# the arguments which need a new MongoClient when they change.
+_CONNECTION_ARGUMENTS = ('db_name', 'user_id', 'passwd', 'host', 'port')
 
-    database = shared_arguments.get('database', None)
-    sync_database = LightWeightedDatabaseClient(**database)
-    if database is None:
-        raise RuntimeError('Cannot acquire attribute from HyperspectralDatabase.')
 
-    partitions = None
-    for argument in args:
-        contents = inputs_container.get(argument, None)
-        if contents is None:
-            contents = shared_arguments.get(argument, None)
-        else:
-            length_of_contents = len(contents.get(rank, []))
-            tmp_partition = length_of_contents // query_size
-            if length_of_contents % query_size > 0:
-                tmp_partition += 1
+def run_pool_worker(rank, connection):
+    # long-lived worker, the MongoClient is kept warm between the calls.
+    sync_database, connection_key = None, None
+    while True:
+        try:
+            message = connection.recv()
+        except (EOFError, OSError):
+            break
+        except Exception:
+            # e.g. a function which cannot be unpickled in the worker.
+            connection.send(('error', rank, traceback.format_exc()))
+            continue
 
-        if partitions is None:
-            partitions = tmp_partition
-        else:
-            if tmp_partition != partitions:
-                raise RuntimeError('Error partition assignment in the {0} sub-process'\
-                        .format(rank))
+        if message is None:
+            break
 
-    if partitions is None:
-        raise RuntimeError('Cannot acquire sync argument in the sync_wrapper.')
-
-    break_flag = False
-    for split_index in range(partitions):
-        split_kwargs = {'database': sync_database}
-        start_index = split_index * query_size
-        end_index = (split_index + 1) * query_size
-        if end_index >= length_of_contents:
-            end_index = length_of_contents
-            break_flag = True
-
-        for argument in args:
-            contents = inputs_container.get(argument, None)
-            if contents is None:
-                contents = shared_arguments.get(argument, None)
+        arguments, func, partitions = message
+        try:
+            key = tuple(arguments.get(name, None) for name in _CONNECTION_ARGUMENTS)
+            if sync_database is None or key != connection_key:
+                sync_database = LightWeightedDatabaseClient(**arguments)
+                connection_key = key
             else:
-                contents = contents[rank][start_index: end_index]
-
-            if contents is None:
-                    raise RuntimeError('Loss argument in subprocess, ' + \
-                            'please ensure all arguemnt is defined.')
+                sync_database.gridfs = arguments['gridfs']
+                sync_database.storage_format = arguments['storage_format']
+                sync_database.allow_pickle = arguments['allow_pickle']
 
-            split_kwargs[argument] = contents
+            for partition_index, split_kwargs in partitions:
+                outputs = func(database = sync_database, **split_kwargs)
+                connection.send(('result', partition_index, _SharedDocumentList(outputs)))
 
-        outputs = func(**split_kwargs)
-        outputs = _DocumentList(outputs)
-        queue_outputs.put(outputs)
-
-        if break_flag:
-            break
+            connection.send(('done', rank, None))
+        except Exception:
+            connection.send(('error', rank, traceback.format_exc()))
 
+    connection.close()
     return None
 
 
@@ -110,6 +91,79 @@ class _DocumentList:
         return self.__docs[idx]
 
 
+class _SharedDocumentList(_DocumentList):
+    # the spectra are written into one shared memory block, only the documents without
+    # spectral and the block layout are pickled through the pipe.
+    alignment = 64
+
+    def __init__(self, docs):
+        super(_SharedDocumentList, self).__init__(docs)
+        self.shm_name = None
+        self.size = 0
+        self.layout = {}
+
+        arrays = []
+        for position, doc in enumerate(self):
+            spectral = doc.get('spectral', None)
+            if isinstance(spectral, np.ndarray) and spectral.nbytes > 0:
+                spectral = np.ascontiguousarray(spectral)
+                self.layout[position] = (self.size, spectral.shape, spectral.dtype.str)
+                arrays.append((self.size, spectral))
+                self.size += -(-spectral.nbytes // self.alignment) * self.alignment
+
+        # the partitions without spectral bytes are pickled as they are.
+        if self.size == 0:
+            return None
+
+        shm = shared_memory.SharedMemory(create = True, size = self.size)
+        try:
+            for offset, spectral in arrays:
+                np.ndarray(spectral.shape, dtype = spectral.dtype, buffer = shm.buf,
+                        offset = offset)[...] = spectral
+
+            # the block is owned by the main process, the creator must not unlink it at exit.
+            if os.name == 'posix':
+                resource_tracker.unregister('/' + shm.name, 'shared_memory')
+
+            self.shm_name = shm.name
+        except BaseException:
+            shm.unlink()
+            raise
+        finally:
+            shm.close()
+
+        for position in self.layout:
+            self[position]['spectral'] = None
+
+    def restore(self):
+        # the block is mapped and kept as the backing store of the spectra, its name is unlinked
+        # at once and the mapping is closed when the last spectrum is released.
+        if self.shm_name is None:
+            return self
+
+        shm = shared_memory.SharedMemory(name = self.shm_name)
+        shm.unlink()
+        buffer = shm.buf[: self.size]
+        weakref.finalize(buffer, shm.close)
+
+        for position, (offset, shape, dtype) in self.layout.items():
+            self[position]['spectral'] = np.ndarray(shape, dtype = np.dtype(dtype),
+                    buffer = buffer, offset = offset)
+
+        self.shm_name = None
+        return self
+
+    def discard(self):
+        # the unread results of a failed call, the block is unlinked without mapping it.
+        if self.shm_name is not None:
+            shm = shared_memory.SharedMemory(name = self.shm_name)
+            shm.close()
+            shm.unlink()
+            self.shm_name = None
+
+        return None
+
+
 class _OrderAllocator:
     def __init__(self, num_worker):
         self.num_worker = num_worker
@@ -182,6 +236,244 @@ class _OrderAllocator:
         return args_container
 
 
+class SynchronizedWorkerPool:
+    def __init__(self, num_worker, start_method = None):
+        if not isinstance(num_worker, int):
+            raise TypeError('Argument: num_worker must be a Python int object.')
+
+        if num_worker <= 0:
+            raise ValueError('Argument: num_worker must at least be one.')
+
+        self.num_worker = num_worker
+        self.context = mp.get_context(start_method)
+        self.processes = []
+        self.connections = []
+        # the pipes carry one call at a time, the callers from other threads wait here.
+        self._lock = threading.RLock()
+        self._caller = None
+
+    def __repr__(self):
+        return self.__class__.__name__ + '(num_worker={0}, alive={1})'\
+                .format(self.num_worker, self.alive)
+
+    @property
+    def alive(self):
+        if len(self.processes) == 0:
+            return False
+
+        return all(p.is_alive() for p in self.processes)
+
+    def _spawn(self, rank):
+        parent_connection, child_connection = self.context.Pipe(duplex = True)
+        p = self.context.Process(target = run_pool_worker,
+                args = (rank, child_connection),
+                daemon = True)
+
+        p.start()
+        # only the worker keeps the child end, recv raises EOFError when the worker dies.
+        child_connection.close()
+        return p, parent_connection
+
+    def start(self):
+        with self._lock:
+            if self.alive:
+                return None
+
+            if len(self.processes) != self.num_worker:
+                self.close()
+                for rank in range(self.num_worker):
+                    p, connection = self._spawn(rank)
+                    self.processes.append(p)
+                    self.connections.append(connection)
+
+                return None
+
+            # only the dead workers are replaced, the others keep their MongoClient.
+            for rank, p in enumerate(self.processes):
+                if not p.is_alive():
+                    self.restart(rank)
+
+        return None
+
+    def restart(self, rank):
+        p, connection = self.processes[rank], self.connections[rank]
+        if p.is_alive():
+            p.terminate()
+
+        p.join()
+        self._drain(connection)
+        connection.close()
+        p.close()
+        self.processes[rank], self.connections[rank] = self._spawn(rank)
+        return None
+
+    def _receive(self, connection, rank):
+        try:
+            kind, index, contents = connection.recv()
+        except (EOFError, OSError):
+            raise RuntimeError('The {0} sub-process exited unexpectedly.'.format(rank))
+
+        if kind == 'result':
+            contents = contents.restore()
+
+        return kind, index, contents
+
+    def _check_error(self, kind, rank, contents):
+        # the worker which sent the error is idle again and stays in the pool.
+        if kind == 'error':
+            raise RuntimeError('Error in the {0} sub-process:\n{1}'.format(rank, contents))
+
+        return None
+
+    def imap(self, arguments, func, assignments, timeout = None):
+        # the lock is held until the last message of the call is read (or the generator closed),
+        # e.g. the prefetch thread of iter_data and a call in the loop body share the pool.
+        if self._caller == threading.get_ident():
+            raise RuntimeError('The worker pool is still streaming a call in this thread.')
+
+        with self._lock:
+            self._caller = threading.get_ident()
+            try:
+                yield from self._imap(arguments, func, assignments, timeout = timeout)
+            finally:
+                self._caller = None
+
+        return None
+
+    def _imap(self, arguments, func, assignments, timeout = None):
+        # assignments[rank] is a list of (partition_index, kwargs), the partitions are
+        # yielded in the partition order as soon as all the previous ones are received.
+        self.start()
+        pending = {}
+        for rank, partitions in enumerate(assignments):
+            if len(partitions) > 0:
+                self.connections[rank].send((arguments, func, partitions))
+                pending[rank] = self.connections[rank]
+
+        # the process sentinel is ready when a worker dies without the done message.
+        sentinels = {self.processes[rank].sentinel: rank for rank in pending}
+        readers = {connection: rank for rank, connection in pending.items()}
+        buffered, next_index, start_time = {}, 0, time.time()
+        try:
+            while len(pending) > 0:
+                remaining = None
+                if timeout is not None:
+                    remaining = max(0., timeout - (time.time() - start_time))
+
+                ready = wait(list(readers.keys()) + list(sentinels.keys()), remaining)
+                if len(ready) == 0:
+                    print('Reach timeout limit, restart the unfinished sub-processes.')
+                    break
+
+                for obj in ready:
+                    if obj in readers:
+                        rank = readers[obj]
+                        kind, index, contents = self._receive(obj, rank)
+                        if kind == 'result':
+                            buffered[index] = contents
+                        else:
+                            pending.pop(rank, None)
+                            readers.pop(obj, None)
+                            sentinels.pop(self.processes[rank].sentinel, None)
+                            self._check_error(kind, index, contents)
+                    elif obj in sentinels and sentinels[obj] in pending:
+                        # the messages sent before the exit are read first, then recv fails.
+                        rank = sentinels[obj]
+                        while rank in pending:
+                            kind, index, contents = self._receive(pending[rank], rank)
+                            if kind == 'result':
+                                buffered[index] = contents
+                            else:
+                                readers.pop(pending.pop(rank), None)
+                                self._check_error(kind, index, contents)
+
+                while next_index in buffered:
+                    yield buffered.pop(next_index)
+                    next_index += 1
+
+            # after a timeout, the received partitions are still returned in order.
+            for index in sorted(buffered.keys()):
+                yield buffered.pop(index)
+        finally:
+            # after an error, the healthy workers finish their partitions and stay in the pool,
+            # only the workers which timed out or died are restarted.
+            deadline = None
+            if timeout is not None:
+                deadline = start_time + timeout
+
+            for rank in list(pending.keys()):
+                if not self._settle(rank, deadline):
+                    self.restart(rank)
+
+        return None
+
+    def _settle(self, rank, deadline):
+        # read the remaining messages of one call, the unread results are unlinked.
+        connection = self.connections[rank]
+        try:
+            while True:
+                remaining = None
+                if deadline is not None:
+                    remaining = max(0., deadline - time.time())
+
+                if len(wait([connection, self.processes[rank].sentinel], remaining)) == 0:
+                    return False
+
+                if not connection.poll(0):
+                    return False
+
+                kind, _, contents = connection.recv()
+                if kind == 'result':
+                    contents.discard()
+                else:
+                    return True
+        except (EOFError, OSError):
+            return False
+
+    def run(self, arguments, func, assignments, timeout = None):
+        outputs = []
+        for partition in self.imap(arguments, func, assignments, timeout = timeout):
+            for doc in partition:
+                outputs.append(doc)
+
+        return outputs
+
+    def _drain(self, connection):
+        # the shared memory blocks of unread results are still unlinked.
+        try:
+            while connection.poll(0):
+                kind, _, contents = connection.recv()
+                if kind == 'result':
+                    contents.discard()
+        except (EOFError, OSError):
+            pass
+
+        return None
+
+    def close(self, timeout = 1.):
+        with self._lock:
+            for connection in self.connections:
+                try:
+                    connection.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+
+            for p, connection in zip(self.processes, self.connections):
+                p.join(timeout)
+                if p.is_alive():
+                    p.terminate()
+                    p.join()
+
+                self._drain(connection)
+                connection.close()
+                p.close()
+
+            self.processes = []
+            self.connections = []
+
+        return None
+
+
 class SynchronizedFunctionWapper:
     def __init__(self, database, query_size, num_worker = 8, 
             process_check_interval = 0.1, timeout = -1):
@@ -195,6 +487,7 @@ class SynchronizedFunctionWapper:
         if query_size <= 0:
             raise ValueError('Argument: query_size must at least be one.')
 
+        self.pool = None
         self.allocator = _OrderAllocator(num_worker)
 
         self.database = database
@@ -243,10 +536,14 @@ class SynchronizedFunctionWapper:
         if self.allocator is not None:
             self.allocator.num_worker = num_worker
 
+        if self.pool is not None and self.pool.num_worker != num_worker:
+            self.close()
+
         return None
 
     @property
     def process_check_interval(self):
+        # kept for compatibility, the outputs are collected by blocking connection.wait.
         return self._process_check_interval
 
     @process_check_interval.setter
@@ -304,34 +601,60 @@ class SynchronizedFunctionWapper:
         return self.__class__.__name__ + '(query_size={0}, num_worker={1}, timeout={2} seconds)'\
                 .format(self.query_size, self.num_worker, timeout)
 
-    def merge_process_outputs(self, outputs, queue_outputs):
-        while True:
-            if not queue_outputs.empty():
-                docs = queue_outputs.get()
-                for doc in docs:
-                    outputs.append(doc)
-            else:
-                break
+    def worker_pool(self):
+        # started at the first synchronized call and reused until close().
+        if self.pool is None:
+            self.pool = SynchronizedWorkerPool(self.num_worker, start_method = self.mp_start_method)
 
-        return outputs
+        self.pool.start()
+        return self.pool
 
-    def terminate_process(self, running_processes):
-        for p in running_processes:
-            p.terminate()
-            p.close()
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
 
-        running_processes = []
         return None
 
-    def check_subprocess_finish(self, running_processes):
-        is_finish = True
-        for p in running_processes:
-            if p.is_alive():
-                is_finish = False
+    def _assign_partitions(self, kwargs, sync_args):
+        inputs_container = {}
+        for args in sync_args:
+            inputs_container = self.allocator(kwargs.get(args, None),
+                    args_name = args,
+                    args_container = inputs_container)
+
+        shared_arguments = {}
+        for argument in kwargs:
+            if argument in self.forbidden_keywords:
+                raise RuntimeError('Argument cannot be named as {0}.'.format(argument))
+
+            if argument not in sync_args:
+                shared_arguments[argument] = kwargs[argument]
+
+        # every rank gets a contiguous part, which is split into query_size partitions.
+        assignments, partition_index = [], 0
+        for rank in range(self.num_worker):
+            lengths = set(len(inputs_container.get(args, {}).get(rank, [])) for args in sync_args)
+            if len(lengths) > 1:
+                raise RuntimeError('Error partition assignment in the {0} sub-process'\
+                        .format(rank))
 
-        return is_finish
+            length = lengths.pop() if len(lengths) > 0 else 0
+            partitions = []
+            for start_index in range(0, length, self.query_size):
+                split_kwargs = dict(shared_arguments)
+                for args in sync_args:
+                    split_kwargs[args] = inputs_container[args][rank]\
+                            [start_index: start_index + self.query_size]
 
-    def __call__(self, func, sync_args = (), timeout = None, **kwargs):
+                partitions.append((partition_index, split_kwargs))
+                partition_index += 1
+
+            assignments.append(partitions)
+
+        return assignments
+
+    def _call_timeout(self, timeout):
         if timeout is None:
             if self.timeout > 0:
                 timeout = self.timeout
@@ -344,62 +667,29 @@ class SynchronizedFunctionWapper:
 
             timeout = float(timeout)
 
-        with mp.Manager() as manager:
-            inputs_container = manager.dict()
-            shared_arguments = manager.dict()
-            if sync_args is not None:
-                for args in sync_args:
-                    inputs_container = self.allocator(kwargs.get(args, None), 
-                            args_name = args,
-                            args_container = inputs_container)
+        return timeout
 
-            for argument in kwargs:
-                if argument in self.forbidden_keywords:
-                    raise RuntimeError('Argument cannot be named as {0}.'.format(argument))
+    def imap(self, func, sync_args = (), timeout = None, **kwargs):
+        # streams the outputs partition by partition, in the order of the sync arguments.
+        timeout = self._call_timeout(timeout)
+        if sync_args is None:
+            sync_args = ()
 
-                if argument not in sync_args:
-                    shared_arguments[argument] = kwargs[argument]
+        if self.can_exec_with_multiprocess():
+            assignments = self._assign_partitions(kwargs, sync_args)
+            for partition in self.worker_pool().imap(self.database.lightweighted_arguments(),
+                    func, assignments, timeout = timeout):
 
-            if self.can_exec_with_multiprocess():
-                shared_arguments['database'] = self.database.lightweighted_arguments()
-                shared_arguments['query_size'] = self.query_size
+                yield partition
+        else:
+            yield func(self.database, **kwargs)
 
-                queue_outputs = manager.Queue()
+        return None
 
-                outputs, running_processes = [], []
-                complete_warning, start_time = False, time.time()
-                for rank in range(self.num_worker):
-                    func_args = list(kwargs.keys())
-                    p = Process(target = run_worker,
-                            args = (rank,
-                                    inputs_container,
-                                    shared_arguments,
-                                    queue_outputs,
-                                    func,
-                                    func_args))
-
-                    p.start()
-                    running_processes.append(p)
-
-                finish = False
-                while (not finish):
-                    outputs = self.merge_process_outputs(outputs, queue_outputs)
-                    if self.check_subprocess_finish(running_processes):
-                        finish = True
-
-                    time.sleep(self.process_check_interval)
-                    if timeout is not None:
-                        if (time.time() - start_time) > timeout:
-                            print('Reach timeout limit, force stop function wrapper.')
-                            complete_warning = True
-                            self.terminate_process(running_processes)
-                            finish = True
-
-                outputs = self.merge_process_outputs(outputs, queue_outputs)
-                manager.shutdown()
-            else:
-                outputs = func(self.database, **kwargs)
+    def __call__(self, func, sync_args = (), timeout = None, **kwargs):
+        outputs = []
+        for partition in self.imap(func, sync_args = sync_args, timeout = timeout, **kwargs):
+            for doc in partition:
+                outputs.append(doc)
 
         return outputs
-
-
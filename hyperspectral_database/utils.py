@@ -1,22 +1,26 @@
 import pickle
 
+from .codec import encode_array, decode_array, is_encoded_array
+
 
 __all__ = ['serialize', 'deserialize']
 
 
-def serialize(obj):
-    if not isinstance(obj, object):
-        raise TypeError('The inputted variable is not Python object.')
-    
-    binary_object = pickle.dumps(obj)
+def serialize(obj, dtype = None, compression = None):
+    binary_object = encode_array(obj, dtype = dtype, compression = compression)
     return binary_object
 
-def deserialize(binary_obj): 
+def deserialize(binary_obj, allow_pickle = False):
     if not isinstance(binary_obj, bytes):
         raise TypeError('Input object must be a bytes object.')
     
-    data = pickle.loads(binary_obj)
+    if is_encoded_array(binary_obj):
+        data = decode_array(binary_obj)
+    elif allow_pickle:
+        # legacy GridFS object written by pickle.dumps before the array codec.
+        data = pickle.loads(binary_obj)
+    else:
+        raise ValueError('Refuse to load pickled object, please re-encode the legacy GridFS' + \
+                ' objects by reencode_gridfs or set allow_pickle=True for a trusted server.')
             
     return data
-
-
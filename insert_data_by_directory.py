@@ -3,9 +3,12 @@ import argparse
 
 from hyperspectral_database import HyperspectralDatabase
 
-def insert_data_by_directory(db, directory, batch_size = 10000, certain = False):
+def insert_data_by_directory(db, directory, batch_size = 10000, num_worker = -1,
+        recursive = False, manifest = None, certain = False):
+
     db.batch_insert_data(directory, batch_size = batch_size, 
-            progress = True, certain = certain)
+            progress = True, num_worker = num_worker, recursive = recursive,
+            manifest = manifest, certain = certain)
 
     print('\nInsertion finish.')
     return None
@@ -28,6 +31,15 @@ def main():
             help = 'The port of the deployed MongoDB.')
     parser.add_argument('--batch_size', type = int, default = 10000,
             help = 'The buffer size to insert the data file')
+    parser.add_argument('--num_worker', type = int, default = -1,
+            help = 'The process number to parse data file, -1 means single process.')
+    parser.add_argument('--recursive', action = 'store_true',
+            help = 'Also insert the data file in the sub-directories.')
+    parser.add_argument('--manifest', type = str, default = None,
+            help = 'The ingest manifest to resume the insertion, default is' + \
+            ' the .ingest_manifest.jsonl in the directory.')
+    parser.add_argument('--no_manifest', action = 'store_true',
+            help = 'Insert all file without recording or reading the ingest manifest.')
     parser.add_argument('--certain', action = 'store_true',
             help = 'To verify insert process.')
 
@@ -39,8 +51,18 @@ def main():
                                host = args.host,
                                port = args.port)
 
+    manifest = args.manifest
+    if manifest is None:
+        manifest = os.path.join(args.directory, '.ingest_manifest.jsonl')
+
+    if args.no_manifest:
+        manifest = None
+
     insert_data_by_directory(db, args.directory, 
             batch_size = args.batch_size,
+            num_worker = args.num_worker,
+            recursive = args.recursive,
+            manifest = manifest,
             certain = args.certain)
 
     print('Program finish.')
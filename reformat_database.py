@@ -14,8 +14,16 @@ def main():
             help = 'The host of the deployed MongoDB.')
     parser.add_argument('--port', type = int, default = 27087,
             help = 'The port of the deployed MongoDB.')
+    parser.add_argument('--source', type = str, default = 'gridfs',
+            help = 'The storage format of the source spectral data (gridfs, list, binary).')
+    parser.add_argument('--target', type = str, default = 'list',
+            help = 'The storage format of the target spectral data (gridfs, list, binary).')
     parser.add_argument('--transform_batch_size', type = int, default = 20000,
             help = 'The batch size to process transform request.')
+    parser.add_argument('--num_worker', type = int, default = 4,
+            help = 'The thread number to read and write GridFS objects.')
+    parser.add_argument('--restart', action = 'store_true',
+            help = 'Ignore the checkpoint and restart the reformation from the first data.')
 
     args = parser.parse_args()
 
@@ -26,8 +34,8 @@ def main():
                                port = args.port,
                                gridfs = True)
 
-    db.spectral_data_reformation('gridfs', 'list', batch_size = args.transform_batch_size,
-            certain = True)
+    db.spectral_data_reformation(args.source, args.target, batch_size = args.transform_batch_size,
+            num_worker = args.num_worker, resume = not args.restart, certain = True)
 
     print('Successfully finsih.')
 
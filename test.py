@@ -1,6 +1,8 @@
 import os
 import argparse
 
+import numpy as np
+
 from hyperspectral_database import HyperspectralDatabase
 
 def get_data_api_tesing(db):
@@ -10,6 +12,13 @@ def get_data_api_tesing(db):
     data = db.get_data_by_index_range(0, 2, 1)
     data = db.get_data_by_datatypes(['y-injured-like'])
     data = db.get_data_by_species(['tea12'])
+    data = db.get_data_by_index_range(0, 2, as_batch = True)
+    for data in db.iter_all_data(batch_size = 2):
+        pass
+
+    data = db.sample_data(n = 2, stratify_by = 'datatype', seed = 0)
+    data = db.get_all_data(scan_worker = 2)
+
     data = db.get_all_data()
     return data
 
@@ -42,6 +51,12 @@ def test_API(db, io_testing = False, delete_testing = False, data_path = None):
         get_data_api_tesing(db)
         print('Data acquring API (gridfs=False, multi-process) testing finish.')
 
+        db.storage_format = 'binary'
+        db.synchronize_worker = -1
+        get_data_api_tesing(db)
+        print('Data acquring API (storage_format=binary, single-process) testing finish.')
+        db.storage_format = 'list'
+
         indices = db.get_all_indices()
         indices = db.get_indices([{'datatypes': 'y-injured-like'},
                                   {'species': 'tea12'}])
@@ -66,6 +81,9 @@ def test_API(db, io_testing = False, delete_testing = False, data_path = None):
             db.insert_data(test_file, certain = True)
             db.batch_insert_data(data_path, batch_size = 2)
             db.batch_insert_data(data_path, batch_size = 2, certain = True)
+            db.batch_insert_data(data_path, batch_size = 2, num_worker = 2, certain = True)
+            db.insert_arrays(np.random.rand(4, 300), 'healthy', 'tea12', batch_size = 2,
+                    certain = True)
 
         print('IO testing finish.')
 
@@ -0,0 +1,72 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+mongomock = pytest.importorskip('mongomock')
+
+import mongomock.gridfs
+import mongomock.filtering
+import mongomock.collection
+
+import hyperspectral_database.base
+import hyperspectral_database.client
+
+from hyperspectral_database import HyperspectralDatabase
+
+
+TEST_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test_data')
+
+mongomock.gridfs.enable_gridfs_integration()
+_client = mongomock.MongoClient()
+
+
+# the in-memory server is shared by the database and the lightweighted worker clients.
+def _mongo_client(*args, **kwargs):
+    return _client
+
+hyperspectral_database.base.MongoClient = _mongo_client
+hyperspectral_database.client.MongoClient = _mongo_client
+
+
+# mongomock does not implement $mod and the sort argument of bulk updates.
+_filterer_init = mongomock.filtering._Filterer.__init__
+
+def _filterer_with_mod(self):
+    _filterer_init(self)
+    self._operator_map['$mod'] = lambda value, mod: isinstance(value, int) and \
+            value % mod[0] == mod[1]
+
+mongomock.filtering._Filterer.__init__ = _filterer_with_mod
+mongomock.filtering.filter_applies = mongomock.filtering._Filterer().apply
+mongomock.collection.filter_applies = mongomock.filtering.filter_applies
+
+_add_update = mongomock.collection.BulkOperationBuilder.add_update
+
+def _add_update_without_sort(self, *args, sort = None, **kwargs):
+    return _add_update(self, *args, **kwargs)
+
+mongomock.collection.BulkOperationBuilder.add_update = _add_update_without_sort
+
+
+@pytest.fixture
+def mongo_client():
+    _client.drop_database('hyperspectral')
+    yield _client
+    _client.drop_database('hyperspectral')
+
+
+@pytest.fixture
+def make_database(mongo_client):
+    databases = []
+    def make(**kwargs):
+        database = HyperspectralDatabase(**kwargs)
+        databases.append(database)
+        return database
+
+    yield make
+    for database in databases:
+        if database.database is not None:
+            database.close()
@@ -0,0 +1,181 @@
+import asyncio
+
+import gridfs
+import numpy as np
+import pytest
+
+from gridfs.errors import NoFile
+
+import hyperspectral_database.aio as aio
+
+
+# a minimal asyncio facade over the in-memory server of the sync tests.
+class _AsyncCursor:
+    def __init__(self, cursor):
+        self.iterator = iter(cursor)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0)
+        try:
+            return next(self.iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _AsyncCollection:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def find(self, query, projection = None, sort = None, batch_size = 0, **kwargs):
+        cursor = self.collection.find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort)
+
+        return _AsyncCursor(cursor)
+
+    async def aggregate(self, pipeline, **kwargs):
+        return _AsyncCursor(self.collection.aggregate(pipeline))
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return call
+
+
+class _AsyncDatabase:
+    def __init__(self, database):
+        self.database = database
+
+    def __getitem__(self, name):
+        return _AsyncCollection(self.database[name])
+
+
+class _AsyncGridOut:
+    def __init__(self, grid_out):
+        self.grid_out = grid_out
+
+    async def read(self):
+        return self.grid_out.read()
+
+
+class _AsyncGridFS:
+    def __init__(self, database):
+        self.fs = gridfs.GridFS(database.database)
+
+    async def put(self, data, **kwargs):
+        return self.fs.put(data, **kwargs)
+
+    async def get(self, file_id):
+        return _AsyncGridOut(self.fs.get(file_id))
+
+    async def delete(self, file_id):
+        return self.fs.delete(file_id)
+
+
+@pytest.fixture
+def async_client(mongo_client, monkeypatch):
+    class _AsyncClient:
+        def __init__(self, **kwargs):
+            pass
+
+        def __getitem__(self, name):
+            return _AsyncDatabase(mongo_client[name])
+
+        async def close(self):
+            return None
+
+    monkeypatch.setattr(aio, 'AsyncMongoClient', _AsyncClient)
+    monkeypatch.setattr(aio, 'AsyncGridFS', _AsyncGridFS)
+    return mongo_client
+
+
+@pytest.mark.parametrize('storage_format', ['list', 'binary', 'gridfs'])
+def test_async_round_trip(async_client, make_database, storage_format):
+    spectral = np.random.rand(10, 300)
+
+    async def run():
+        async with aio.AsyncHyperspectralDatabase(storage_format = storage_format) as database:
+            assert await database.insert_arrays(spectral, ['a'] * 5 + ['b'] * 5, 'tea12',
+                    certain = True, batch_size = 4) == 10
+
+            data = await database.get_all_data(data_args = ('insert_index', 'spectral'))
+            assert [single_data['insert_index'] for single_data in data] == list(range(10))
+            assert np.array_equal(np.stack([single_data['spectral'] for single_data in data]),
+                    spectral)
+
+            data = await database.get_data_by_index_range(8, 1, -3)
+            assert np.array_equal(np.stack([single_data['spectral'] for single_data in data]),
+                    spectral[[8, 5, 2]])
+
+            batch = await database.get_data_by_datatypes('b', as_batch = True)
+            assert list(batch.insert_index) == [5, 6, 7, 8, 9]
+
+            results = await asyncio.gather(*[database.get_data_by_indices([i]) for i in range(10)])
+            assert all(np.array_equal(data[0]['spectral'], spectral[i])
+                    for i, data in enumerate(results))
+
+            chunks = [len(chunk) async for chunk in database.iter_all_data(batch_size = 3)]
+            assert chunks == [3, 3, 3, 1]
+
+            assert await database.delete_data([0, 1], certain = True) == 2
+
+    asyncio.run(run())
+
+    # the sync client reads the documents written by the async one.
+    database = make_database(storage_format = storage_format)
+    assert database.get_all_indices() == list(range(2, 10))
+
+
+def test_delete_all_needs_certain(async_client, monkeypatch):
+    async def run():
+        database = aio.AsyncHyperspectralDatabase()
+        await database.insert_arrays(np.random.rand(3, 300), 'a', 'tea12', certain = True)
+
+        async def no_request(*args, **kwargs):
+            raise AssertionError('indices fetched without certain.')
+
+        monkeypatch.setattr(database, 'get_all_indices', no_request)
+        assert await database.delete_all() == 0
+        assert await database.count_documents({}) == 3
+        await database.close()
+
+    asyncio.run(run())
+
+
+def test_missing_gridfs_file_raises(async_client):
+    async def run():
+        database = aio.AsyncHyperspectralDatabase(storage_format = 'gridfs')
+        await database.insert_arrays(np.random.rand(2, 300), 'a', 'tea12', certain = True)
+        doc = await database.find_one({'insert_index': 0})
+        await database.fs.delete(doc['spectral'])
+
+        with pytest.raises(NoFile):
+            await database.get_data_by_indices([0])
+
+        await database.close()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize('kwargs, error', [
+        ({'spectral_dtype': 'int8'}, ValueError),
+        ({'spectral_dtype': 32}, TypeError),
+        ({'spectral_compression': 'lzma'}, ValueError),
+        ({'max_query_bytes': 0}, ValueError),
+        ({'max_query_bytes': 16 * 1024 * 1024}, ValueError),
+        ({'max_query_bytes': 1.}, TypeError)])
+def test_constructor_validation(async_client, kwargs, error):
+    with pytest.raises(error):
+        aio.AsyncHyperspectralDatabase(**kwargs)
+
+
+def test_constructor_normalizes_encoding(async_client):
+    database = aio.AsyncHyperspectralDatabase(spectral_dtype = 'Float32',
+            spectral_compression = 'ZLIB')
+
+    assert database.spectral_encoding == {'dtype': 'float32', 'compression': 'zlib'}
@@ -0,0 +1,54 @@
+import numpy as np
+
+from hyperspectral_database import SpectralBatch
+from hyperspectral_database.batch import SpectralBatchBuilder
+from hyperspectral_database.codec import encode_array
+
+
+def test_builder_decodes_and_trims():
+    builder = SpectralBatchBuilder()
+    spectral = np.random.rand(17, 300)
+    for i in range(17):
+        value = encode_array(spectral[i]) if i % 2 == 0 else spectral[i].tolist()
+        builder.append(insert_index = i, datatype = 'healthy' if i < 10 else 'tea',
+                species = 'tea12', spectral = value)
+
+    batch = builder.build()
+    assert len(batch) == 17
+    assert batch.spectral.flags.owndata and batch.spectral.shape == (17, 300)
+    assert np.array_equal(batch.spectral, spectral)
+    assert batch.datatype_categories == ('healthy', 'tea')
+    assert list(batch.datatype_labels()[[0, 12]]) == ['healthy', 'tea']
+
+
+def test_preallocated_rows_are_not_copied():
+    builder = SpectralBatchBuilder(capacity = 8)
+    for i in range(5):
+        builder.append(insert_index = i, spectral = np.full(300, i, dtype = np.float32))
+
+    buffer = builder._spectral
+    batch = builder.build()
+    assert batch.spectral is buffer
+    assert batch.spectral.shape == (5, 300) and batch.insert_index.shape == (5, )
+    assert np.array_equal(batch.spectral[:, 0], np.arange(5))
+
+    # the builder grows new buffers, the built batch is left untouched.
+    builder.append(insert_index = 5, spectral = np.full(300, 5, dtype = np.float32))
+    assert len(builder.build()) == 6 and len(batch) == 5
+
+
+def test_missing_spectral_is_nan():
+    batch = SpectralBatch.from_list([{'insert_index': 0, 'spectral': 'unknown'},
+            {'insert_index': 1, 'spectral': np.ones(3)}])
+
+    assert np.isnan(batch.spectral[0]).all()
+    assert np.array_equal(batch.spectral[1], np.ones(3))
+
+
+def test_batch_indexing_and_to_list():
+    batch = SpectralBatch.from_list([{'insert_index': i, 'datatype': 'healthy', 'species': 'tea12',
+            'spectral': np.full(3, i, dtype = np.float64)} for i in range(4)])
+
+    subset = batch[np.array([False, True, False, True])]
+    assert list(subset.insert_index) == [1, 3]
+    assert [single_data['insert_index'] for single_data in batch[2].to_list()] == [2]
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from hyperspectral_database.cache import SpectralCache
+
+
+@pytest.fixture
+def cached_database(make_database):
+    database = make_database(cache_bytes = 10 ** 6)
+    database.insert_arrays(np.arange(150, dtype = np.float64).reshape(30, 5),
+            ['x'] * 20 + ['z'] * 10, 'tea12', certain = True, progress = False)
+
+    return database
+
+
+def _count_requests(database, monkeypatch):
+    calls = []
+    collection = database.collections['data']
+    for name in ('find', 'aggregate'):
+        method = getattr(collection, name)
+        monkeypatch.setattr(collection, name,
+                lambda *args, _method = method, **kwargs: calls.append(1) or _method(*args, **kwargs))
+
+    return calls
+
+
+def test_hits_are_served_without_request(cached_database, monkeypatch):
+    first = cached_database.get_data_by_indices([3, 4, 5], hint = False)
+    calls = _count_requests(cached_database, monkeypatch)
+    second = cached_database.get_data_by_indices([5, 4, 3], hint = False)
+
+    assert calls == []
+    assert [single_data['spectral'][0] for single_data in second] == [15., 20., 25.]
+    assert cached_database.spectral_cache.hits == 3
+    assert [d['spectral'][0] for d in first] == [d['spectral'][0] for d in second]
+
+
+def test_cached_order_matches_uncached(cached_database):
+    uncached = cached_database.get_data_by_indices([7, 2, 9], hint = False,
+            data_args = ('insert_index', 'spectral'))
+    cached = cached_database.get_data_by_indices([7, 2, 9], hint = False,
+            data_args = ('insert_index', 'spectral'))
+
+    assert [d['insert_index'] for d in cached] == [d['insert_index'] for d in uncached] == [2, 7, 9]
+
+
+def test_returned_arrays_are_not_shared(cached_database):
+    first = cached_database.get_data_by_indices([1], hint = False)
+    first[0]['spectral'][0] = -1.
+    second = cached_database.get_data_by_indices([1], hint = False)
+
+    assert second[0]['spectral'][0] == 5.
+    assert second[0]['spectral'].flags.writeable
+
+
+def test_delete_invalidates(cached_database):
+    cached_database.get_data_by_indices([5, 6], hint = False)
+    cached_database.delete_data([5], certain = True)
+
+    assert [d['spectral'][0] for d in cached_database.get_data_by_indices([5, 6], hint = False)] == [30.]
+
+
+def test_keys_include_collections():
+    cache = SpectralCache(10 ** 6)
+    cache.put(('list', 'data', 'spectral', 0), {'spectral': np.zeros(3)})
+
+    assert cache.get(('list', 'spectral', 'spectral', 0), ('spectral', )) is None
+    assert cache.invalidate([0]) == 1
+    assert len(cache) == 0
+
+
+def test_eviction_by_byte_budget():
+    cache = SpectralCache(100)
+    for i in range(5):
+        cache.put(('list', 'data', 'spectral', i), {'spectral': np.zeros(4)})
+
+    assert cache.nbytes <= 100
+    assert cache.get(('list', 'data', 'spectral', 0), ('spectral', )) is None
+    assert cache.get(('list', 'data', 'spectral', 4), ('spectral', )) is not None
+
+
+def test_cached_batch_matches_uncached(cached_database, make_database):
+    uncached = make_database().get_data_by_indices([3, 4, 5], hint = False, as_batch = True)
+    first = cached_database.get_data_by_indices([5, 3, 4], hint = False, as_batch = True)
+    second = cached_database.get_data_by_indices([3, 4, 5], hint = False, as_batch = True)
+
+    for batch in (first, second):
+        assert list(batch.insert_index) == list(uncached.insert_index) == [3, 4, 5]
+        assert np.array_equal(batch.spectral, uncached.spectral)
+        assert list(batch.datatype) == list(uncached.datatype)
@@ -0,0 +1,98 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from hyperspectral_database.codec import encode_array, decode_array, inspect_array, is_encoded_array
+from hyperspectral_database.utils import serialize, deserialize
+
+
+@pytest.mark.parametrize('dtype', ['float64', 'float32', 'float16'])
+def test_plain_round_trip(dtype):
+    array = np.random.rand(3, 300).astype(dtype)
+    binary_obj = encode_array(array)
+
+    assert is_encoded_array(binary_obj)
+    assert inspect_array(binary_obj)['version'] == 1
+    decoded = decode_array(binary_obj)
+    assert decoded.dtype == np.dtype(dtype)
+    assert np.array_equal(decoded, array)
+
+
+def test_decode_is_read_only_view():
+    decoded = decode_array(encode_array(np.arange(10, dtype = np.float64)))
+    assert not decoded.flags.writeable
+
+
+def test_newer_version_is_refused():
+    binary_obj = bytearray(encode_array(np.zeros(4)))
+    binary_obj[4] = 255
+    with pytest.raises(RuntimeError):
+        decode_array(bytes(binary_obj))
+
+
+def test_deserialize_refuses_pickle_by_default():
+    legacy = pickle.dumps(np.arange(4.))
+    with pytest.raises(ValueError):
+        deserialize(legacy)
+
+    assert np.array_equal(deserialize(legacy, allow_pickle = True), np.arange(4.))
+
+
+def test_serialize_round_trip():
+    array = np.random.rand(300)
+    assert np.array_equal(deserialize(serialize(array)), array)
+
+
+def test_legacy_gridfs_objects_need_opt_in(make_database):
+    database = make_database(storage_format = 'gridfs')
+    database.insert_arrays(np.random.rand(2, 300), 'healthy', 'tea12', certain = True,
+            progress = False)
+
+    # replace the first GridFS object by a pickled one, as written by the old library.
+    doc = database.collections['data'].find_one({'insert_index': 0})
+    legacy = np.arange(300.)
+    pointer = database.fs.put(pickle.dumps(legacy), insert_index = 0)
+    database.collections['data'].update_one({'_id': doc['_id']}, {'$set': {'spectral': pointer}})
+
+    with pytest.raises(ValueError):
+        database.get_data_by_indices([0], hint = False)
+
+    database.reencode_gridfs(certain = True, hint = False)
+    data = database.get_data_by_indices([0], hint = False)
+    assert np.array_equal(data[0]['spectral'], legacy)
+
+
+@pytest.mark.parametrize('compression', ['zlib', 'delta-zlib'])
+@pytest.mark.parametrize('dtype', ['float64', 'float32'])
+def test_lossless_compression_round_trip(dtype, compression):
+    array = np.cumsum(np.random.rand(300)).astype(dtype)
+    binary_obj = encode_array(array, compression = compression)
+
+    header = inspect_array(binary_obj)
+    assert header['compression'] == compression
+    assert header['version'] == (2 if compression == 'delta-zlib' else 1)
+    assert np.array_equal(decode_array(binary_obj), array)
+
+
+def test_int16_quantization_error_is_bounded():
+    array = np.random.rand(300) * 4. - 1.
+    binary_obj = encode_array(array, dtype = 'int16')
+
+    assert inspect_array(binary_obj)['version'] == 2
+    decoded = decode_array(binary_obj)
+    assert decoded.dtype == np.float32
+    assert np.max(np.abs(decoded - array)) <= (array.max() - array.min()) / 65535.
+
+
+def test_database_spectral_dtype_and_compression(make_database):
+    database = make_database(storage_format = 'binary', spectral_dtype = 'float32',
+            spectral_compression = 'delta-zlib')
+
+    spectral = np.random.rand(3, 300)
+    database.insert_arrays(spectral, 'healthy', 'tea12', certain = True, progress = False)
+
+    data = database.get_all_data(data_args = ('spectral', ), hint = False)
+    assert data[0]['spectral'].dtype == np.float32
+    assert np.array_equal(np.stack([single_data['spectral'] for single_data in data]),
+            spectral.astype(np.float32))
@@ -0,0 +1,76 @@
+import os
+import json
+import shutil
+
+import numpy as np
+
+from conftest import TEST_DATA
+
+
+def _copy_test_data(tmp_path):
+    directory = str(tmp_path / 'data')
+    shutil.copytree(TEST_DATA, directory)
+    return directory
+
+
+def test_manifest_skips_committed_files(tmp_path, make_database):
+    database = make_database()
+    directory = _copy_test_data(tmp_path)
+    manifest = str(tmp_path / 'manifest.jsonl')
+
+    database.batch_insert_data(directory, batch_size = 4, certain = True, progress = False,
+            manifest = manifest)
+    assert database.get_all_indices() == list(range(6))
+
+    database.batch_insert_data(directory, batch_size = 4, certain = True, progress = False,
+            manifest = manifest)
+    assert database.get_all_indices() == list(range(6))
+
+
+def test_manifest_rolls_back_uncommitted_batch(tmp_path, make_database):
+    database = make_database()
+    directory = _copy_test_data(tmp_path)
+    manifest = str(tmp_path / 'manifest.jsonl')
+    database.batch_insert_data(directory, batch_size = 4, certain = True, progress = False,
+            manifest = manifest)
+
+    # a crash between the begin record and the commit record leaves partial writes.
+    with open(manifest, 'a') as f:
+        f.write(json.dumps({'state': 'begin', 'start': 6, 'stop': 8, 'files': ['lost.json']}) + '\n')
+
+    database.fs.put(b'orphan', insert_index = 6)
+    database.collections['data'].insert_one({'insert_index': 7})
+
+    shutil.copy(os.path.join(TEST_DATA, 'healthy_99999.json'), os.path.join(directory, 'new.json'))
+    database.batch_insert_data(directory, batch_size = 4, certain = True, progress = False,
+            manifest = manifest)
+
+    indices = database.get_all_indices()
+    assert 7 not in indices
+    assert len(indices) == 7
+    assert database.database['fs.files'].count_documents({}) == 7
+    assert database.database['fs.files'].count_documents({'length': len(b'orphan')}) == 0
+
+
+def test_progress_is_printed_by_display_interval(capsys, make_database):
+    database = make_database()
+    database.insert_arrays(np.random.rand(25, 300), 'healthy', 'tea12', certain = True,
+            progress = True, display_interval = 10)
+
+    lines = [line for line in capsys.readouterr().out.splitlines() if 'progress' in line]
+    assert lines == ['Acquring data progress: {0} files'.format(i) for i in (10, 20, 25)]
+
+
+def test_insert_arrays_round_trip(make_database):
+    database = make_database()
+    spectral = np.random.rand(5, 300)
+    database.insert_arrays(spectral, ['healthy', 'healthy', 'y-injured-like', 'healthy', 'healthy'],
+            'tea12', batch_size = 2, certain = True, progress = False)
+
+    data = database.get_all_data(data_args = ('insert_index', 'datatype', 'spectral'), hint = False)
+    assert [single_data['insert_index'] for single_data in data] == list(range(5))
+    assert data[2]['datatype'] == 'y-injured-like'
+    assert np.array_equal(np.stack([single_data['spectral'] for single_data in data]), spectral)
+
+    batch = database.get_all_data(hint = False, as_batch = True)
+    assert batch.spectral.shape == (5, 300)
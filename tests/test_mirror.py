@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def mirrored_database(tmp_path, make_database):
+    database = make_database(storage_format = 'binary', docs_num_per_request = 4,
+            synchronize_query_size = 2)
+    database.insert_arrays(np.arange(150, dtype = np.float64).reshape(30, 5),
+            ['x'] * 20 + ['z'] * 10, ['a', 'b', 'c'] * 10, certain = True, progress = False)
+    database.attach_mirror(str(tmp_path / 'mirror' / 'mirror.sqlite'), batch_size = 7,
+            hint = False)
+
+    yield database
+    database.detach_mirror()
+
+
+def test_sync_pulls_everything(mirrored_database):
+    mirror = mirrored_database.local_mirror
+
+    assert len(mirror) == 30
+    assert mirror.watermark == 29
+    assert mirror.is_fresh(mirrored_database)
+
+
+def test_mirror_reads_match_server(mirrored_database):
+    data = mirrored_database.get_data_by_indices([3, 4, 29], hint = False)
+    assert [single_data['spectral'][0] for single_data in data] == [15., 20., 145.]
+
+    data = mirrored_database.get_data_by_index_range(28, 2, -5,
+            data_args = ('insert_index', 'spectral'), hint = False)
+    assert [single_data['insert_index'] for single_data in data] == list(range(28, 2, -5))
+
+    batch = mirrored_database.get_data_by_datatypes('z', as_batch = True, hint = False)
+    assert list(batch.insert_index) == list(range(20, 30))
+
+
+def test_sync_is_incremental_above_watermark(mirrored_database):
+    mirror = mirrored_database.local_mirror
+    mirrored_database.insert_arrays(np.ones((2, 5)), 'q', 'q', certain = True, progress = False)
+    assert not mirror.is_fresh(mirrored_database)
+
+    result = mirrored_database.sync_mirror(hint = False)
+    assert result == {'pulled': 2, 'deleted': 0, 'watermark': 31}
+    assert mirror.is_fresh(mirrored_database)
+
+
+def test_reconcile_drops_deleted_documents(mirrored_database):
+    mirror = mirrored_database.local_mirror
+    mirrored_database.delete_data([1, 2, 3, 17], batch_size = 4, certain = True)
+    assert not mirror.is_fresh(mirrored_database)
+
+    result = mirrored_database.sync_mirror(hint = False)
+    assert result['pulled'] == 0 and result['deleted'] == 4
+    assert mirror.is_fresh(mirrored_database)
+
+    data = mirrored_database.get_all_data(data_args = ('insert_index', ), hint = False)
+    assert [single_data['insert_index'] for single_data in data] == \
+            [index for index in range(30) if index not in (1, 2, 3, 17)]
+
+
+def test_sync_pulls_documents_committed_below_watermark(mirrored_database):
+    # a reserved block of insert_index is committed after the later ones were mirrored.
+    query = {'insert_index': {'$in': [10, 11, 12]}}
+    late_docs = {name: list(mirrored_database.collections[name].find(query))
+            for name in ('data', 'spectral')}
+    mirrored_database.collections['spectral'].delete_many(query)
+    mirrored_database.collections['data'].delete_many(query)
+    mirrored_database.sync_mirror(hint = False)
+
+    mirror = mirrored_database.local_mirror
+    assert len(mirror) == 27
+    for name, docs in late_docs.items():
+        mirrored_database.collections[name].insert_many(docs)
+
+    assert not mirror.is_fresh(mirrored_database)
+    result = mirrored_database.sync_mirror(hint = False)
+    assert result == {'pulled': 3, 'deleted': 0, 'watermark': 29}
+    assert mirror.is_fresh(mirrored_database)
+
+    data = mirrored_database.get_data_by_indices([10, 11, 12], hint = False)
+    assert [single_data['spectral'][0] for single_data in data] == [50., 55., 60.]
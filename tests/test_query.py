@@ -0,0 +1,61 @@
+import bson
+import pytest
+
+from hyperspectral_database.query import compile_queries, index_queries, index_range_query
+
+
+def test_contiguous_insert_index_becomes_range():
+    queries = [{'insert_index': i} for i in range(10)] + [{'insert_index': 20}]
+    assert compile_queries(queries) == [{'$or': [
+            {'insert_index': {'$gte': 0, '$lt': 10}},
+            {'insert_index': 20}]}]
+
+
+def test_other_fields_are_not_collapsed_into_range():
+    queries = [{'score': 1}, {'score': 2}, {'score': 3}, {'score': 4}]
+    assert compile_queries(queries) == [{'score': {'$in': [1, 2, 3, 4]}}]
+
+
+def test_equality_clauses_are_merged_and_deduplicated():
+    queries = {'$or': [{'datatype': 'healthy'}, {'datatype': {'$in': ['healthy', 'y-injured-like']}},
+            {'species': 'tea12'}]}
+    assert compile_queries(queries) == [{'$or': [
+            {'datatype': {'$in': ['healthy', 'y-injured-like']}},
+            {'species': 'tea12'}]}]
+
+
+def test_queries_are_split_by_max_query_bytes():
+    indices = list(range(0, 20000, 2))
+    queries = index_queries(indices, max_query_bytes = 16 * 1024)
+
+    assert len(queries) > 1
+    assert all(len(bson.encode(query)) <= 16 * 1024 for query in queries)
+    compiled = []
+    for query in queries:
+        compiled += query['insert_index']['$in']
+
+    assert compiled == indices
+
+
+def test_invalid_queries():
+    with pytest.raises(RuntimeError):
+        compile_queries([])
+
+    with pytest.raises(TypeError):
+        compile_queries([1])
+
+
+@pytest.mark.parametrize('start, stop, step', [(0, 10, 1), (2, 17, 3), (9, 0, -2), (5, 5, 1)])
+def test_index_range_query(start, stop, step):
+    query, direction = index_range_query(start, stop, step)
+    expected = list(range(start, stop, step))
+    if len(expected) == 0:
+        assert query is None
+        return
+
+    condition = query['insert_index']
+    matched = [i for i in range(-5, 30) if condition['$gte'] <= i <= condition['$lte'] and
+            ('$mod' not in condition or i % condition['$mod'][0] == condition['$mod'][1])]
+
+    assert direction == (1 if step > 0 else -1)
+    assert matched[:: direction] == expected
@@ -0,0 +1,42 @@
+import numpy as np
+
+from hyperspectral_database.codec import is_encoded_array
+
+
+def _spectral_types(database):
+    return set(type(doc['spectral']).__name__ for doc in database.collections['spectral'].find())
+
+
+def test_reformation_round_trip(make_database):
+    database = make_database(storage_format = 'list')
+    spectral = np.random.rand(5, 300)
+    database.insert_arrays(spectral, 'healthy', 'tea12', certain = True, progress = False)
+
+    for source, target, spectral_type in (('list', 'binary', 'bytes'),
+            ('binary', 'list', 'list'), ('list', 'binary', 'bytes')):
+
+        database.spectral_data_reformation(source, target, batch_size = 2,
+                certain = True, hint = False)
+
+        assert _spectral_types(database) == {spectral_type}
+        assert database.database['counters'].find_one(
+                {'_id': 'reformation:{0}:{1}'.format(source, target)}) is None
+
+    database.storage_format = 'binary'
+    data = database.get_all_data(data_args = ('spectral', ), hint = False)
+    assert np.array_equal(np.stack([single_data['spectral'] for single_data in data]), spectral)
+
+
+def test_reformation_resumes_from_checkpoint(make_database):
+    database = make_database(storage_format = 'list')
+    database.insert_arrays(np.random.rand(5, 300), 'healthy', 'tea12', certain = True,
+            progress = False)
+
+    # an interrupted run leaves the checkpoint at the last finished insert_index.
+    database.database['counters'].insert_one({'_id': 'reformation:list:binary', 'insert_index': 2})
+    database.spectral_data_reformation('list', 'binary', batch_size = 2,
+            certain = True, hint = False)
+
+    encoded = [is_encoded_array(doc['spectral']) for doc in
+            database.collections['spectral'].find({}, sort = [('insert_index', 1)])]
+    assert encoded == [False, False, False, True, True]
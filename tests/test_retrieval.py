@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+import mongomock
+
+from pymongo.errors import OperationFailure
+
+
+def test_insert_index_is_indexed_on_existing_database(mongo_client, make_database):
+    # documents written by an older client, without the counter document or the indexes.
+    database = mongo_client['hyperspectral']
+    database['data'].insert_one({'insert_index': 0, 'datatype': 'healthy'})
+    database['spectral'].insert_one({'insert_index': 0, 'spectral': [0., 1.]})
+
+    make_database()
+    for name in ('data', 'spectral'):
+        keys = [index['key'] for index in database[name].index_information().values()]
+        assert [('insert_index', 1)] in keys
+
+
+def test_read_only_credentials_can_connect(mongo_client, make_database, monkeypatch):
+    database = make_database()
+    database.insert_arrays(np.random.rand(3, 300), 'healthy', 'tea12', certain = True,
+            progress = False)
+
+    def create_index(*args, **kwargs):
+        raise OperationFailure('not authorized to execute command createIndexes')
+
+    monkeypatch.setattr(mongomock.collection.Collection, 'create_index', create_index)
+    with pytest.warns(UserWarning, match = 'insert_index index'):
+        read_only = make_database()
+
+    assert read_only.get_all_indices() == [0, 1, 2]
+    assert len(read_only.get_data_by_indices([1, 2], hint = False)) == 2
+
+
+@pytest.mark.parametrize('storage_format', ['list', 'binary'])
+def test_retrieval_engines_agree(make_database, storage_format):
+    database = make_database(storage_format = storage_format)
+    spectral = np.random.rand(6, 300)
+    database.insert_arrays(spectral, ['healthy', 'tea'] * 3, 'tea12', certain = True,
+            progress = False)
+
+    results = {}
+    for engine in database.available_retrieval_engines:
+        database.retrieval_engine = engine
+        results[engine] = (database.get_data_by_datatypes(['tea'], hint = False),
+                database.get_data_by_index_range(5, 0, -2, hint = False))
+
+    for lookup_data, query_data in zip(results['lookup'], results['query']):
+        assert len(lookup_data) == len(query_data) == 3
+        for a, b in zip(lookup_data, query_data):
+            assert a['datatype'] == b['datatype']
+            assert np.array_equal(a['spectral'], b['spectral'])
+
+    range_data = results['lookup'][1]
+    assert np.array_equal(np.stack([d['spectral'] for d in range_data]), spectral[[5, 3, 1]])
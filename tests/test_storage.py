@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from hyperspectral_database.codec import is_encoded_array
+
+
+@pytest.mark.parametrize('storage_format', ['list', 'binary', 'gridfs'])
+def test_storage_format_round_trip(make_database, storage_format):
+    database = make_database(storage_format = storage_format)
+    spectral = np.random.rand(4, 300)
+    database.insert_arrays(spectral, 'healthy', 'tea12', certain = True, progress = False)
+
+    data = database.get_all_data(data_args = ('insert_index', 'spectral'), hint = False)
+    assert np.array_equal(np.stack([single_data['spectral'] for single_data in data]), spectral)
+
+
+def test_binary_documents_hold_encoded_arrays(make_database):
+    database = make_database(storage_format = 'binary')
+    database.insert_arrays(np.random.rand(2, 300), 'healthy', 'tea12', certain = True,
+            progress = False)
+
+    doc = database.collections['spectral'].find_one({'insert_index': 0})
+    assert is_encoded_array(doc['spectral'])
@@ -0,0 +1,175 @@
+import os
+import time
+import platform
+import threading
+
+import numpy as np
+import pytest
+
+if platform.system() != 'Linux':
+    pytest.skip('the pool tests fork the in-memory server.', allow_module_level = True)
+
+
+# the pool functions live at module level, the forked workers resolve them by name.
+def _slow(database, docs):
+    time.sleep(0.02 * (5 - docs[0]['i'] % 5))
+    return [{'i': doc['i'], 'spectral': np.full(3, doc['i'], dtype = np.float32)} for doc in docs]
+
+def _error(database, docs):
+    if docs[0]['i'] == 8:
+        raise KeyError('bad partition')
+
+    return docs
+
+def _crash(database, docs):
+    if docs[0]['i'] == 6:
+        os._exit(3)
+
+    return docs
+
+def _hang(database, docs):
+    if docs[0]['i'] >= 8:
+        time.sleep(30)
+
+    return docs
+
+def _pids(database):
+    return [p.pid for p in database.sync_wrapper.pool.processes]
+
+def _docs(number):
+    return [{'i': i} for i in range(number)]
+
+
+@pytest.fixture
+def pool_database(make_database):
+    database = make_database(synchronize_query_size = 2, synchronize_worker = 4,
+            retrieval_engine = 'query')
+    database.insert_arrays(np.random.rand(13, 300), 'healthy', 'tea12', certain = True,
+            progress = False)
+
+    return database
+
+
+def _shared_blocks():
+    return set(name for name in os.listdir('/dev/shm') if name.startswith('psm_'))
+
+
+def test_partitions_are_returned_in_order(pool_database):
+    outputs = pool_database.sync_wrapper(_slow, sync_args = ('docs', ), docs = _docs(15))
+
+    assert [doc['i'] for doc in outputs] == list(range(15))
+    assert outputs[3]['spectral'].dtype == np.float32
+    assert np.array_equal(outputs[14]['spectral'], np.full(3, 14, dtype = np.float32))
+
+
+def test_pool_is_reused_and_matches_single_process(pool_database):
+    pool_database.synchronize_worker = -1
+    expected = pool_database.get_all_data(data_args = ('insert_index', 'spectral'), hint = False)
+
+    pool_database.synchronize_worker = 4
+    data = pool_database.get_all_data(data_args = ('insert_index', 'spectral'), hint = False)
+    pids = _pids(pool_database)
+    again = pool_database.get_all_data(data_args = ('insert_index', 'spectral'), hint = False)
+
+    assert _pids(pool_database) == pids
+    for outputs in (data, again):
+        assert [single_data['insert_index'] for single_data in outputs] == list(range(13))
+        assert np.array_equal(np.stack([single_data['spectral'] for single_data in outputs]),
+                np.stack([single_data['spectral'] for single_data in expected]))
+
+
+def test_error_keeps_the_pool(pool_database):
+    blocks = _shared_blocks()
+    pool_database.sync_wrapper(_slow, sync_args = ('docs', ), docs = _docs(15))
+    pids = _pids(pool_database)
+
+    with pytest.raises(RuntimeError, match = 'bad partition'):
+        pool_database.sync_wrapper(_error, sync_args = ('docs', ), docs = _docs(15))
+
+    assert _pids(pool_database) == pids
+    outputs = pool_database.sync_wrapper(_slow, sync_args = ('docs', ), docs = _docs(15))
+    assert [doc['i'] for doc in outputs] == list(range(15))
+    assert _shared_blocks() <= blocks
+
+
+def test_crash_restarts_only_the_dead_worker(pool_database):
+    pool_database.sync_wrapper(_slow, sync_args = ('docs', ), docs = _docs(15))
+    pids = _pids(pool_database)
+
+    with pytest.raises(RuntimeError, match = 'exited unexpectedly'):
+        pool_database.sync_wrapper(_crash, sync_args = ('docs', ), docs = _docs(15))
+
+    changed = [rank for rank, (old, new) in enumerate(zip(pids, _pids(pool_database))) if old != new]
+    assert len(changed) == 1
+    assert pool_database.sync_wrapper.pool.alive
+
+
+def test_timeout_restarts_only_the_hanging_worker(pool_database):
+    pool_database.sync_wrapper(_slow, sync_args = ('docs', ), docs = _docs(16))
+    pids = _pids(pool_database)
+
+    start_time = time.time()
+    outputs = pool_database.sync_wrapper(_hang, sync_args = ('docs', ), timeout = 0.5,
+            docs = _docs(16))
+
+    assert time.time() - start_time < 5.
+    # ranks hold [0, 5), [5, 10), [10, 15), [15], the partitions from 9 on hang.
+    assert [doc['i'] for doc in outputs] == list(range(9))
+    assert [old == new for old, new in zip(pids, _pids(pool_database))] == [True, False, False, False]
+    assert pool_database.sync_wrapper.pool.alive
+
+
+def test_close_stops_the_pool(pool_database):
+    pool_database.sync_wrapper(_slow, sync_args = ('docs', ), docs = _docs(15))
+    processes = list(pool_database.sync_wrapper.pool.processes)
+    pool_database.sync_wrapper.close()
+
+    assert pool_database.sync_wrapper.pool is None
+    assert all(p._closed for p in processes)
+
+
+def _tagged(database, docs, tag):
+    time.sleep(0.01)
+    return [{'i': doc['i'], 'tag': tag} for doc in docs]
+
+
+def test_calls_from_two_threads_are_not_mixed(pool_database):
+    results = {}
+    def call(tag):
+        results[tag] = pool_database.sync_wrapper(_tagged, sync_args = ('docs', ), tag = tag,
+                docs = _docs(12))
+
+    threads = [threading.Thread(target = call, args = (tag, )) for tag in ('a', 'b', 'c')]
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    for tag in ('a', 'b', 'c'):
+        assert [doc['i'] for doc in results[tag]] == list(range(12))
+        assert set(doc['tag'] for doc in results[tag]) == {tag}
+
+
+def test_nested_call_in_the_same_thread_is_refused(pool_database):
+    partitions = pool_database.sync_wrapper.imap(_slow, sync_args = ('docs', ), docs = _docs(15))
+    next(partitions)
+    with pytest.raises(RuntimeError, match = 'still streaming'):
+        pool_database.sync_wrapper(_slow, sync_args = ('docs', ), docs = _docs(15))
+
+    partitions.close()
+    assert len(pool_database.sync_wrapper(_slow, sync_args = ('docs', ), docs = _docs(15))) == 15
+
+
+def test_lookup_inside_prefetched_iteration(make_database):
+    database = make_database(synchronize_query_size = 2, synchronize_worker = 2,
+            retrieval_engine = 'query')
+    database.insert_arrays(np.arange(50, dtype = np.float64)[:, None] * np.ones((1, 300)),
+            'healthy', 'tea12', certain = True, progress = False)
+
+    for data in database.iter_all_data(batch_size = 7, data_args = ('insert_index', 'spectral')):
+        looked_up = database.get_data_by_indices([40, 41, 42, 43], hint = False,
+                data_args = ('insert_index', 'spectral'))
+        assert [single_data['insert_index'] for single_data in looked_up] == [40, 41, 42, 43]
+        assert [single_data['spectral'][0] for single_data in looked_up] == [40., 41., 42., 43.]
+        assert all(single_data['spectral'][0] == single_data['insert_index'] for single_data in data)